@@ -0,0 +1,110 @@
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.bench_event_index import query_events_month
+from bench.synth import rule_events, synth_taps, write_employees, write_events
+from core.attendance_payroll import _build_month
+from lib.attendance_store import (
+    archive_month,
+    iter_decoded_month_from,
+    iter_events_month,
+    iter_payroll_month,
+    months_between,
+    query_payroll_month,
+    rebuild_event_index,
+)
+from lib.attendance_rules import State
+from lib.time_jst import _JST, now_jst
+
+
+def _best_ms(fn, repeat: int) -> tuple[float, int]:
+    best = None
+    n = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = sum(1 for _ in fn())
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return round(best * 1000.0, 2), n
+
+
+def _dir_bytes(d: Path, ym: str) -> int:
+    return sum(p.stat().st_size for p in d.glob(f"{ym}.*") if not p.name.endswith(".ckpt.json"))
+
+
+def _scans(root: Path, ym: str, repeat: int) -> dict:
+    day = f"{ym}-15"
+    emp = next(o["emp"] for o in query_events_month(root, ym, day=day) if o.get("emp") != "unknown")
+    out = {}
+    for name, fn in (
+        ("events_ms", lambda: iter_events_month(root, ym)),
+        ("decoded_ms", lambda: iter_decoded_month_from(root, ym, 0)),
+        ("events_day_ms", lambda: query_events_month(root, ym, day=day)),
+        ("events_emp_ms", lambda: query_events_month(root, ym, emp=emp)),
+        ("events_day_emp_ms", lambda: query_events_month(root, ym, day=day, emp=emp)),
+        ("payroll_ms", lambda: iter_payroll_month(root, ym)),
+        ("payroll_day_ms", lambda: query_payroll_month(root, ym, day=day)),
+    ):
+        out[name], out[name.replace("_ms", "_rows")] = _best_ms(fn, repeat)
+    t0 = time.perf_counter()
+    State.restore(root, datetime(int(ym[0:4]), int(ym[5:7]), 28, 23, tzinfo=_JST))
+    out["restore_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=100)
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--block-kb", default="8,32,128")
+    args = ap.parse_args()
+
+    months = months_between("2025-01", "2026-12")[: args.months]
+    ym = months[len(months) // 2]
+    res = {"at": now_jst().isoformat(), "emps": args.emps, "months": len(months), "sample_month": ym}
+    with tempfile.TemporaryDirectory() as td:
+        src = Path(td) / "src"
+        write_employees(src, args.emps)
+        evs = []
+        for m in months:
+            evs += rule_events(synth_taps(m, args.emps, args.seed), args.seed)
+        write_events(src, evs)
+        for m in months:
+            rebuild_event_index(src, m)
+            _build_month(src, m)
+        ev_dir = src / "state" / "attendance" / "events"
+        pay_dir = src / "state" / "attendance" / "payroll"
+        res["events"] = len(evs)
+        res["live_bytes"] = sum(_dir_bytes(ev_dir, m) + _dir_bytes(pay_dir, m) for m in months)
+        res["live"] = _scans(src, ym, args.repeat)
+
+        for codec in ("gzip", "lzma"):
+            for kb in [int(k) for k in args.block_kb.split(",") if k]:
+                root = Path(td) / f"{codec}_{kb}"
+                shutil.copytree(src, root)
+                t0 = time.perf_counter()
+                for m in months:
+                    archive_month(root, m, codec, kb * 1024)
+                archive_s = time.perf_counter() - t0
+                ev = root / "state" / "attendance" / "events"
+                pay = root / "state" / "attendance" / "payroll"
+                stored = sum(_dir_bytes(ev, m) + _dir_bytes(pay, m) for m in months)
+                r = {"archive_sec": round(archive_s, 2), "stored_bytes": stored, "ratio": round(res["live_bytes"] / stored, 2)}
+                r.update(_scans(root, ym, args.repeat))
+                res[f"{codec}_{kb}k"] = r
+                shutil.rmtree(root)
+    print(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.synth import rule_events, synth_taps, write_events
+from lib import time_jst
+from lib.attendance_store import decode_event, decode_line, iter_decoded_month_from
+from lib.payroll_calc import PayrollState
+from lib.time_jst import date_jst, now_jst, parse_iso
+
+
+def _legacy_payroll(lines: list[bytes]) -> int:
+    n = 0
+    for raw in lines:
+        o = json.loads(raw)
+        ts = parse_iso(o["ts"])
+        n += len(str(date_jst(ts)))
+    return n
+
+
+def _legacy_restore(lines: list[bytes]) -> int:
+    n = 0
+    for raw in lines:
+        o = json.loads(raw)
+        ts = parse_iso(str(o.get("ts", "")))
+        n += date_jst(ts).day
+    return n
+
+
+def _decode_lines(lines: list[bytes]) -> int:
+    n = 0
+    for raw in lines:
+        n += decode_line(raw).day
+    return n
+
+
+def _decode_dicts(dicts: list[dict]) -> int:
+    n = 0
+    for o in dicts:
+        n += decode_event(o).day
+    return n
+
+
+def _cold():
+    time_jst.parse_ts.cache_clear()
+    time_jst.day_iso.cache_clear()
+
+
+def _run_ns(fn, arg, n: int, cold: bool) -> float:
+    if cold:
+        _cold()
+    t0 = time.perf_counter_ns()
+    fn(arg)
+    return (time.perf_counter_ns() - t0) / n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=100)
+    ap.add_argument("--month", default="2026-03")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=7)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        write_events(root, rule_events(synth_taps(args.month, args.emps, args.seed), args.seed))
+        path = root / "state" / "attendance" / "events" / f"{args.month}.jsonl"
+        lines = path.read_bytes().splitlines(keepends=True)
+        dicts = [json.loads(raw) for raw in lines]
+        n = len(lines)
+
+        def build(_):
+            ps = PayrollState()
+            ps.add_events([ev for _end, ev in iter_decoded_month_from(root, args.month, 0)])
+            return ps
+
+        cases = (
+            ("legacy_payroll", _legacy_payroll, lines, False),
+            ("legacy_restore", _legacy_restore, lines, False),
+            ("decode_line_cold", _decode_lines, lines, True),
+            ("decode_line_warm", _decode_lines, lines, False),
+            ("decode_dict_cold", _decode_dicts, dicts, True),
+            ("file_to_payroll_state", build, None, True),
+        )
+        times = {name: [] for name, _fn, _arg, _cold in cases}
+        for _ in range(args.repeat):
+            for name, fn, arg, cold in cases:
+                times[name].append(_run_ns(fn, arg, n, cold))
+
+        res = {"at": now_jst().isoformat(), "events": n, "distinct_ts": len({o["ts"] for o in dicts})}
+        for name, ts in times.items():
+            res[f"{name}_ns"] = round(min(ts), 1)
+            res[f"{name}_median_ns"] = round(statistics.median(ts), 1)
+        res["speedup_cold_vs_payroll"] = round(res["legacy_payroll_ns"] / res["decode_line_cold_ns"], 2)
+        res["speedup_warm_vs_payroll"] = round(res["legacy_payroll_ns"] / res["decode_line_warm_ns"], 2)
+    print(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main()
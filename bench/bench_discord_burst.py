@@ -0,0 +1,100 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.stub_webhook import StubWebhook
+from lib.discord_sender import DiscordSender
+from lib.http_pool import HttpPool
+
+
+def _inline_post(pool: HttpPool, url: str, text: str) -> None:
+    body = json.dumps({"content": text}, ensure_ascii=False).encode("utf-8")
+    for i in range(3):
+        try:
+            resp = pool.fetch("POST", url, body=body, headers={"Content-Type": "application/json"}, timeout_sec=10)
+            if resp.status < 300:
+                return
+        except Exception:
+            pass
+        if i < 2:
+            time.sleep(1.0)
+
+
+def _lines(n: int) -> list[str]:
+    return [f"2026-04-01 08:{i % 60:02d}  従業員{i:03d}  IN" for i in range(n)]
+
+
+def _tap_at(t0: float, i: int, gap_ms: float) -> float:
+    t = t0 + i * gap_ms / 1000.0
+    left = t - time.perf_counter()
+    if left > 0:
+        time.sleep(left)
+    return t
+
+
+def _pct(xs: list[float], p: float) -> float:
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(p * len(s)))]
+
+
+def _summary(name: str, stub: StubWebhook, lines: list[str], sent: dict, wall: float) -> dict:
+    got = {}
+    for t, ln in stub.lines:
+        got.setdefault(ln, t)
+    lag = [(got[ln] - sent[ln]) * 1000.0 for ln in lines if ln in got]
+    return {
+        "case": name,
+        "taps": len(lines),
+        "delivered": len(lag),
+        "webhook_posts": stub.posts,
+        "http_429": stub.rejected_429,
+        "tail_blocked_sec": round(wall, 3),
+        "lag_p50_ms": round(_pct(lag, 0.5), 1) if lag else None,
+        "lag_max_ms": round(max(lag), 1) if lag else None,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--taps", type=int, default=100)
+    ap.add_argument("--gap-ms", type=float, default=20.0)
+    args = ap.parse_args()
+    lines = _lines(args.taps)
+    rows = []
+
+    stub = StubWebhook().start()
+    pool = HttpPool()
+    sent = {}
+    t0 = time.perf_counter()
+    for i, ln in enumerate(lines):
+        sent[ln] = _tap_at(t0, i, args.gap_ms)
+        _inline_post(pool, stub.url, ln)
+    rows.append(_summary("inline_retry", stub, lines, sent, time.perf_counter() - t0))
+    stub.stop()
+    pool.close()
+
+    stub = StubWebhook().start()
+    pool = HttpPool()
+    sender = DiscordSender(stub.url, pool=pool)
+    sent = {}
+    t0 = time.perf_counter()
+    for i, ln in enumerate(lines):
+        sent[ln] = _tap_at(t0, i, args.gap_ms)
+        sender.submit(ln)
+    wall = time.perf_counter() - t0
+    sender.close(60.0)
+    row = _summary("queued_coalescing", stub, lines, sent, wall)
+    row["sender"] = sender.stats()
+    rows.append(row)
+    stub.stop()
+    pool.close()
+
+    print(json.dumps({"results": rows}, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.synth import synth_events
+from lib.env_loader import EmployeeRegistry, env_int, load_employee_env
+from lib.payroll_calc import PayrollState, payroll_record
+from lib.time_jst import _JST, iso_jst
+
+
+def _build_per_call(root: Path, ps: PayrollState) -> int:
+    flags = ps.final_flags()
+    n = 0
+    for emp, d in ps.keys():
+        e = load_employee_env(root, emp)
+        unit = env_int(e, "ROUND_UNIT_MINUTES", 5)
+        rates = (env_int(e, "HOURLY_YEN", 0), unit if unit > 0 else 5)
+        rec = payroll_record(emp, d, int(ps.mins.get((emp, d), 0)), flags.get((emp, d), set()), rates)
+        if rec is not None:
+            rec["name"] = str(load_employee_env(root, emp).get("NAME", "")).strip()
+            n += 1
+    return n
+
+
+def _build_registry(reg: EmployeeRegistry, ps: PayrollState) -> int:
+    flags = ps.final_flags()
+    n = 0
+    for emp, d in ps.keys():
+        rec = payroll_record(emp, d, int(ps.mins.get((emp, d), 0)), flags.get((emp, d), set()), reg.rates(emp))
+        if rec is not None:
+            rec["name"] = reg.name(emp)
+            n += 1
+    return n
+
+
+def _best(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None or dt < best else best
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=200)
+    ap.add_argument("--days", type=int, default=31)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        emp_dir = root / "config" / "employees"
+        emp_dir.mkdir(parents=True)
+        for i in range(args.emps):
+            (emp_dir / f"emp{i + 1:03d}.env").write_text(f"# employee {i + 1}\nNAME=Emp_{i + 1}\nHOURLY_YEN={1000 + i}\nROUND_UNIT_MINUTES=5\n", encoding="utf-8")
+
+        evs = []
+        for ev in synth_events(datetime(2026, 3, 1, tzinfo=_JST), args.days, args.emps):
+            ev["ts"] = iso_jst(ev["ts"])
+            evs.append(ev)
+        ps = PayrollState()
+        ps.add_events(evs)
+
+        t_old = _best(lambda: _build_per_call(root, ps), args.repeat)
+        t_cold = _best(lambda: _build_registry(EmployeeRegistry(root), ps), args.repeat)
+        warm = EmployeeRegistry(root)
+        warm.refresh()
+        t_warm = _best(lambda: _build_registry(warm, ps), args.repeat)
+
+        reg = EmployeeRegistry(root, check_interval_sec=0.0)
+        reg.refresh()
+        t_reval = _best(reg.refresh, args.repeat)
+
+        names = [ev["emp"] for ev in evs]
+        t_lookup = _best(lambda: [warm.name(e) for e in names], args.repeat)
+
+    out = {
+        "employees": args.emps,
+        "days": args.days,
+        "keys": len(ps.keys()),
+        "month_build_per_call_parse_ms": round(t_old * 1e3, 2),
+        "month_build_registry_cold_ms": round(t_cold * 1e3, 2),
+        "month_build_registry_warm_ms": round(t_warm * 1e3, 2),
+        "speedup_cold": round(t_old / t_cold, 1),
+        "revalidate_unchanged_ms": round(t_reval * 1e3, 3),
+        "name_lookup_ns": round(t_lookup / len(names) * 1e9, 1),
+    }
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
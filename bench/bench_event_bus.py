@@ -0,0 +1,127 @@
+import argparse
+import json
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from lib.attendance_store import EventWriter
+from lib.event_bus import EventBus, EventSubscriber
+from lib.time_jst import now_jst
+
+
+def _pct(xs: list[float], p: float) -> float:
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(p * len(s)))]
+
+
+def _append_lat(writer: EventWriter, n: int, gap_sec: float, tag: str) -> list[float]:
+    out = []
+    ts = now_jst()
+    for i in range(n):
+        t0 = time.perf_counter()
+        writer.append({"id": f"{tag}{i}", "ts": ts, "uid": f"U{i % 300}", "emp": f"E{i % 300:03d}", "act": "IN", "t": t0})
+        out.append((time.perf_counter() - t0) * 1e6)
+        if gap_sec:
+            time.sleep(gap_sec)
+    return out
+
+
+def _collect(sub: EventSubscriber, want: int, got: list, stop: threading.Event) -> None:
+    try:
+        for item in sub.events(stop):
+            if item is None:
+                continue
+            got.append((time.perf_counter(), item[2]))
+            if len(got) >= want:
+                return
+    except ConnectionError:
+        return
+
+
+def _collect_resume(path: Path, ym: str, want: int, got: list, stop: threading.Event, reconnects: list) -> None:
+    offset = 0
+    while len(got) < want and not stop.is_set():
+        sub = EventSubscriber(path, ym, offset)
+        try:
+            for item in sub.events(stop):
+                if item is None:
+                    continue
+                ym, offset, ev = item
+                got.append((time.perf_counter(), ev))
+                if len(got) >= want:
+                    return
+        except ConnectionError:
+            reconnects.append(offset)
+        finally:
+            sub.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=3000)
+    ap.add_argument("--gap-ms", type=float, default=0.5)
+    args = ap.parse_args()
+    gap = args.gap_ms / 1000.0
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        writer = EventWriter(root)
+        writer.open_month(now_jst())
+        base = _append_lat(writer, args.n, gap, "a")
+
+        bus = EventBus(root, root / "bus.sock", max_pending=256).start(writer.position())
+        writer.on_append = bus.publish
+        stop = threading.Event()
+
+        slow = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        slow.connect(str(root / "bus.sock"))
+        slow.sendall(b"{}\n")
+
+        fast_got = []
+        fast = EventSubscriber(root / "bus.sock")
+        th_fast = threading.Thread(target=_collect, args=(fast, args.n, fast_got, stop), daemon=True)
+        th_fast.start()
+        time.sleep(0.2)
+
+        with_bus = _append_lat(writer, args.n, gap, "b")
+
+        replay_got = []
+        ym = writer.position()[0]
+        reconnects = []
+        th_late = threading.Thread(target=_collect_resume, args=(root / "bus.sock", ym, 3 * args.n, replay_got, stop, reconnects), daemon=True)
+        th_late.start()
+        time.sleep(0.05)
+        _append_lat(writer, args.n, 0.0, "c")
+        th_fast.join(10.0)
+        th_late.join(10.0)
+        stop.set()
+
+        lat = [(t - ev["t"]) * 1e3 for t, ev in fast_got]
+        ids = [ev["id"] for _, ev in replay_got]
+        expect = [f"{tag}{i}" for tag in "abc" for i in range(args.n)]
+        out = {
+            "events": args.n,
+            "append_us_no_bus": {"p50": round(_pct(base, 0.5), 1), "p99": round(_pct(base, 0.99), 1), "max": round(max(base), 1)},
+            "append_us_with_bus_and_stalled_subscriber": {"p50": round(_pct(with_bus, 0.5), 1), "p99": round(_pct(with_bus, 0.99), 1), "max": round(max(with_bus), 1)},
+            "tap_to_subscriber_ms": {"p50": round(_pct(lat, 0.5), 3), "p99": round(_pct(lat, 0.99), 3), "max": round(max(lat), 3)} if lat else None,
+            "fast_received": len(fast_got),
+            "replay_subscriber_received": len(ids),
+            "replay_in_order_no_gaps": ids == expect,
+            "replay_reconnects_after_overflow": len(reconnects),
+            "bus": bus.stats(),
+        }
+        fast.close()
+        slow.close()
+        bus.close()
+        writer.close()
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.synth import synth_events, write_events
+from lib.attendance_store import (
+    _emp_needle,
+    _event_day,
+    _event_parts,
+    _live_lines,
+    _loads_line,
+    _parse_index_line,
+    _scan_log,
+    event_index_path,
+    iter_events_month,
+    rebuild_event_index,
+)
+from lib.time_jst import _JST
+
+
+def query_events_month(repo_root: Path, ym: str, day: str | None = None, emp: str | None = None):
+    seg, p, skip = _event_parts(repo_root, ym)
+    if seg is not None:
+        needle = _emp_needle(emp)
+        for raw in seg.query(day, emp):
+            if needle is not None and needle not in raw:
+                continue
+            o = _loads_line(raw)
+            if o is None:
+                continue
+            if day is not None and _event_day(o) != day:
+                continue
+            if emp is not None and str(o.get("emp", "")) != emp:
+                continue
+            yield o
+    if p is None:
+        return
+    if skip:
+        for _end, raw in _live_lines(p, skip):
+            o = _loads_line(raw)
+            if o is None:
+                continue
+            if day is not None and _event_day(o) != day:
+                continue
+            if emp is not None and str(o.get("emp", "")) != emp:
+                continue
+            yield o
+        return
+    size = p.stat().st_size
+    hits = []
+    end = 0
+    idx = event_index_path(p)
+    if idx.exists():
+        with open(idx, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        last = None
+        for line in reversed(lines):
+            last = _parse_index_line(line)
+            if last is not None:
+                break
+        if last is not None and last[0] + last[1] <= size:
+            end = last[0] + last[1]
+            for line in lines:
+                parts = line.split("\t")
+                if len(parts) != 4:
+                    continue
+                if (day is None or parts[2] == day) and (emp is None or parts[3] == emp):
+                    try:
+                        hits.append((int(parts[0]), int(parts[1])))
+                    except Exception:
+                        continue
+
+    with open(p, "rb") as f:
+        i = 0
+        while i < len(hits):
+            start = hits[i][0]
+            stop = start + hits[i][1]
+            j = i + 1
+            while j < len(hits) and hits[j][0] == stop:
+                stop += hits[j][1]
+                j += 1
+            f.seek(start)
+            for raw in f.read(stop - start).splitlines():
+                o = _loads_line(raw)
+                if o is not None:
+                    yield o
+            i = j
+
+    for _off, _ln, o in _scan_log(p, end, size):
+        if day is not None and _event_day(o) != day:
+            continue
+        if emp is not None and str(o.get("emp", "")) != emp:
+            continue
+        yield o
+
+
+def _time(fn) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    n = sum(1 for _ in fn())
+    return time.perf_counter() - t0, n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=100000)
+    ap.add_argument("--days", type=int, default=30)
+    args = ap.parse_args()
+
+    emps = max(1, args.events // (2 * args.days))
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        n = write_events(root, synth_events(datetime(2026, 3, 1, tzinfo=_JST), args.days, emps))
+        ym = "2026-03"
+        log = root / "state" / "attendance" / "events" / f"{ym}.jsonl"
+
+        t0 = time.perf_counter()
+        rebuild_event_index(root, ym)
+        t_rebuild = time.perf_counter() - t0
+
+        day = "2026-03-15"
+        emp = "emp007"
+        cases = {
+            "day": (
+                lambda: (e for e in iter_events_month(root, ym) if str(e.get("ts", ""))[:10] == day),
+                lambda: query_events_month(root, ym, day=day),
+            ),
+            "emp": (
+                lambda: (e for e in iter_events_month(root, ym) if e.get("emp") == emp),
+                lambda: query_events_month(root, ym, emp=emp),
+            ),
+            "day_emp": (
+                lambda: (e for e in iter_events_month(root, ym) if e.get("emp") == emp and str(e.get("ts", ""))[:10] == day),
+                lambda: query_events_month(root, ym, day=day, emp=emp),
+            ),
+        }
+        out = {
+            "events": n,
+            "log_bytes": log.stat().st_size,
+            "index_bytes": event_index_path(log).stat().st_size,
+            "rebuild_ms": round(t_rebuild * 1000, 1),
+            "queries": [],
+        }
+        for name, (scan, query) in cases.items():
+            ts, ns = _time(scan)
+            tq, nq = _time(query)
+            if ns != nq:
+                raise RuntimeError(f"mismatch case={name} scan={ns} query={nq}")
+            out["queries"].append({"query": name, "rows": nq, "full_scan_ms": round(ts * 1000, 1), "indexed_ms": round(tq * 1000, 1)})
+
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
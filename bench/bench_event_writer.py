@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from lib import attendance_store
+from lib.attendance_store import EventWriter, append_event, month_events_path
+from lib.time_jst import _JST
+
+
+def _pct(xs: list[float], q: float) -> float:
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))] if s else 0.0
+
+
+def _events(n: int):
+    t0 = datetime(2026, 3, 2, 8, 0, tzinfo=_JST)
+    for i in range(n):
+        yield {"id": f"{i:032x}", "ts": t0 + timedelta(seconds=i), "uid": f"{i % 200:014X}", "emp": f"emp{i % 200:03d}", "act": "IN" if i % 2 == 0 else "OUT"}
+
+
+def _run(name: str, n: int, fn_factory) -> dict:
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        append, close = fn_factory(root)
+        lat = []
+        evs = list(_events(n))
+        t0 = time.perf_counter()
+        for ev in evs:
+            a = time.perf_counter()
+            append(ev)
+            lat.append(time.perf_counter() - a)
+        close()
+        wall = time.perf_counter() - t0
+    return {
+        "mode": name,
+        "events": n,
+        "events_per_sec": round(n / wall, 1) if wall > 0 else 0.0,
+        "p50_us": round(_pct(lat, 0.50) * 1e6, 1),
+        "p99_us": round(_pct(lat, 0.99) * 1e6, 1),
+        "max_us": round(max(lat) * 1e6, 1),
+    }
+
+
+def _legacy(root: Path):
+    def append(ev):
+        append_event(month_events_path(root, ev["ts"]), ev)
+        o = dict(ev)
+        o["ts"] = o["ts"].isoformat()
+        json.dumps(o, ensure_ascii=False, separators=(",", ":"))
+
+    return append, lambda: None
+
+
+def _writer(mode: str, interval_ms: int, interval_n: int):
+    def factory(root: Path):
+        w = EventWriter(root, mode=mode, interval_ms=interval_ms, interval_events=interval_n)
+        return w.append, w.close
+
+    return factory
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=500)
+    ap.add_argument("--fsync-delay-ms", type=float, default=8.0)
+    ap.add_argument("--interval-ms", type=int, default=50)
+    ap.add_argument("--interval-n", type=int, default=32)
+    args = ap.parse_args()
+
+    real_fsync = os.fsync
+    delay = args.fsync_delay_ms / 1000.0
+
+    def slow_fsync(fd):
+        time.sleep(delay)
+        real_fsync(fd)
+
+    attendance_store.os.fsync = slow_fsync
+    try:
+        out = [
+            _run("legacy_open_per_event", args.events, _legacy),
+            _run("none", args.events, _writer("none", args.interval_ms, args.interval_n)),
+            _run("interval", args.events, _writer("interval", args.interval_ms, args.interval_n)),
+            _run("event", args.events, _writer("event", args.interval_ms, args.interval_n)),
+        ]
+    finally:
+        attendance_store.os.fsync = real_fsync
+
+    print(json.dumps({"fsync_delay_ms": args.fsync_delay_ms, "writer": out}, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import json
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.stub_gas import StubGas
+from bench.synth import synth_events
+from lib.gas_sync import post_records, sync_records_delta
+from lib.payroll_calc import build_daily_payroll_records
+from lib.time_jst import _JST, iso_jst
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=50)
+    ap.add_argument("--days", type=int, default=28)
+    args = ap.parse_args()
+
+    evs = []
+    for ev in synth_events(datetime(2026, 3, 1, tzinfo=_JST), args.days, args.emps):
+        ev = dict(ev)
+        ev["ts"] = iso_jst(ev["ts"])
+        evs.append(ev)
+    per_day = 2 * args.emps
+
+    full = StubGas().start()
+    delta = StubGas().start()
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            for day in range(1, args.days + 1):
+                recs, _ = build_daily_payroll_records(root, evs[: day * per_day])
+                if day == args.days // 2 and recs:
+                    recs = recs[1:]
+                b0 = full.bytes_in
+                post_records(full.url, recs, None, 10)
+                b1 = delta.bytes_in
+                ack = sync_records_delta(root, "2026-03", recs, delta.url, None, 10, 1, 0.0)
+                rows.append(
+                    {
+                        "day": day,
+                        "records": len(recs),
+                        "full_bytes": full.bytes_in - b0,
+                        "delta_bytes": delta.bytes_in - b1,
+                        "delta_sent": ack.get("sent_records", 0),
+                        "delta_deletes": ack.get("sent_deletes", 0),
+                    }
+                )
+            if full.rows != delta.rows:
+                raise RuntimeError("stub rows diverged")
+    finally:
+        full.stop()
+        delta.stop()
+
+    tot_full = sum(r["full_bytes"] for r in rows)
+    tot_delta = sum(r["delta_bytes"] for r in rows)
+    out = {
+        "days": rows[-5:],
+        "month_full_bytes": tot_full,
+        "month_delta_bytes": tot_delta,
+        "ratio": round(tot_full / tot_delta, 1) if tot_delta else None,
+        "full_posts": full.posts,
+        "delta_posts": delta.posts,
+    }
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
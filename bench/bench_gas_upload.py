@@ -0,0 +1,87 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.stub_gas import StubGas
+from lib.gas_sync import post_records, post_records_chunked
+
+
+def _records(n: int) -> list[dict]:
+    out = []
+    for i in range(n):
+        emp = f"E{i % 200:03d}"
+        d = f"2026-{1 + (i // 6000) % 12:02d}-{1 + (i // 200) % 28:02d}"
+        out.append(
+            {
+                "id": f"{d}|{emp}|{i}",
+                "date": d,
+                "emp": emp,
+                "min_raw": 480 + i % 37,
+                "min": 480,
+                "yen_h": 1200,
+                "yen": 9600,
+                "flags": ["rounded"] if i % 7 == 0 else [],
+            }
+        )
+    return out
+
+
+def _run(name: str, stub: StubGas, fn) -> dict:
+    b0 = stub.bytes_in
+    p0 = stub.posts
+    t0 = time.perf_counter()
+    err = ""
+    try:
+        fn(stub.url)
+    except Exception as e:
+        err = str(e)[:120]
+    dt = time.perf_counter() - t0
+    row = {"case": name, "wall_sec": round(dt, 3), "posts": stub.posts - p0, "bytes": stub.bytes_in - b0, "rows": len(stub.rows)}
+    if err:
+        row["error"] = err
+    return row
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=int, default=12000)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--chunk", type=int, default=500)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--max-body-kb", type=int, default=1024)
+    args = ap.parse_args()
+
+    recs = _records(args.records)
+    lat = args.latency_ms / 1000.0
+    limit = args.max_body_kb * 1024
+    cases = [
+        ("single", {}, lambda u: post_records(u, recs, None, 60)),
+        ("chunked_seq", {}, lambda u: post_records_chunked(u, recs, None, 60, chunk_size=args.chunk, workers=1)),
+        ("chunked_par", {}, lambda u: post_records_chunked(u, recs, None, 60, chunk_size=args.chunk, workers=args.workers)),
+        ("chunked_par_gzip", {}, lambda u: post_records_chunked(u, recs, None, 60, chunk_size=args.chunk, workers=args.workers, gzip_body=True)),
+        (
+            "chunked_par_gzip_flaky",
+            {"fail_every": 5},
+            lambda u: post_records_chunked(u, recs, None, 60, chunk_size=args.chunk, workers=args.workers, gzip_body=True, retries=4, backoff_sec=0.05),
+        ),
+    ]
+    rows = []
+    for name, kw, fn in cases:
+        stub = StubGas(latency_sec=lat, max_body_bytes=limit, **kw).start()
+        try:
+            row = _run(name, stub, fn)
+            row["failures_injected"] = stub.failures
+            rows.append(row)
+        finally:
+            stub.stop()
+
+    out = {"records": args.records, "latency_ms": args.latency_ms, "max_body_kb": args.max_body_kb, "results": rows}
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.stub_gas import StubGas
+from lib.http_pool import HttpPool
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def _legacy_post(url: str, body: bytes, ctx) -> dict:
+    opener = urllib.request.build_opener(_NoRedirect(), urllib.request.HTTPSHandler(context=ctx))
+    cur_url, method, data = url, "POST", body
+    for _ in range(10):
+        req = urllib.request.Request(cur_url, data=data, method=method)
+        req.add_header("Content-Type", "application/json")
+        try:
+            with opener.open(req, timeout=10) as resp:
+                return json.loads(resp.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            loc = e.headers.get("Location", "")
+            e.read()
+            if e.code in (301, 302, 303, 307, 308) and loc:
+                cur_url = loc
+                if e.code in (301, 302, 303):
+                    method, data = "GET", None
+                continue
+            raise
+    raise RuntimeError("too_many_redirects")
+
+
+def _pool_post(pool: HttpPool, url: str, body: bytes) -> dict:
+    resp = pool.fetch("POST", url, body=body, headers={"Content-Type": "application/json"}, timeout_sec=10)
+    return json.loads(resp.body or b"{}")
+
+
+def _make_cert(td: Path) -> Path:
+    key = td / "key.pem"
+    crt = td / "crt.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+            "-nodes", "-keyout", str(key), "-out", str(crt), "-days", "1", "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=IP:127.0.0.1,DNS:localhost",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    pem = td / "both.pem"
+    pem.write_bytes(crt.read_bytes() + key.read_bytes())
+    return pem
+
+
+def _pct(xs: list[float], p: float) -> float:
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(p * len(s)))]
+
+
+def _case(name: str, stub: StubGas, n: int, fn) -> dict:
+    c0 = stub.connections
+    lat = []
+    for i in range(n):
+        body = json.dumps({"records": [{"id": f"r{i}", "v": i}]}).encode("utf-8")
+        t0 = time.perf_counter()
+        ack = fn(stub.url, body)
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        if not ack.get("ok"):
+            raise RuntimeError(f"bad ack {ack}")
+    return {
+        "case": name,
+        "requests": n,
+        "tcp_tls_connections": stub.connections - c0,
+        "mean_ms": round(sum(lat) / n, 3),
+        "p50_ms": round(_pct(lat, 0.5), 3),
+        "p99_ms": round(_pct(lat, 0.99), 3),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200)
+    args = ap.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as td:
+        pem = _make_cert(Path(td))
+        ctx = ssl.create_default_context(cafile=str(pem))
+        for moved in (False, True):
+            tag = "moved_" if moved else ""
+            stub = StubGas(certfile=str(pem), moved=moved).start()
+            try:
+                rows.append(_case(f"{tag}urllib_per_call", stub, args.n, lambda u, b: _legacy_post(u, b, ctx)))
+                pool = HttpPool(ssl_context=ctx)
+                rows.append(_case(f"{tag}pool_keepalive", stub, args.n, lambda u, b: _pool_post(pool, u, b)))
+                st = pool.stats()
+                rows[-1]["redirect_cache_hits"] = st["redirect_cache_hits"]
+                rows[-1]["reused"] = st["reused"]
+                pool.close()
+            finally:
+                stub.stop()
+
+    base = {r["case"]: r["mean_ms"] for r in rows}
+    out = {
+        "results": rows,
+        "saved_ms_per_request": round(base["urllib_per_call"] - base["pool_keepalive"], 3),
+        "saved_ms_per_request_moved": round(base["moved_urllib_per_call"] - base["moved_pool_keepalive"], 3),
+    }
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.synth import rule_events, synth_taps, write_employees, write_events
+from lib.attendance_store import iter_decoded_month_from
+from lib.event_merge import SiteMerge, site_roots
+from lib.payroll_calc import build_daily_payroll_records
+from lib.time_jst import now_jst
+
+
+def _split(evs: list, n_sites: int, move: float, dup: float, seed: int) -> list[list]:
+    rng = random.Random(seed)
+    home = {}
+    out = [[] for _ in range(n_sites)]
+    for ev in evs:
+        emp = ev["emp"]
+        if emp not in home:
+            home[emp] = rng.randrange(n_sites)
+        s = home[emp] if emp != "unknown" and rng.random() >= move else rng.randrange(n_sites)
+        out[s].append(ev)
+        if rng.random() < dup:
+            out[(s + 1 + rng.randrange(n_sites - 1)) % n_sites if n_sites > 1 else s].append(ev)
+    return out
+
+
+def _naive(root: Path, sites: list, ym: str):
+    evs = []
+    for _name, r in sites:
+        evs.extend(ev for _off, ev in iter_decoded_month_from(r, ym, 0))
+    seen = set()
+    uniq = []
+    for ev in evs:
+        if ev.id not in seen:
+            seen.add(ev.id)
+            uniq.append(ev)
+    return build_daily_payroll_records(root, uniq)
+
+
+def _merged(root: Path, sites: list, ym: str):
+    return build_daily_payroll_records(root, SiteMerge.month(sites, ym))
+
+
+def _measure(fn, *args, repeat: int = 3) -> tuple[float, float, tuple]:
+    sec = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = fn(*args)
+        dt = time.perf_counter() - t0
+        sec = dt if sec is None else min(sec, dt)
+    tracemalloc.start()
+    fn(*args)
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sec, peak / 1e6, res
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sites", type=int, default=200)
+    ap.add_argument("--emps", type=int, default=2000)
+    ap.add_argument("--month", default="2026-03")
+    ap.add_argument("--move", type=float, default=0.1)
+    ap.add_argument("--dup", type=float, default=0.02)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    evs = rule_events(synth_taps(args.month, args.emps, args.seed), args.seed)
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        write_employees(root, args.emps)
+        for i, part in enumerate(_split(evs, args.sites, args.move, args.dup, args.seed)):
+            write_events(root / "sites" / f"site{i:03d}", part)
+        sites = site_roots([root / "sites"])
+        read = sum(1 for _n, r in sites for _ in iter_decoded_month_from(r, args.month, 0))
+
+        write_events(root / "single", evs)
+        ref, _ = build_daily_payroll_records(root, [ev for _off, ev in iter_decoded_month_from(root / "single", args.month, 0)])
+        naive_s, naive_mb, (naive_recs, _) = _measure(_naive, root, sites, args.month)
+        merge_s, merge_mb, (merge_recs, summary) = _measure(_merged, root, sites, args.month)
+        m = SiteMerge.month(sites, args.month)
+        for _ in m:
+            pass
+
+    print(
+        json.dumps(
+            {
+                "at": now_jst().isoformat(),
+                "sites": len(sites),
+                "emps": args.emps,
+                "events": len(evs),
+                "events_read": read,
+                "duplicates": m.stats["duplicates"],
+                "records": len(merge_recs),
+                "matches_single_log": merge_recs == ref,
+                "naive_matches": naive_recs == ref,
+                "naive_sec": round(naive_s, 3),
+                "naive_peak_mb": round(naive_mb, 1),
+                "merge_sec": round(merge_s, 3),
+                "merge_peak_mb": round(merge_mb, 1),
+                "merge_events_per_sec": round(read / merge_s),
+                "peak_buffered": m.stats["peak_buffered"],
+                "peak_ids": m.stats["peak_ids"],
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
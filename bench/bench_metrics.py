@@ -0,0 +1,122 @@
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.synth import synth_taps
+from core.attendance_reader import TapHandler, TapMetrics
+from lib.attendance_rules import State
+from lib.attendance_store import EventWriter
+from lib.metrics import Metrics, MetricsServer, TextfileExporter
+from lib.time_jst import now_jst
+
+
+class _Map:
+    def __init__(self, taps):
+        self._m = {uid: emp for _, uid, emp in taps if emp != "unknown"}
+
+    def lookup(self, uid: str) -> str:
+        return self._m.get(uid, "unknown")
+
+
+def _handler(root: Path, taps: list, tm: TapMetrics | None):
+    writer = EventWriter(root)
+    writer.open_month(taps[0][0])
+    return TapHandler(State.empty(), threading.Lock(), _Map(taps), writer.append, tm), writer
+
+
+def _batch(handle, taps: list, timed: bool) -> float:
+    t0 = time.perf_counter()
+    if timed:
+        for ts, uid, _emp in taps:
+            handle(ts, uid, time.perf_counter_ns())
+    else:
+        for ts, uid, _emp in taps:
+            handle(ts, uid)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--batch", type=int, default=64)
+    args = ap.parse_args()
+
+    taps = synth_taps("2026-03", args.emps, 1)
+    m = Metrics({"component": "bench"})
+    tm = TapMetrics(m)
+    ratios = []
+    plain_s = 0.0
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        for r in range(args.repeat):
+            h_plain, w_plain = _handler(root / f"p{r}", taps, None)
+            h_timed, w_timed = _handler(root / f"t{r}", taps, tm)
+            for i in range(0, len(taps), args.batch):
+                chunk = taps[i : i + args.batch]
+                if (i // args.batch) % 2:
+                    b = _batch(h_timed, chunk, True)
+                    a = _batch(h_plain, chunk, False)
+                else:
+                    a = _batch(h_plain, chunk, False)
+                    b = _batch(h_timed, chunk, True)
+                ratios.append(b / a)
+                plain_s += a
+                if i % (args.batch * 8) == 0:
+                    tm.recorder.drain()
+            w_plain.close()
+            w_timed.close()
+        tm.recorder.drain()
+        h, w = _handler(root / "final", taps, tm)
+        _batch(h, taps, True)
+        w.close()
+        t0 = time.perf_counter()
+        text = m.render()
+        render_ms = (time.perf_counter() - t0) * 1000.0
+        t0 = time.perf_counter()
+        m.render()
+        render_idle_ms = (time.perf_counter() - t0) * 1000.0
+
+        exp = TextfileExporter(m, root / "metrics" / "attendance_bench.prom")
+        exp.path.parent.mkdir(parents=True)
+        t0 = time.perf_counter()
+        exp.write()
+        textfile_ms = (time.perf_counter() - t0) * 1000.0
+
+        srv = MetricsServer(m, 0)
+        with urllib.request.urlopen(f"http://127.0.0.1:{srv.port}/metrics", timeout=5) as r:
+            served = r.read().decode("utf-8")
+        srv.close()
+
+    taps_total = next(line for line in text.splitlines() if line.startswith("att_reader_taps_total"))
+    p = plain_s / (len(taps) * args.repeat)
+    over = statistics.median(ratios) - 1.0
+    print(
+        json.dumps(
+            {
+                "at": now_jst().isoformat(),
+                "taps": len(taps),
+                "tap_plain_us": round(p * 1e6, 2),
+                "overhead_pct_median": round(over * 100.0, 2),
+                "overhead_us": round(over * p * 1e6, 3),
+                "drain_render_ms": round(render_ms, 2),
+                "render_idle_ms": round(render_idle_ms, 3),
+                "textfile_write_ms": round(textfile_ms, 3),
+                "exposition_lines": len(text.splitlines()),
+                "taps_total_line": taps_total,
+                "http_matches_textfile": served.splitlines()[0] == text.splitlines()[0],
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.fake_pcsc import FakeLibpcsclite
+from core.attendance_reader import TapClock, start_reader_workers
+from lib import rcs300_pcsc
+from lib.attendance_rules import State, apply_rules
+
+
+def _run(n_readers: int, taps_total: int, delay: float, shared_uids: bool) -> dict:
+    readers = [f"Sony FeliCa Port/PaSoRi 4.0 {i:02d} 00" for i in range(n_readers)]
+    if shared_uids:
+        uids = ["0123456789ABCD"]
+    else:
+        uids = [f"{i:014X}" for i in range(taps_total * 2)]
+    rcs300_pcsc.set_native_lib(FakeLibpcsclite(readers=readers, uids=uids, insert_delay_sec=delay))
+
+    st = State.empty()
+    taps = queue.Queue()
+    stop = threading.Event()
+    t0 = time.perf_counter()
+    start_reader_workers(list(range(n_readers)), taps, TapClock(), stop)
+
+    got = 0
+    events = 0
+    last_ts = None
+    monotonic = True
+    while got < taps_total:
+        ts, uid, _ri, _t_read = taps.get()
+        got += 1
+        if last_ts is not None and ts < last_ts:
+            monotonic = False
+        last_ts = ts
+        events += len(apply_rules(st, ts, uid, "emp01"))
+    wall = time.perf_counter() - t0
+    stop.set()
+    time.sleep(delay * 2 + 0.05)
+
+    return {
+        "readers": n_readers,
+        "taps": got,
+        "events": events,
+        "wall_sec": round(wall, 4),
+        "taps_per_sec": round(got / wall, 2) if wall > 0 else 0.0,
+        "monotonic": monotonic,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--taps", type=int, default=60)
+    ap.add_argument("--max-readers", type=int, default=3)
+    ap.add_argument("--tap-delay", type=float, default=0.05)
+    args = ap.parse_args()
+
+    os.environ["ATT_PCSC_BACKEND"] = "native"
+    out = {"scaling": [], "debounce": None}
+    for n in range(1, args.max_readers + 1):
+        out["scaling"].append(_run(n, args.taps, args.tap_delay, False))
+    out["debounce"] = _run(2, 10, args.tap_delay, True)
+
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
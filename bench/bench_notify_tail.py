@@ -0,0 +1,96 @@
+import argparse
+import json
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.stub_webhook import StubWebhook
+from core.attendance_discord import follow_messages
+from lib.discord_sender import DiscordSender
+from lib.attendance_store import EventWriter
+from lib.file_watch import open_watcher
+from lib.time_jst import now_jst
+
+
+def _cpu() -> float:
+    r = resource.getrusage(resource.RUSAGE_SELF)
+    return r.ru_utime + r.ru_stime
+
+
+def _pct(xs: list[float], p: float) -> float:
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(p * len(s)))]
+
+
+def _run(mode: str, idle_sec: float, taps: int, gap_sec: float) -> dict:
+    stub = StubWebhook(bucket=1000, latency_sec=0.0).start()
+    sender = DiscordSender(stub.url)
+    stop = threading.Event()
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        writer = EventWriter(root)
+        writer.open_month(now_jst())
+        watcher = open_watcher(root / "state" / "attendance" / "events", mode=mode)
+
+        def consume():
+            for msg, _ in follow_messages(root, watcher, stop=stop):
+                sender.submit(msg)
+
+        th = threading.Thread(target=consume, daemon=True)
+        th.start()
+        time.sleep(0.5)
+
+        w0 = watcher.wakeups
+        c0 = _cpu()
+        time.sleep(idle_sec)
+        idle_wakeups = watcher.wakeups - w0
+        idle_cpu = _cpu() - c0
+
+        sent = []
+        for i in range(taps):
+            sent.append(time.perf_counter())
+            writer.append({"id": f"b{i}", "ts": now_jst(), "uid": f"U{i}", "emp": f"E{i:03d}", "act": "IN"})
+            time.sleep(gap_sec)
+        t_end = time.perf_counter() + 5.0
+        while len(stub.lines) < taps and time.perf_counter() < t_end:
+            time.sleep(0.01)
+        stop.set()
+        writer.append({"id": "stop", "ts": now_jst(), "uid": "STOP", "emp": "unknown", "act": "IN"})
+        th.join(5.0)
+        writer.close()
+        watcher.close()
+    sender.close()
+    stub.stop()
+
+    posted = [t for t, _ in stub.lines[:taps]]
+    lat = [(posted[i] - sent[i]) * 1000.0 for i in range(min(len(posted), len(sent)))]
+    return {
+        "mode": watcher.kind,
+        "idle_wakeups_per_min": round(idle_wakeups * 60.0 / idle_sec, 1),
+        "idle_cpu_ms_per_min": round(idle_cpu * 1000.0 * 60.0 / idle_sec, 2),
+        "taps": taps,
+        "posted": len(posted),
+        "tap_to_post_mean_ms": round(sum(lat) / len(lat), 2) if lat else None,
+        "tap_to_post_p50_ms": round(_pct(lat, 0.5), 2) if lat else None,
+        "tap_to_post_max_ms": round(max(lat), 2) if lat else None,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--idle-sec", type=float, default=10.0)
+    ap.add_argument("--taps", type=int, default=50)
+    ap.add_argument("--gap-ms", type=float, default=137.0)
+    args = ap.parse_args()
+
+    rows = [_run(m, args.idle_sec, args.taps, args.gap_ms / 1000.0) for m in ("poll", "inotify")]
+    print(json.dumps({"results": rows}, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
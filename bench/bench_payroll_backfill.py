@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.synth import synth_events, write_events
+from core.attendance_payroll import backfill
+from lib.attendance_store import iter_payroll_month, months_between
+from lib.payroll_calc import PayrollState, build_records
+from lib.time_jst import _JST, next_month_start_jst
+
+
+def _night_shifts(start: datetime, months: int, n: int):
+    t = start
+    for _ in range(months):
+        end = next_month_start_jst(t)
+        for i in range(n):
+            uid = f"{0x04B00000000000 + i:014X}"
+            emp = f"emp{i + 1:03d}"
+            yield {"id": f"n{end:%Y%m}{i}i", "ts": end - timedelta(hours=2, minutes=i), "uid": uid, "emp": emp, "act": "IN"}
+            yield {"id": f"n{end:%Y%m}{i}o", "ts": end + timedelta(hours=6, minutes=i), "uid": uid, "emp": emp, "act": "OUT"}
+        t = end
+
+
+def _expected(root: Path, events: list[dict], months: list[str]) -> dict:
+    ps = PayrollState()
+    ps.add_events([dict(ev, ts=ev["ts"].isoformat()) for ev in events])
+    out = {}
+    for ym in months:
+        recs = build_records(root, ps, ps.keys(ym), {})
+        out[ym] = sorted(r["id"] + json.dumps(r, sort_keys=True) for r in recs)
+    return out
+
+
+def _actual(root: Path, months: list[str]) -> dict:
+    out = {}
+    for ym in months:
+        out[ym] = sorted(r["id"] + json.dumps({k: v for k, v in r.items() if k != "name"}, sort_keys=True) for r in iter_payroll_month(root, ym))
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=60)
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--workers", default="")
+    args = ap.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = sorted({int(w) for w in args.workers.split(",") if w.strip()} or {1, 2, 4, cpus})
+    start = datetime(2024, 1, 1, tzinfo=_JST)
+    end = start
+    for _ in range(args.months):
+        end = next_month_start_jst(end)
+    days = (end - start).days
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        emp_dir = root / "config" / "employees"
+        emp_dir.mkdir(parents=True)
+        for i in range(args.emps):
+            (emp_dir / f"emp{i + 1:03d}.env").write_text(f"NAME=Emp_{i + 1}\nHOURLY_YEN={1000 + i}\nROUND_UNIT_MINUTES=5\n", encoding="utf-8")
+        evs = list(synth_events(start, days, args.emps))
+        evs.extend(_night_shifts(start, args.months, min(5, args.emps)))
+        evs.sort(key=lambda ev: ev["ts"])
+        write_events(root, evs)
+        months = months_between(f"{start:%Y-%m}", f"{end - timedelta(days=1):%Y-%m}")
+
+        res = {"events": len(evs), "months": len(months), "cpus": cpus}
+        base = None
+        for w in workers:
+            t0 = time.perf_counter()
+            out = list(backfill(root, months, full=True, workers=w))
+            ms = (time.perf_counter() - t0) * 1000.0
+            if [s["month"] for s in out] != months:
+                raise RuntimeError("backfill_out_of_order")
+            if base is None:
+                base = ms
+            res[f"workers_{w}_ms"] = round(ms, 1)
+            res[f"workers_{w}_speedup"] = round(base / ms, 2)
+        res["matches_continuous_build"] = _actual(root, months) == _expected(root, evs, months)
+    print(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main()
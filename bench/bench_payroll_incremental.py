@@ -0,0 +1,58 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.synth import synth_events, write_events
+from core.attendance_payroll import _build_month
+from lib.time_jst import _JST
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=200)
+    ap.add_argument("--days", type=int, default=28)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        emp_dir = root / "config" / "employees"
+        emp_dir.mkdir(parents=True)
+        for i in range(args.emps):
+            (emp_dir / f"emp{i + 1:03d}.env").write_text(f"NAME=Emp_{i + 1}\nHOURLY_YEN={1000 + i}\nROUND_UNIT_MINUTES=5\n", encoding="utf-8")
+
+        evs = list(synth_events(datetime(2026, 3, 1, tzinfo=_JST), args.days, args.emps))
+        per_day = 2 * args.emps
+        write_events(root, evs[:-per_day])
+        _build_month(root, "2026-03", full=True)
+        write_events(root, evs[-per_day:])
+
+        t0 = time.perf_counter()
+        _build_month(root, "2026-03")
+        t_inc = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        _build_month(root, "2026-03")
+        t_noop = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        _build_month(root, "2026-03", full=True)
+        t_full = time.perf_counter() - t0
+
+    out = {
+        "events": len(evs),
+        "new_events": per_day,
+        "full_ms": round(t_full * 1000, 1),
+        "incremental_ms": round(t_inc * 1000, 1),
+        "noop_ms": round(t_noop * 1000, 1),
+    }
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
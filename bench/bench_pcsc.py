@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.fake_pcsc import FakeLibpcsclite, write_fake_opensc
+from lib import rcs300_pcsc
+
+
+def _cpu() -> float:
+    a = resource.getrusage(resource.RUSAGE_SELF)
+    b = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return a.ru_utime + a.ru_stime + b.ru_utime + b.ru_stime
+
+
+def _pct(xs: list[float], q: float) -> float:
+    if not xs:
+        return 0.0
+    s = sorted(xs)
+    i = min(len(s) - 1, max(0, int(round(q * (len(s) - 1)))))
+    return s[i]
+
+
+def _run(taps: int) -> dict:
+    lat = []
+    cpu0 = _cpu()
+    t0 = time.perf_counter()
+    for _ in range(taps):
+        a = time.perf_counter()
+        uid = rcs300_pcsc.read_uid_blocking()
+        lat.append(time.perf_counter() - a)
+        if not uid:
+            raise RuntimeError("empty uid")
+    wall = time.perf_counter() - t0
+    cpu = _cpu() - cpu0
+    return {
+        "taps": taps,
+        "wall_sec": round(wall, 6),
+        "tap_to_uid_ms_p50": round(_pct(lat, 0.50) * 1000, 3),
+        "tap_to_uid_ms_p95": round(_pct(lat, 0.95) * 1000, 3),
+        "cpu_ms_per_tap": round(cpu / taps * 1000, 3),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--taps", type=int, default=200)
+    ap.add_argument("--hold-polls", type=int, default=3)
+    args = ap.parse_args()
+
+    out = {}
+
+    with tempfile.TemporaryDirectory() as td:
+        write_fake_opensc(Path(td))
+        os.environ["PATH"] = f"{td}{os.pathsep}{os.environ.get('PATH', '')}"
+        os.environ["ATT_PCSC_BACKEND"] = "opensc"
+        out["opensc"] = _run(args.taps)
+
+    rcs300_pcsc.set_native_lib(FakeLibpcsclite(hold_polls=args.hold_polls))
+    os.environ["ATT_PCSC_BACKEND"] = "native"
+    out["native"] = _run(args.taps)
+    rcs300_pcsc.close_native_session()
+    out["registry"] = rcs300_pcsc.reader_registry_stats()
+
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
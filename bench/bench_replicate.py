@@ -0,0 +1,133 @@
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.synth import rule_events, synth_taps, write_events
+from core.attendance_collector import Collector
+from lib.http_pool import HttpPool
+from lib.replica import Replicator
+from lib.time_jst import _JST, now_jst
+
+
+def _replicator(root: Path, url: str, **kw) -> Replicator:
+    return Replicator(root, url, "site-a", pool=HttpPool(), **kw)
+
+
+def _month_end(ym: str) -> datetime:
+    return datetime(int(ym[0:4]), int(ym[5:7]), 28, 23, 59, tzinfo=_JST)
+
+
+def _throughput(td: Path, evs: list, ym: str, gzip_body: bool, batch: int) -> dict:
+    root = td / f"tp_{int(gzip_body)}_{batch}"
+    write_events(root, evs)
+    src = root / "state" / "attendance" / "events" / f"{ym}.jsonl"
+    c = Collector(td / f"col_{int(gzip_body)}_{batch}").serve()
+    try:
+        rep = _replicator(root, c.url, batch_lines=batch, batch_bytes=64 << 20, gzip_body=gzip_body)
+        t0 = time.perf_counter()
+        rep.drain(_month_end(ym))
+        sec = time.perf_counter() - t0
+        st = rep.stats()
+        dst = c.site_root("site-a") / "state" / "attendance" / "events" / f"{ym}.jsonl"
+        same = dst.read_bytes() == src.read_bytes()
+        rep2 = _replicator(root, c.url, batch_lines=batch, batch_bytes=64 << 20, gzip_body=gzip_body)
+        rep2.cursor.path.unlink()
+        rep2.drain(_month_end(ym))
+        st2 = rep2.stats()
+        same_after_resend = dst.read_bytes() == src.read_bytes()
+    finally:
+        c.close()
+    return {
+        "sec": round(sec, 3),
+        "lines_per_sec": round(st["lines"] / sec),
+        "raw_mb_per_sec": round(st["raw_bytes"] / sec / 1e6, 2),
+        "batches": st["batches"],
+        "wire_ratio": round(st["raw_bytes"] / max(1, st["sent_bytes"]), 2),
+        "identical": same,
+        "resend_duplicates": st2["duplicates"],
+        "resend_accepted": st2["accepted"],
+        "identical_after_resend": same_after_resend,
+    }
+
+
+def _outage(td: Path, evs: list, ym: str, days: int, down_sec: float) -> dict:
+    root = td / "outage"
+    cut_day = 28 - days
+    before = [ev for ev in evs if ev["ts"].day <= cut_day]
+    during = [ev for ev in evs if cut_day < ev["ts"].day <= 28]
+    write_events(root, before)
+    c = Collector(td / "col_outage").serve()
+    host, port = c._httpd.server_address[:2]
+    url = c.url
+    rep = _replicator(root, url, backoff_sec=0.25, backoff_max_sec=2.0)
+    rep.drain(_month_end(ym))
+    base = rep.stats()
+    c.close()
+    rep._pool.close()
+
+    write_events(root, during)
+    stop = threading.Event()
+    done = threading.Event()
+    box = {}
+
+    def run():
+        t0 = time.perf_counter()
+        rep.drain(_month_end(ym), stop)
+        box["end"] = time.perf_counter()
+        box["start"] = t0
+        done.set()
+
+    th = threading.Thread(target=run, daemon=True)
+    th.start()
+    time.sleep(down_sec)
+    c2 = Collector(td / "col_outage")
+    c2.serve(host, port)
+    up = time.perf_counter()
+    done.wait(600)
+    stop.set()
+    th.join(5)
+    st = rep.stats()
+    src = root / "state" / "attendance" / "events" / f"{ym}.jsonl"
+    dst = c2.site_root("site-a") / "state" / "attendance" / "events" / f"{ym}.jsonl"
+    out = {
+        "outage_days": days,
+        "backlog_lines": len(during),
+        "backlog_bytes": st["raw_bytes"] - base["raw_bytes"],
+        "collector_down_sec": down_sec,
+        "failed_posts": st["failures"],
+        "catchup_after_up_sec": round(box["end"] - up, 3),
+        "identical": dst.read_bytes() == src.read_bytes(),
+    }
+    c2.close()
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=500)
+    ap.add_argument("--month", default="2026-03")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--outage-days", type=int, default=7)
+    ap.add_argument("--down-sec", type=float, default=3.0)
+    args = ap.parse_args()
+
+    evs = [ev for ev in rule_events(synth_taps(args.month, args.emps, args.seed), args.seed) if ev["ts"].day <= 28]
+    res = {"at": now_jst().isoformat(), "emps": args.emps, "events": len(evs)}
+    with tempfile.TemporaryDirectory() as td:
+        td = Path(td)
+        for gz in (True, False):
+            for batch in (500, 2000, 8000):
+                res[f"{'gzip' if gz else 'plain'}_{batch}"] = _throughput(td, evs, args.month, gz, batch)
+        res["outage"] = _outage(td, evs, args.month, args.outage_days, args.down_sec)
+    print(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main()
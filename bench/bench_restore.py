@@ -0,0 +1,65 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.synth import synth_events, write_events
+from lib.attendance_rules import State, _apply_event_for_restore, _schedule_all
+from lib.attendance_store import iter_decoded_month
+from lib.time_jst import _JST
+
+
+def full_replay(repo_root: Path, ym: str) -> State:
+    st = State.empty()
+    for ev in iter_decoded_month(repo_root, ym):
+        _apply_event_for_restore(st, ev)
+    _schedule_all(st)
+    return st
+
+
+def _time(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None or dt < best else best
+    return best or 0.0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    out = []
+    for day in (2, 10, 20, 28):
+        with tempfile.TemporaryDirectory() as td:
+            root = Path(td)
+            start = datetime(2026, 3, 1, tzinfo=_JST)
+            n = write_events(root, synth_events(start, day, args.emps))
+            now = start + timedelta(days=day - 1, hours=12)
+
+            full = _time(lambda: full_replay(root, "2026-03"), args.repeat)
+            bounded = _time(lambda: State.restore(root, now), args.repeat)
+
+            out.append(
+                {
+                    "day_of_month": day,
+                    "events": n,
+                    "full_replay_ms": round(full * 1000, 2),
+                    "bounded_ms": round(bounded * 1000, 2),
+                }
+            )
+
+    print(json.dumps({"restore": out}, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from lib.attendance_rules import State, apply_rules, sweep_errors
+from lib.time_jst import _JST
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uids", type=int, default=10000)
+    args = ap.parse_args()
+
+    t0 = datetime(2026, 3, 2, 8, 0, tzinfo=_JST)
+    uids = [f"{0x04B00000000000 + i:014X}" for i in range(args.uids)]
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+
+    st = State.empty()
+    t_apply = time.perf_counter()
+    for i, uid in enumerate(uids):
+        apply_rules(st, t0 + timedelta(seconds=i), uid, "emp")
+    for i, uid in enumerate(uids):
+        apply_rules(st, t0 + timedelta(hours=8, seconds=i), uid, "emp")
+    t_apply = time.perf_counter() - t_apply
+    gc.collect()
+    after_day = tracemalloc.get_traced_memory()[0] - base
+
+    t_sweep = time.perf_counter()
+    sweep_errors(st, t0 + timedelta(days=1, hours=1))
+    t_sweep = time.perf_counter() - t_sweep
+    gc.collect()
+    after_next_day = tracemalloc.get_traced_memory()[0] - base
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    out = {
+        "uids": args.uids,
+        "state_bytes_after_day": after_day,
+        "state_bytes_per_uid": round(after_day / args.uids, 1),
+        "state_bytes_next_day": after_next_day,
+        "peak_bytes": peak,
+        "apply_us_per_tap": round(t_apply / (2 * args.uids) * 1e6, 2),
+        "sweep_ms": round(t_sweep * 1000, 3),
+    }
+    print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.bench_restore import full_replay
+from bench.synth import rule_events, synth_taps, write_employees, write_events
+from lib.attendance_rules import State, apply_rules, sweep_errors
+from lib.attendance_store import _iter_jsonl, iter_events_month
+from lib.payroll_calc import build_daily_payroll_records
+from lib.time_jst import _JST, iso_jst, now_jst
+
+
+def _month_end(ym: str) -> datetime:
+    start = datetime(int(ym[0:4]), int(ym[5:7]), 1, tzinfo=_JST)
+    return (start + timedelta(days=32)).replace(day=1) - timedelta(minutes=1)
+
+
+def _case_apply_rules(root: Path, p: dict):
+    taps = synth_taps(p["month"], p["emps"], p["seed"])
+
+    def run():
+        st = State.empty()
+        for ts, uid, emp in taps:
+            apply_rules(st, ts, uid, emp)
+        return st
+
+    return run, len(taps)
+
+
+def _case_sweep_errors(root: Path, p: dict):
+    taps = synth_taps(p["month"], p["emps"], p["seed"])
+    day0 = taps[0][0].replace(hour=0, minute=0, second=0)
+    first = [t for t in taps if t[0] < day0 + timedelta(days=1)]
+    ticks = [day0 + timedelta(hours=8, minutes=k) for k in range(24 * 60)]
+
+    def run():
+        st = State.empty()
+        for ts, uid, emp in first:
+            apply_rules(st, ts, uid, emp)
+        n = 0
+        for ts in ticks:
+            n += len(sweep_errors(st, ts))
+        return n
+
+    return run, len(ticks)
+
+
+def _case_iter_jsonl(root: Path, p: dict):
+    path = root / "state" / "attendance" / "events" / f"{p['month']}.jsonl"
+
+    def run():
+        return list(_iter_jsonl(path))
+
+    return run, p["events"]
+
+
+def _case_build_daily_payroll_records(root: Path, p: dict):
+    events = list(iter_events_month(root, p["month"]))
+
+    def run():
+        return build_daily_payroll_records(root, events)
+
+    return run, len(events)
+
+
+def _case_from_current_month(root: Path, p: dict):
+    def run():
+        return full_replay(root, p["month"])
+
+    return run, p["events"]
+
+
+def _case_restore(root: Path, p: dict):
+    now = _month_end(p["month"]) - timedelta(hours=12)
+
+    def run():
+        return State.restore(root, now)
+
+    return run, p["events"]
+
+
+CASES = {
+    "apply_rules": _case_apply_rules,
+    "sweep_errors": _case_sweep_errors,
+    "iter_jsonl": _case_iter_jsonl,
+    "build_daily_payroll_records": _case_build_daily_payroll_records,
+    "from_current_month": _case_from_current_month,
+    "restore": _case_restore,
+}
+
+
+def _maxrss_kib() -> int:
+    return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _measure(name: str, root: Path, p: dict) -> dict:
+    rss0 = _maxrss_kib()
+    run, items = CASES[name](root, p)
+    rss1 = _maxrss_kib()
+    run()
+
+    times = []
+    for _ in range(p["repeat"]):
+        gc.collect()
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+    rss2 = _maxrss_kib()
+
+    gc.collect()
+    blocks0 = sys.getallocatedblocks()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    keep = run()
+    cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks0
+    del keep
+
+    best = min(times)
+    return {
+        "items": items,
+        "repeat": len(times),
+        "time_min_ms": round(best * 1000.0, 3),
+        "time_median_ms": round(statistics.median(times) * 1000.0, 3),
+        "ns_per_item": round(best * 1e9 / max(1, items), 1),
+        "alloc_peak_kib": round((peak - base) / 1024.0, 1),
+        "alloc_retained_kib": round((cur - base) / 1024.0, 1),
+        "alloc_retained_blocks": blocks,
+        "rss_base_kib": rss0,
+        "rss_peak_kib": rss2,
+        "rss_run_kib": max(0, rss2 - rss1),
+    }
+
+
+def _git_rev() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parents[1], capture_output=True, text=True, timeout=10)
+        return out.stdout.strip()
+    except Exception:
+        return ""
+
+
+def _meta() -> dict:
+    return {
+        "at": iso_jst(now_jst()),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count() or 1,
+    }
+
+
+def _compare(base_path: str, new_path: str) -> dict:
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    out = {}
+    for name, b in base.get("cases", {}).items():
+        n = new.get("cases", {}).get(name)
+        if not n:
+            continue
+        out[name] = {k: round(n[k] / b[k], 3) if b.get(k) else None for k in ("time_min_ms", "alloc_peak_kib", "rss_run_kib")}
+    return {"base": base.get("meta", {}), "new": new.get("meta", {}), "ratios": out}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emps", type=int, default=100)
+    ap.add_argument("--month", default="2026-03")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", default="")
+    ap.add_argument("--out", default="")
+    ap.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+    ap.add_argument("--case")
+    ap.add_argument("--root")
+    ap.add_argument("--events", type=int, default=0)
+    args = ap.parse_args()
+
+    if args.compare:
+        print(json.dumps(_compare(*args.compare), ensure_ascii=False, separators=(",", ":")), flush=True)
+        return
+
+    params = {"month": args.month, "emps": args.emps, "seed": args.seed, "repeat": args.repeat, "events": args.events}
+    if args.case:
+        print(json.dumps(_measure(args.case, Path(args.root), params), separators=(",", ":")), flush=True)
+        return
+
+    names = [n for n in args.only.split(",") if n] or list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        raise RuntimeError(f"unknown_case {','.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        write_employees(root, args.emps)
+        taps = synth_taps(args.month, args.emps, args.seed)
+        evs = rule_events(taps, args.seed)
+        params["taps"] = len(taps)
+        params["events"] = write_events(root, evs)
+        params["errors"] = sum(1 for ev in evs if ev["act"] == "ERROR")
+        params["unknown"] = sum(1 for ev in evs if ev["emp"] == "unknown")
+
+        cases = {}
+        for name in names:
+            cmd = [sys.executable, __file__, "--case", name, "--root", str(root), "--month", args.month, "--emps", str(args.emps), "--seed", str(args.seed), "--repeat", str(args.repeat), "--events", str(params["events"])]
+            out = subprocess.run(cmd, capture_output=True, text=True)
+            if out.returncode != 0:
+                raise RuntimeError(f"bench_case_failed case={name} {out.stderr.strip()[-500:]}")
+            cases[name] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    res = {"meta": _meta(), "params": params, "cases": cases}
+    s = json.dumps(res, ensure_ascii=False, separators=(",", ":"))
+    if args.out:
+        Path(args.out).write_text(s + "\n", encoding="utf-8")
+    print(s, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from lib.attendance_rules import State, apply_rules, next_deadline, sweep_errors
+from lib.time_jst import _JST
+
+
+def _run(headcount: int, ticks: int) -> dict:
+    t0 = datetime(2026, 3, 2, 8, 0, tzinfo=_JST)
+    st = State.empty()
+    for i in range(headcount):
+        apply_rules(st, t0 + timedelta(seconds=i % 600), f"{0x04C00000000000 + i:014X}", "emp")
+
+    base = t0 + timedelta(minutes=15)
+    calls = 0
+    hold = 0.0
+    for k in range(ticks):
+        ts = base + timedelta(seconds=k)
+        due = next_deadline(st)
+        if due is None or due > ts.timestamp():
+            continue
+        a = time.perf_counter()
+        sweep_errors(st, ts)
+        hold += time.perf_counter() - a
+        calls += 1
+
+    a = time.perf_counter()
+    for k in range(ticks):
+        sweep_errors(st, base + timedelta(seconds=k))
+    full_call = (time.perf_counter() - a) / ticks
+
+    return {
+        "headcount": headcount,
+        "idle_ticks": ticks,
+        "deadline_sweeps": calls,
+        "deadline_lock_ms_total": round(hold * 1000, 4),
+        "sweep_call_us": round(full_call * 1e6, 3),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticks", type=int, default=600)
+    args = ap.parse_args()
+    out = [_run(n, args.ticks) for n in (10, 100, 1000, 10000)]
+    print(json.dumps({"sweep": out}, ensure_ascii=False, separators=(",", ":")), flush=True)
+
+
+if __name__ == "__main__":
+    main()
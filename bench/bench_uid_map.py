@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from lib.uid_map import UidMap
+
+
+def _uid(rng: random.Random) -> str:
+    return "%016X" % rng.getrandbits(64)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _pct(xs: list[float], p: float) -> float:
+    s = sorted(xs)
+    return s[min(len(s) - 1, int(p * len(s)))]
+
+
+def _lookup_ns(fn, uids: list[str], rounds: int) -> float:
+    t0 = time.perf_counter_ns()
+    for _ in range(rounds):
+        for u in uids:
+            fn(u)
+    return (time.perf_counter_ns() - t0) / (rounds * len(uids))
+
+
+def _swap_ms(path: Path, m: UidMap, base: dict, mode: str, trials: int) -> list[float]:
+    m.reload()
+    stop = threading.Event()
+    m.watch(stop, mode=mode, interval_sec=1.0)
+    time.sleep(0.2)
+    out = []
+    for i in range(trials):
+        uid = "AA%014X" % i
+        d = dict(base)
+        d[uid] = f"new{i}"
+        data = json.dumps(d).encode("utf-8")
+        t0 = time.perf_counter()
+        _write_atomic(path, data)
+        deadline = t0 + 5.0
+        while m.lookup(uid) != f"new{i}" and time.perf_counter() < deadline:
+            time.sleep(0.0005)
+        out.append((time.perf_counter() - t0) * 1000.0)
+    stop.set()
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=50000)
+    ap.add_argument("--trials", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = random.Random(18)
+    base = {_uid(rng): f"emp{i:05d}" for i in range(args.entries)}
+    hits = list(base)[:: max(1, args.entries // 1000)]
+    misses = [_uid(rng) for _ in range(1000)]
+    data = json.dumps(base, indent=2).encode("utf-8")
+
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "uid_map.json"
+        path.write_bytes(data)
+
+        legacy_ms = []
+        for _ in range(args.trials):
+            t0 = time.perf_counter()
+            with open(path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+            legacy_ms.append((time.perf_counter() - t0) * 1000.0)
+
+        m = UidMap(path)
+        reload_ms = []
+        for _ in range(args.trials):
+            m._stamp = None
+            m.reload()
+            reload_ms.append(m.last_reload_ms)
+        t0 = time.perf_counter()
+        unchanged = m.reload()
+        unchanged_us = (time.perf_counter() - t0) * 1e6
+
+        _write_atomic(path, data[: len(data) // 2])
+        m.reload()
+        kept = len(m) == args.entries and m.lookup(hits[0]) == base[hits[0]]
+        _write_atomic(path, data)
+        m.reload()
+
+        stall = []
+        done = threading.Event()
+
+        def spin():
+            while not done.is_set():
+                t = time.perf_counter_ns()
+                m.lookup(hits[0])
+                stall.append(time.perf_counter_ns() - t)
+
+        th = threading.Thread(target=spin)
+        th.start()
+        for _ in range(args.trials):
+            m._stamp = None
+            m.reload()
+        done.set()
+        th.join()
+
+        res = {
+            "entries": args.entries,
+            "file_bytes": len(data),
+            "legacy_load_ms": round(min(legacy_ms), 2),
+            "reload_ms": round(min(reload_ms), 2),
+            "reload_unchanged_us": round(unchanged_us, 1),
+            "legacy_hit_ns": round(_lookup_ns(lambda u: str(legacy.get(u, "unknown")), hits, 200), 1),
+            "lookup_hit_ns": round(_lookup_ns(m.lookup, hits, 200), 1),
+            "lookup_miss_ns": round(_lookup_ns(m.lookup, misses, 200), 1),
+            "lookup_during_reload_p99_us": round(_pct(stall, 0.99) / 1000.0, 2),
+            "malformed_edit_kept_previous": kept,
+            "rejects": m.rejects,
+        }
+        for mode in ("inotify", "poll"):
+            sw = _swap_ms(path, UidMap(path), base, mode, args.trials)
+            res[f"edit_to_swap_{mode}_p50_ms"] = round(_pct(sw, 0.5), 1)
+    print(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main()
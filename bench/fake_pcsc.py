@@ -0,0 +1,215 @@
+import ctypes
+import itertools
+import threading
+import time
+from pathlib import Path
+
+from lib.pcsc_native import (
+    SCARD_E_NO_READERS_AVAILABLE,
+    SCARD_E_NO_SMARTCARD,
+    SCARD_E_TIMEOUT,
+    SCARD_S_SUCCESS,
+    SCARD_STATE_CHANGED,
+    SCARD_STATE_EMPTY,
+    SCARD_STATE_PRESENT,
+    SCARD_STATE_UNKNOWN,
+    PNP_NOTIFICATION,
+    PcscError,
+    _DWORD,
+    _LONG,
+    _ReaderState,
+)
+
+
+FAKE_OPENSC = """#!/bin/sh
+case "$*" in
+  *--list-readers*)
+    echo "0: Sony FeliCa Port/PaSoRi 4.0 00 00"
+    exit 0
+    ;;
+  *--wait*)
+    echo "Using reader with a card: Sony FeliCa Port/PaSoRi 4.0 00 00"
+    echo "Sending: FF CA 00 00 00"
+    echo "Received (SW1=0x90, SW2=0x00):"
+    echo "01 23 45 67 89 AB CD .#Eg..."
+    exit 0
+    ;;
+esac
+exit 1
+"""
+
+
+def write_fake_opensc(d: Path) -> Path:
+    tool = Path(d) / "opensc-tool"
+    tool.write_text(FAKE_OPENSC, encoding="utf-8")
+    tool.chmod(0o755)
+    return tool
+
+
+class FakeLibpcsclite:
+    def __init__(self, readers: list[str] | None = None, uids: list[str] | None = None, hold_polls: int = 1, insert_delay_sec: float = 0.0):
+        self.readers = list(readers) if readers is not None else ["Sony FeliCa Port/PaSoRi 4.0 00 00"]
+        self.hold_polls = int(hold_polls)
+        self.insert_delay_sec = float(insert_delay_sec)
+        self.calls = {}
+        self._uids = itertools.cycle(list(uids) if uids else ["0123456789ABCD"])
+        self._lock = threading.Lock()
+        self._cards = {}
+        self._holds = {}
+        self._handles = {}
+        self._next_handle = itertools.count(1)
+
+    def _count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def establish_context(self) -> int:
+        self._count("establish_context")
+        return 1
+
+    def release_context(self, ctx: int) -> None:
+        self._count("release_context")
+
+    def cancel(self, ctx: int) -> None:
+        self._count("cancel")
+
+    def set_readers(self, readers: list[str]) -> None:
+        with self._lock:
+            self.readers = list(readers)
+
+    def list_readers(self, ctx: int) -> list[str]:
+        self._count("list_readers")
+        with self._lock:
+            return list(self.readers)
+
+    def get_status_change(self, ctx: int, timeout_ms: int, states: list[list]) -> int:
+        self._count("get_status_change")
+        if self.insert_delay_sec > 0:
+            for st in states:
+                if st[0] in self.readers and st[0] not in self._cards and not (int(st[1]) & SCARD_STATE_PRESENT):
+                    time.sleep(self.insert_delay_sec)
+                    break
+        changed = False
+        with self._lock:
+            for st in states:
+                name, cur = st[0], int(st[1])
+                if name == PNP_NOTIFICATION:
+                    ev = len(self.readers) << 16
+                    if (cur >> 16) != len(self.readers):
+                        ev |= SCARD_STATE_CHANGED
+                        changed = True
+                    st[1] = ev
+                    continue
+                if name not in self.readers:
+                    st[1] = SCARD_STATE_UNKNOWN | SCARD_STATE_CHANGED
+                    changed = True
+                    continue
+                card = self._cards.get(name)
+                if card is None and not (cur & SCARD_STATE_PRESENT):
+                    self._cards[name] = next(self._uids)
+                    self._holds[name] = self.hold_polls
+                elif card is not None and (cur & SCARD_STATE_PRESENT):
+                    if self._holds.get(name, 0) > 0:
+                        self._holds[name] -= 1
+                    else:
+                        self._cards.pop(name, None)
+                ev = SCARD_STATE_PRESENT if name in self._cards else SCARD_STATE_EMPTY
+                if (cur & (SCARD_STATE_PRESENT | SCARD_STATE_EMPTY)) != ev:
+                    ev |= SCARD_STATE_CHANGED
+                    changed = True
+                st[1] = ev
+        return SCARD_S_SUCCESS if changed else SCARD_E_TIMEOUT
+
+    def connect(self, ctx: int, reader: str) -> tuple[int, int]:
+        self._count("connect")
+        with self._lock:
+            if reader not in self._cards:
+                raise PcscError("SCardConnect", SCARD_E_NO_SMARTCARD)
+            h = next(self._next_handle)
+            self._handles[h] = reader
+        return h, 2
+
+    def transmit(self, card: int, proto: int, apdu: bytes) -> bytes:
+        self._count("transmit")
+        with self._lock:
+            uid = self._cards.get(self._handles.get(card, ""))
+        if uid is None:
+            return b"\x6a\x81"
+        return bytes.fromhex(uid) + b"\x90\x00"
+
+    def disconnect(self, card: int) -> None:
+        self._count("disconnect")
+        with self._lock:
+            self._handles.pop(card, None)
+
+
+class FakeScardLib:
+    def __init__(self, fake: FakeLibpcsclite | None = None, establish_rc: int = SCARD_S_SUCCESS):
+        self.fake = fake if fake is not None else FakeLibpcsclite()
+        self.establish_rc = int(establish_rc)
+        self.SCardEstablishContext = ctypes.CFUNCTYPE(_LONG, _DWORD, ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(_LONG))(self._establish)
+        self.SCardReleaseContext = ctypes.CFUNCTYPE(_LONG, _LONG)(self._release)
+        self.SCardListReaders = ctypes.CFUNCTYPE(_LONG, _LONG, ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(_DWORD))(self._list_readers)
+        self.SCardGetStatusChange = ctypes.CFUNCTYPE(_LONG, _LONG, _DWORD, ctypes.POINTER(_ReaderState), _DWORD)(self._get_status_change)
+        self.SCardConnect = ctypes.CFUNCTYPE(_LONG, _LONG, ctypes.c_char_p, _DWORD, _DWORD, ctypes.POINTER(_LONG), ctypes.POINTER(_DWORD))(self._connect)
+        self.SCardTransmit = ctypes.CFUNCTYPE(
+            _LONG,
+            _LONG,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            _DWORD,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.POINTER(_DWORD),
+        )(self._transmit)
+        self.SCardDisconnect = ctypes.CFUNCTYPE(_LONG, _LONG, _DWORD)(self._disconnect)
+        self.SCardCancel = ctypes.CFUNCTYPE(_LONG, _LONG)(self._cancel)
+
+    def _establish(self, scope, r1, r2, pctx) -> int:
+        if self.establish_rc != SCARD_S_SUCCESS:
+            return self.establish_rc
+        pctx[0] = self.fake.establish_context()
+        return SCARD_S_SUCCESS
+
+    def _release(self, ctx) -> int:
+        self.fake.release_context(ctx)
+        return SCARD_S_SUCCESS
+
+    def _cancel(self, ctx) -> int:
+        self.fake.cancel(ctx)
+        return SCARD_S_SUCCESS
+
+    def _list_readers(self, ctx, groups, buf, pcch) -> int:
+        names = self.fake.list_readers(ctx)
+        if not names:
+            return SCARD_E_NO_READERS_AVAILABLE
+        raw = b"".join(n.encode("utf-8") + b"\x00" for n in names) + b"\x00"
+        if buf:
+            ctypes.memmove(buf, raw, min(len(raw), int(pcch[0])))
+        pcch[0] = len(raw)
+        return SCARD_S_SUCCESS
+
+    def _get_status_change(self, ctx, timeout_ms, arr, n) -> int:
+        states = [[arr[i].szReader.decode("utf-8"), int(arr[i].dwCurrentState)] for i in range(n)]
+        rc = self.fake.get_status_change(ctx, int(timeout_ms), states)
+        for i in range(n):
+            arr[i].dwEventState = states[i][1]
+        return rc
+
+    def _connect(self, ctx, reader, share, protos, pcard, pproto) -> int:
+        try:
+            card, proto = self.fake.connect(ctx, reader.decode("utf-8"))
+        except PcscError as e:
+            return e.rc
+        pcard[0] = card
+        pproto[0] = proto
+        return SCARD_S_SUCCESS
+
+    def _transmit(self, card, pci, send, send_len, recv_pci, recv, precv) -> int:
+        resp = self.fake.transmit(card, 0, ctypes.string_at(send, send_len))
+        ctypes.memmove(recv, resp, len(resp))
+        precv[0] = len(resp)
+        return SCARD_S_SUCCESS
+
+    def _disconnect(self, card, disposition) -> int:
+        self.fake.disconnect(card)
+        return SCARD_S_SUCCESS
@@ -0,0 +1,160 @@
+import base64
+import gzip
+import itertools
+import json
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubGas:
+    def __init__(self, latency_sec: float = 0.0, redirect: bool = True, fail_every: int = 0, token: str | None = None, max_body_bytes: int = 0, certfile: str | None = None, moved: bool = False):
+        self.latency_sec = float(latency_sec)
+        self.redirect = bool(redirect)
+        self.fail_every = int(fail_every)
+        self.token = token
+        self.max_body_bytes = int(max_body_bytes)
+        self.certfile = certfile
+        self.moved = bool(moved)
+        self.failures = 0
+        self.rows = {}
+        self.requests = 0
+        self.posts = 0
+        self.refreshes = 0
+        self.gzip_posts = 0
+        self.bytes_in = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._results = {}
+        self._seq = itertools.count(1)
+        self._httpd = None
+        self._th = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        scheme = "https" if self.certfile else "http"
+        return f"{scheme}://{host}:{port}/macros/s/stub/exec"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, fmt, *args):
+                return
+
+            def do_POST(self):
+                if stub.moved and self.path.endswith("/exec"):
+                    n = int(self.headers.get("Content-Length", "0") or 0)
+                    if n > 0:
+                        self.rfile.read(n)
+                    self.send_response(308)
+                    self.send_header("Location", f"{'https' if stub.certfile else 'http'}://{self.headers.get('Host')}{self.path}2")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                n = int(self.headers.get("Content-Length", "0") or 0)
+                body = self.rfile.read(n) if n > 0 else b""
+                if stub.latency_sec > 0:
+                    time.sleep(stub.latency_sec)
+                obj = stub.handle_post(body, dict(self.headers.items()))
+                if stub.redirect:
+                    k = next(stub._seq)
+                    with stub._lock:
+                        stub._results[k] = obj
+                    self.send_response(302)
+                    self.send_header("Location", f"{'https' if stub.certfile else 'http'}://{self.headers.get('Host')}/echo?k={k}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._send_json(obj)
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                obj = {"ok": True}
+                if self.path.startswith("/echo?k="):
+                    try:
+                        k = int(self.path.split("=", 1)[1])
+                    except Exception:
+                        k = 0
+                    with stub._lock:
+                        obj = stub._results.pop(k, {"ok": False, "error": "no_result"})
+                self._send_json(obj)
+
+            def _send_json(self, obj):
+                data = json.dumps(obj).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        if self.certfile:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ctx.load_cert_chain(self.certfile)
+            self._httpd.socket = ctx.wrap_socket(self._httpd.socket, server_side=True)
+        self._th = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._th.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def handle_post(self, body: bytes, headers: dict) -> dict:
+        with self._lock:
+            self.requests += 1
+            self.posts += 1
+            self.bytes_in += len(body)
+            n = self.posts
+        if self.fail_every and n % self.fail_every == 0:
+            with self._lock:
+                self.failures += 1
+            return {"ok": False, "error": "stub_injected_failure"}
+        if self.max_body_bytes and len(body) > self.max_body_bytes:
+            with self._lock:
+                self.failures += 1
+            return {"ok": False, "error": "payload_too_large"}
+        if self.token and headers.get("X-Auth-Token") != self.token:
+            return {"ok": False, "error": "bad_token"}
+        try:
+            payload = json.loads(body.decode("utf-8")) if body else {}
+            if isinstance(payload, dict) and isinstance(payload.get("gzip"), str):
+                payload = json.loads(gzip.decompress(base64.b64decode(payload["gzip"])).decode("utf-8"))
+                with self._lock:
+                    self.gzip_posts += 1
+        except Exception as e:
+            return {"ok": False, "error": f"bad_json {e}"}
+        records = payload.get("records", []) if isinstance(payload, dict) else payload
+        deletes = payload.get("deletes", []) if isinstance(payload, dict) else []
+        refresh = not (isinstance(payload, dict) and payload.get("refresh") is False)
+        inserted = updated = skipped = deleted = 0
+        with self._lock:
+            self.refreshes += int(refresh)
+            for rid in deletes:
+                if self.rows.pop(str(rid), None) is not None:
+                    deleted += 1
+            for rec in records or []:
+                rid = str((rec or {}).get("id", "")).strip()
+                if not rid:
+                    skipped += 1
+                    continue
+                if rid in self.rows:
+                    updated += 1
+                else:
+                    inserted += 1
+                self.rows[rid] = rec
+        return {"ok": True, "inserted": inserted, "updated": updated, "skipped": skipped, "deleted": deleted, "refreshed": refresh}
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubWebhook:
+    def __init__(self, bucket: int = 5, window_sec: float = 2.0, latency_sec: float = 0.05, max_chars: int = 2000):
+        self.bucket = int(bucket)
+        self.window_sec = float(window_sec)
+        self.latency_sec = float(latency_sec)
+        self.max_chars = int(max_chars)
+        self.lines = []
+        self.posts = 0
+        self.rejected_429 = 0
+        self.rejected_400 = 0
+        self._lock = threading.Lock()
+        self._used = 0
+        self._reset_at = 0.0
+        self._httpd = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/webhooks/1/stub"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, fmt, *args):
+                return
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length", "0") or 0)
+                body = self.rfile.read(n) if n > 0 else b""
+                if stub.latency_sec > 0:
+                    time.sleep(stub.latency_sec)
+                status, headers, obj = stub.handle(body)
+                data = json.dumps(obj).encode("utf-8") if obj is not None else b""
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                if data:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if data:
+                    self.wfile.write(data)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def handle(self, body: bytes):
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._reset_at:
+                self._used = 0
+                self._reset_at = now + self.window_sec
+            after = max(0.0, self._reset_at - now)
+            if self._used >= self.bucket:
+                self.rejected_429 += 1
+                h = {"Retry-After": f"{after:.3f}", "X-RateLimit-Limit": str(self.bucket), "X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": f"{after:.3f}"}
+                return 429, h, {"message": "You are being rate limited.", "retry_after": after, "global": False}
+            try:
+                content = str(json.loads(body.decode("utf-8")).get("content", ""))
+            except Exception:
+                content = ""
+            if not content or len(content) > self.max_chars:
+                self.rejected_400 += 1
+                return 400, {}, {"message": "Invalid Form Body", "code": 50035}
+            self._used += 1
+            self.posts += 1
+            t = time.perf_counter()
+            for ln in content.split("\n"):
+                self.lines.append((t, ln))
+            h = {"X-RateLimit-Limit": str(self.bucket), "X-RateLimit-Remaining": str(self.bucket - self._used), "X-RateLimit-Reset-After": f"{after:.3f}"}
+            return 204, h, None
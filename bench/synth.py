@@ -0,0 +1,115 @@
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from lib.attendance_store import month_events_path, _jsonify
+from lib.time_jst import _JST
+
+
+def synth_events(start: datetime, days: int, n_emps: int, seed: int = 1):
+    rng = random.Random(seed)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=_JST)
+    emps = [(f"{0x04A00000000000 + i:014X}", f"emp{i + 1:03d}") for i in range(n_emps)]
+    for d in range(days):
+        day0 = start + timedelta(days=d)
+        taps = []
+        for uid, emp in emps:
+            t_in = day0 + timedelta(hours=8, minutes=rng.randint(0, 120), seconds=rng.randint(0, 59))
+            t_out = t_in + timedelta(hours=rng.randint(4, 9), minutes=rng.randint(0, 59))
+            taps.append((t_in, uid, emp, "IN"))
+            taps.append((t_out, uid, emp, "OUT"))
+        taps.sort(key=lambda x: x[0])
+        for ts, uid, emp, act in taps:
+            yield {"id": uuid.UUID(int=rng.getrandbits(128)).hex, "ts": ts, "uid": uid, "emp": emp, "act": act}
+
+
+def write_events(repo_root: Path, events) -> int:
+    n = 0
+    cur_p = None
+    f = None
+    try:
+        for ev in events:
+            p = month_events_path(repo_root, ev["ts"])
+            if p != cur_p:
+                if f is not None:
+                    f.close()
+                f = open(p, "a", encoding="utf-8")
+                cur_p = p
+            f.write(json.dumps(_jsonify(ev), ensure_ascii=False, separators=(",", ":")) + "\n")
+            n += 1
+    finally:
+        if f is not None:
+            f.close()
+    return n
+
+
+SHIFTS = {
+    "day": ((8, 30), 60, 8 * 60, 60, (0, 1, 2, 3, 4)),
+    "late": ((13, 0), 60, 8 * 60, 90, (1, 2, 3, 4, 5)),
+    "part": ((10, 0), 60, 4 * 60, 60, (0, 2, 4)),
+    "evening": ((17, 0), 45, 5 * 60, 45, (3, 4, 5, 6)),
+}
+
+
+def synth_taps(ym: str, n_emps: int, seed: int = 1, double_tap: float = 0.05, missing_out: float = 0.03, unknown_per_day: int = 2):
+    rng = random.Random(seed)
+    start = datetime(int(ym[0:4]), int(ym[5:7]), 1, tzinfo=_JST)
+    days = ((start + timedelta(days=32)).replace(day=1) - start).days
+    kinds = list(SHIFTS)
+    emps = [(f"{0x04A00000000000 + i:014X}", f"emp{i + 1:03d}", kinds[rng.randrange(len(kinds))]) for i in range(n_emps)]
+    taps = []
+    for d in range(days):
+        day0 = start + timedelta(days=d)
+        for uid, emp, kind in emps:
+            (h, m), jitter, dur, dur_jitter, weekdays = SHIFTS[kind]
+            if day0.weekday() not in weekdays or rng.random() < 0.05:
+                continue
+            t_in = day0 + timedelta(hours=h, minutes=m + rng.randint(0, jitter), seconds=rng.randint(0, 59))
+            t_out = t_in + timedelta(minutes=dur + rng.randint(-dur_jitter, dur_jitter), seconds=rng.randint(0, 59))
+            taps.append((t_in, uid, emp))
+            if rng.random() < double_tap:
+                taps.append((t_in + timedelta(seconds=rng.randint(2, 120)), uid, emp))
+            if rng.random() < missing_out:
+                continue
+            taps.append((t_out, uid, emp))
+            if rng.random() < double_tap:
+                taps.append((t_out + timedelta(seconds=rng.randint(2, 120)), uid, emp))
+        for _ in range(unknown_per_day):
+            uid = f"{0x01F00000000000 + rng.getrandbits(32):014X}"
+            taps.append((day0 + timedelta(hours=rng.randint(7, 20), minutes=rng.randint(0, 59)), uid, "unknown"))
+    taps.sort(key=lambda x: x[0])
+    return taps
+
+
+def rule_events(taps, seed: int = 1):
+    from lib.attendance_rules import State, apply_rules, next_deadline, sweep_errors
+
+    rng = random.Random(seed)
+    st = State.empty()
+    out = []
+
+    def emit(evs):
+        for ev in evs:
+            ev["id"] = uuid.UUID(int=rng.getrandbits(128)).hex
+            out.append(ev)
+
+    for ts, uid, emp in taps:
+        due = next_deadline(st)
+        while due is not None and due <= ts.timestamp():
+            emit(sweep_errors(st, datetime.fromtimestamp(due, tz=_JST)))
+            nxt = next_deadline(st)
+            if nxt == due:
+                break
+            due = nxt
+        emit(apply_rules(st, ts, uid, emp))
+    return out
+
+
+def write_employees(repo_root: Path, n_emps: int) -> None:
+    emp_dir = repo_root / "config" / "employees"
+    emp_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(n_emps):
+        (emp_dir / f"emp{i + 1:03d}.env").write_text(f"NAME=Emp_{i + 1}\nHOURLY_YEN={1000 + 10 * (i % 50)}\nROUND_UNIT_MINUTES={(5, 10, 15)[i % 3]}\n", encoding="utf-8")
@@ -0,0 +1,291 @@
+import json
+import os
+import re
+import sys
+import threading
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from lib.attendance_store import decode_line, iter_event_lines, repair_jsonl_tail
+
+
+_SITE_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,63}")
+_MONTH_RE = re.compile(r"\d{4}-(0[1-9]|1[0-2])")
+
+
+def _env_str(key: str) -> str:
+    return str(os.environ.get(key, "")).strip()
+
+
+def _env_int(key: str, default: int) -> int:
+    try:
+        return int(_env_str(key) or default)
+    except Exception:
+        return default
+
+
+class _SiteLog:
+    def __init__(self, site_root: Path, ym: str, prev=None):
+        self.lock = threading.Lock()
+        self.site_root = site_root
+        self.ym = ym
+        self.path = site_root / "state" / "attendance" / "events" / f"{ym}.jsonl"
+        self.ids = set()
+        self.lines = 0
+        self.last_end = 0
+        self.fd = -1
+        self.closed = False
+        self.prev = prev
+
+    def open(self) -> None:
+        prev = self.prev
+        if prev is not None:
+            with prev.lock:
+                self.last_end = prev.last_end
+            self.prev = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        repair_jsonl_tail(self.path)
+        ids = set()
+        lines = 0
+        for _off, raw in iter_event_lines(self.site_root, self.ym, 0):
+            ev = decode_line(raw)
+            if ev is not None and ev.id:
+                ids.add(ev.id)
+            lines += 1
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.ids = ids
+        self.lines = lines
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            if self.fd >= 0:
+                try:
+                    os.close(self.fd)
+                except OSError:
+                    pass
+                self.fd = -1
+            self.ids = set()
+
+
+class Collector:
+    def __init__(self, root: Path, token: str | None = None, max_body_bytes: int = 32 << 20, max_open: int = 32):
+        self.root = Path(root)
+        self.token = token
+        self.max_body_bytes = int(max_body_bytes)
+        self.max_open = max(1, int(max_open))
+        self._lock = threading.Lock()
+        self._logs = {}
+        self._closed = {}
+        self._stats = {"posts": 0, "accepted": 0, "duplicates": 0, "rejected": 0, "bytes_in": 0, "opens": 0, "evictions": 0}
+        self._httpd = None
+
+    def site_root(self, site: str) -> Path:
+        return self.root / "sites" / site
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def status(self) -> dict:
+        with self._lock:
+            logs = list(self._closed.items()) + list(self._logs.items())
+        out = {}
+        for (site, ym), log in sorted(logs, key=lambda kv: kv[0]):
+            if log.fd >= 0 or log.closed:
+                out.setdefault(site, {})[ym] = {"lines": log.lines, "end": log.last_end}
+        return out
+
+    def append(self, site: str, ym: str, data: bytes, end: int = 0) -> dict:
+        if not _SITE_RE.fullmatch(site):
+            raise ValueError(f"bad_site site={site!r}")
+        if not _MONTH_RE.fullmatch(ym):
+            raise ValueError(f"bad_month month={ym!r}")
+        accepted = dups = rejected = 0
+        out = []
+        new = set()
+        log = self._locked_log(site, ym)
+        try:
+            for raw in data.splitlines():
+                if not raw.strip():
+                    continue
+                ev = decode_line(raw)
+                if ev is None or not ev.id:
+                    rejected += 1
+                    continue
+                if ev.id in log.ids or ev.id in new:
+                    dups += 1
+                    continue
+                new.add(ev.id)
+                out.append(raw.rstrip(b"\r") + b"\n")
+            if out:
+                size = os.fstat(log.fd).st_size
+                try:
+                    mv = memoryview(b"".join(out))
+                    while mv:
+                        n = os.write(log.fd, mv)
+                        mv = mv[n:]
+                    os.fsync(log.fd)
+                except OSError:
+                    os.ftruncate(log.fd, size)
+                    raise
+                log.ids |= new
+                log.lines += len(out)
+                accepted = len(out)
+            log.last_end = max(log.last_end, int(end))
+        finally:
+            log.lock.release()
+        with self._lock:
+            st = self._stats
+            st["posts"] += 1
+            st["accepted"] += accepted
+            st["duplicates"] += dups
+            st["rejected"] += rejected
+            st["bytes_in"] += len(data)
+        return {"ok": True, "accepted": accepted, "duplicates": dups, "rejected": rejected}
+
+    def serve(self, addr: str = "127.0.0.1", port: int = 0):
+        c = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, fmt, *args):
+                return
+
+            def _reply(self, code: int, obj: dict) -> None:
+                body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _authorized(self) -> bool:
+                if c.token and self.headers.get("X-Auth-Token", "") != c.token:
+                    self._reply(401, {"ok": False, "error": "unauthorized"})
+                    return False
+                return True
+
+            def do_GET(self):
+                if urllib.parse.urlsplit(self.path).path != "/v1/status":
+                    self._reply(404, {"ok": False, "error": "not_found"})
+                    return
+                if self._authorized():
+                    self._reply(200, {"ok": True, "sites": c.status(), "stats": c.stats()})
+
+            def do_POST(self):
+                u = urllib.parse.urlsplit(self.path)
+                n = int(self.headers.get("Content-Length", "0") or 0)
+                if n > c.max_body_bytes:
+                    self.close_connection = True
+                    self._reply(413, {"ok": False, "error": "body_too_large"})
+                    return
+                body = self.rfile.read(n) if n > 0 else b""
+                if u.path != "/v1/events":
+                    self._reply(404, {"ok": False, "error": "not_found"})
+                    return
+                if not self._authorized():
+                    return
+                q = urllib.parse.parse_qs(u.query)
+                try:
+                    if self.headers.get("Content-Encoding", "").lower() == "gzip":
+                        d = zlib.decompressobj(31)
+                        body = d.decompress(body, c.max_body_bytes)
+                        if d.unconsumed_tail:
+                            self._reply(413, {"ok": False, "error": "body_too_large"})
+                            return
+                    ack = c.append(q.get("site", [""])[0], q.get("month", [""])[0], body, int(q.get("end", ["0"])[0] or 0))
+                except (ValueError, zlib.error) as e:
+                    self._reply(400, {"ok": False, "error": str(e)})
+                    return
+                except OSError as e:
+                    print(f"collector_write_failed err={e}", file=sys.stderr, flush=True)
+                    self._reply(503, {"ok": False, "error": "write_failed"})
+                    return
+                self._reply(200, ack)
+
+        self._httpd = ThreadingHTTPServer((addr, int(port)), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="collector-http", daemon=True).start()
+        return self
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/events"
+
+    def close(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        with self._lock:
+            logs = list(self._logs.values())
+            self._logs = {}
+            for log in logs:
+                log.closed = True
+        for log in logs:
+            log.close()
+
+    def _locked_log(self, site: str, ym: str) -> _SiteLog:
+        while True:
+            log = self._log(site, ym)
+            log.lock.acquire()
+            if log.closed:
+                log.lock.release()
+                continue
+            if log.fd < 0:
+                try:
+                    log.open()
+                except BaseException:
+                    log.closed = True
+                    log.lock.release()
+                    with self._lock:
+                        if self._logs.get((site, ym)) is log:
+                            del self._logs[(site, ym)]
+                    raise
+            return log
+
+    def _log(self, site: str, ym: str) -> _SiteLog:
+        key = (site, ym)
+        evict = []
+        with self._lock:
+            log = self._logs.pop(key, None)
+            if log is None:
+                log = _SiteLog(self.site_root(site), ym, self._closed.pop(key, None))
+                self._stats["opens"] += 1
+            self._logs[key] = log
+            while len(self._logs) > self.max_open:
+                old = next(iter(self._logs))
+                ev = self._logs.pop(old)
+                ev.closed = True
+                self._closed[old] = ev
+                evict.append(ev)
+                self._stats["evictions"] += 1
+        for ev in evict:
+            ev.close()
+        return log
+
+
+def main() -> None:
+    repo_root = Path(__file__).resolve().parents[1]
+    root = Path(_env_str("ATT_COLLECTOR_ROOT") or repo_root / "state" / "collector")
+    c = Collector(root, _env_str("ATT_COLLECTOR_TOKEN") or None, _env_int("ATT_COLLECTOR_MAX_BODY_MB", 32) << 20, _env_int("ATT_COLLECTOR_MAX_OPEN", 32))
+    c.serve(_env_str("ATT_COLLECTOR_ADDR") or "127.0.0.1", _env_int("ATT_COLLECTOR_PORT", 8787))
+    print(f"collector url={c.url} root={root}", file=sys.stderr, flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        c.close()
+
+
+if __name__ == "__main__":
+    main()
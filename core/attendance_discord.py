@@ -1,54 +1,45 @@
 import json
 import os
 import sys
+import threading
 import time
-import urllib.request
-import urllib.error
 from datetime import timezone, timedelta
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from lib.env_loader import load_employee_env
-from lib.attendance_store import iter_events_month, month_key
-from lib.time_jst import now_jst, parse_iso
+from lib.env_loader import employee_registry
+from lib.discord_sender import DiscordSender
+from lib.attendance_rules import restore_window
+from lib.attendance_store import EventRecord, decode_event, decode_line, event_id_before, events_month_size, iter_decoded_month_from, iter_decoded_since, month_key, months_between
+from lib.event_bus import EventSubscriber, event_bus_path
+from lib.file_watch import open_watcher
+from lib.http_pool import close_default_pool, default_pool
+from lib.metrics import Metrics, collect_stats, set_default_component, start_exporters
+from lib.time_jst import epoch_jst, next_month_start_jst, now_jst
 
 
 JST = timezone(timedelta(hours=9))
+_IDLE_MAX_SEC = 3600.0
+_BUS_PROBE_SEC = 5.0
 
 
 def _env_str(key: str) -> str:
     return str(os.environ.get(key, "")).strip()
 
 
-def _http_post_json(url: str, payload: dict) -> None:
-    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
-    req = urllib.request.Request(url, data=body, method="POST")
-    req.add_header("Content-Type", "application/json")
-    req.add_header("User-Agent", "nfc-attendance/1.0")
-    with urllib.request.urlopen(req, timeout=10) as resp:
-        _ = resp.read()
+def _env_int(key: str, default: int) -> int:
+    try:
+        return int(_env_str(key) or default)
+    except Exception:
+        return default
 
 
-def _post_discord_retry(webhook_url: str, text: str) -> None:
-    last_err = None
-    for i in range(3):
-        try:
-            _http_post_json(webhook_url, {"content": text})
-            return
-        except urllib.error.HTTPError as e:
-            try:
-                b = e.read().decode("utf-8", "replace")
-            except Exception:
-                b = ""
-            last_err = RuntimeError(f"HTTP {e.code} {e.reason} {b}".strip())
-            if i < 2:
-                time.sleep(1.0)
-        except Exception as e:
-            last_err = e
-            if i < 2:
-                time.sleep(1.0)
-    raise last_err if last_err else RuntimeError("discord_post_failed")
+def _env_float(key: str, default: float) -> float:
+    try:
+        return float(_env_str(key) or default)
+    except Exception:
+        return default
 
 
 def _fmt_jst_dt(ts) -> str:
@@ -57,8 +48,15 @@ def _fmt_jst_dt(ts) -> str:
     return ts.astimezone(JST).strftime("%Y-%m-%d %H:%M")
 
 
+def _fmt_ev_dt(ev: EventRecord) -> str:
+    s = ev.ts
+    if len(s) == 25 and s.endswith("+09:00"):
+        return f"{s[:10]} {s[11:16]}"
+    return _fmt_jst_dt(epoch_jst(ev.epoch))
+
+
 def _fmt_dur(ts0, ts1) -> str:
-    sec = int((ts1 - ts0).total_seconds())
+    sec = int(ts1 - ts0)
     if sec < 0:
         return ""
     m = sec // 60
@@ -71,123 +69,359 @@ def _events_path(repo_root: Path, ym: str) -> Path:
     return repo_root / "state" / "attendance" / "events" / f"{ym}.jsonl"
 
 
-def _restore_open_in(repo_root: Path, ym: str) -> dict:
+def _restore_open_in(repo_root: Path, now, skip_ids=None) -> dict:
     open_in = {}
-    for ev in iter_events_month(repo_root, ym):
-        if not isinstance(ev, dict):
-            continue
-        emp = str(ev.get("emp", "unknown"))
-        act = str(ev.get("act", ""))
-        ts_s = ev.get("ts")
-        if not isinstance(ts_s, str) or not ts_s:
+    for ev in iter_decoded_since(repo_root, restore_window(repo_root, now), now):
+        if skip_ids and ev.id in skip_ids:
             continue
-        try:
-            ts = parse_iso(ts_s)
-        except Exception:
-            continue
-        if act == "IN":
-            open_in[emp] = ts
-        elif act in ("OUT", "ERROR"):
-            open_in.pop(emp, None)
+        if ev.act == "IN":
+            open_in[ev.emp] = ev.epoch
+        elif ev.act in ("OUT", "ERROR"):
+            open_in.pop(ev.emp, None)
     return open_in
 
 
-def main() -> None:
-    repo_root = Path(__file__).resolve().parents[1]
-    webhook_url = _env_str("ATT_DISCORD_WEBHOOK_URL")
-    if not webhook_url:
-        raise RuntimeError("ATT_DISCORD_WEBHOOK_URL_EMPTY")
+class NotifyCursor:
+    def __init__(self, path: Path, interval_sec: float = 2.0):
+        self.path = path
+        self.interval_sec = float(interval_sec)
+        self._lock = threading.Lock()
+        self._pos = None
+        self._dirty = False
+        self._stop = threading.Event()
+        self._th = None
 
-    name_cache = {}
-    cur_ym = month_key(now_jst())
-    open_in = _restore_open_in(repo_root, cur_ym)
+    def load(self) -> dict | None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                o = json.load(f)
+        except Exception:
+            return None
+        if not isinstance(o, dict) or o.get("v") != 1:
+            return None
+        try:
+            return {"month": str(o["month"]), "offset": int(o["offset"]), "last_id": str(o.get("last_id", ""))}
+        except Exception:
+            return None
+
+    def start(self):
+        self._th = threading.Thread(target=self._loop, name="notify-cursor", daemon=True)
+        self._th.start()
+        return self
+
+    def advance(self, pos: tuple) -> None:
+        with self._lock:
+            self._pos = pos
+            self._dirty = True
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            ym, offset, last_id = self._pos
+            self._dirty = False
+        body = json.dumps({"v": 1, "month": ym, "offset": offset, "last_id": last_id}, separators=(",", ":"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.tmp.{os.getpid()}")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"notify_cursor_write_failed {e}", file=sys.stderr, flush=True)
+            with self._lock:
+                self._dirty = True
 
-    p = _events_path(repo_root, cur_ym)
+    def close(self) -> None:
+        self._stop.set()
+        if self._th is not None:
+            self._th.join(5.0)
+        self.flush()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            self.flush()
 
-    def get_name(emp: str) -> str:
-        if emp in name_cache:
-            return name_cache[emp]
-        d = load_employee_env(repo_root, emp)
-        n = str(d.get("NAME", "")).strip()
-        out = n if n else emp
-        name_cache[emp] = out
-        return out
 
-    def open_tail(path: Path):
+class _Tail:
+    def __init__(self, path: Path, offset: int | None = None):
+        self.path = path
         if not path.exists():
             path.parent.mkdir(parents=True, exist_ok=True)
             path.touch()
-        fh = open(path, "r", encoding="utf-8")
-        fh.seek(0, 2)
-        return fh
-
-    f = open_tail(p)
-
-    while True:
-        now_ym = month_key(now_jst())
-        if now_ym != cur_ym:
-            try:
-                f.close()
-            except Exception:
-                pass
-            cur_ym = now_ym
-            name_cache = {}
-            open_in = _restore_open_in(repo_root, cur_ym)
-            p = _events_path(repo_root, cur_ym)
-            f = open_tail(p)
-
-        line = f.readline()
-        if not line:
-            time.sleep(0.2)
-            continue
+        self._f = open(path, "rb")
+        if offset is None:
+            self.offset = self._f.seek(0, 2)
+        else:
+            self.offset = self._f.seek(offset)
+        self._ino = os.fstat(self._f.fileno()).st_ino
+        self._pending = b""
+
+    def read_lines(self) -> list[tuple[bytes, int]]:
+        chunk = self._f.read()
+        if not chunk:
+            return []
+        buf = self._pending + chunk
+        cut = buf.rfind(b"\n") + 1
+        self._pending = buf[cut:]
+        out = []
+        for raw in buf[:cut].splitlines(keepends=True):
+            self.offset += len(raw)
+            out.append((raw, self.offset))
+        return out
 
-        s = line.strip()
-        if not s:
-            continue
+    def check_replaced(self) -> None:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        if st.st_ino == self._ino:
+            return
+        self.close()
+        self._f = open(self.path, "rb")
+        self.offset = self._f.seek(min(self.offset, st.st_size))
+        self._ino = st.st_ino
+        self._pending = b""
 
+    def close(self) -> None:
         try:
-            ev = json.loads(s)
+            self._f.close()
         except Exception:
-            continue
-        if not isinstance(ev, dict):
-            continue
+            pass
+
+
+def _format_event(ev: EventRecord, open_in: dict, get_name) -> str | None:
+    emp = ev.emp
+    act = ev.act
+    ts = ev.epoch
+    dt = _fmt_ev_dt(ev)
+    disp = get_name(emp)
+
+    if act == "IN":
+        open_in[emp] = ts
+        return f"{dt}  {disp}  IN"
+    if act == "OUT":
+        if emp in open_in:
+            t0 = open_in.pop(emp)
+            dur = _fmt_dur(t0, ts)
+            return f"{dt}  {disp}  OUT  ({dur})" if dur else f"{dt}  {disp}  OUT"
+        return f"{dt}  {disp}  OUT"
+    if act == "ERROR":
+        code_s = ev.code.strip()
+        open_in.pop(emp, None)
+        return f"{dt}  {disp}  ERROR  {code_s}" if code_s else f"{dt}  {disp}  ERROR"
+    return None
+
+
+def follow_messages(
+    repo_root: Path,
+    watcher,
+    now_fn=now_jst,
+    stop=None,
+    cursor: dict | None = None,
+    backlog_max: int = 20,
+    bus_path: Path | None = None,
+    metrics: Metrics | None = None,
+    bus_probe: Path | None = None,
+):
+    def pickup_for(source: str):
+        if metrics is None:
+            return None
+        return metrics.histogram("att_notify_pickup_seconds", "Event timestamp to notifier pickup (event ts has 1 s resolution)", source=source)
+
+    now = now_fn()
+    cur_ym = month_key(now)
+    roll_at = next_month_start_jst(now).timestamp()
+    registry = employee_registry(repo_root)
 
-        emp = str(ev.get("emp", "unknown"))
-        act = str(ev.get("act", ""))
-        ts_s = ev.get("ts")
-        if not isinstance(ts_s, str) or not ts_s:
-            continue
+    def get_name(emp: str) -> str:
+        return registry.name(emp) or emp
+
+    start = _resume_point(repo_root, cursor, cur_ym)
+    if start is None:
+        open_in = _restore_open_in(repo_root, now)
+        p = _events_path(repo_root, cur_ym)
+        tail_offset = p.stat().st_size if p.exists() else 0
+    else:
+        backlog = []
+        tail_offset = 0
+        for ym in months_between(start[0], cur_ym):
+            for end, ev in iter_decoded_month_from(repo_root, ym, start[1] if ym == start[0] else 0):
+                backlog.append((ev, (ym, end, ev.id)))
+                if ym == cur_ym:
+                    tail_offset = end
+        if start[0] == cur_ym:
+            tail_offset = max(tail_offset, start[1])
+        open_in = _restore_open_in(repo_root, now, {pos[2] for _, pos in backlog})
+        msgs = []
+        for ev, pos in backlog:
+            msg = _format_event(ev, open_in, get_name)
+            if msg:
+                msgs.append((msg, pos, ev))
+        cap = max(0, int(backlog_max))
+        if len(msgs) > cap:
+            skipped = msgs[: len(msgs) - cap]
+            yield _backlog_summary([ev for _, _, ev in skipped]), skipped[-1][1]
+            msgs = msgs[len(msgs) - cap :]
+        for msg, pos, _ in msgs:
+            yield msg, pos
+
+    def follow_bus(path: Path, pos: tuple, sub=None):
+        pickup = pickup_for("bus")
+        while stop is None or not stop.is_set():
+            if sub is None:
+                try:
+                    sub = EventSubscriber(path, pos[0], pos[1])
+                except OSError:
+                    time.sleep(1.0)
+                    continue
+            try:
+                for item in sub.events(stop):
+                    if item is None:
+                        continue
+                    ym, end, o = item
+                    pos = (ym, end)
+                    ev = decode_event(o)
+                    if ev is None:
+                        continue
+                    if pickup is not None:
+                        _observe_age(pickup, ev)
+                    msg = _format_event(ev, open_in, get_name)
+                    if msg:
+                        yield msg, (ym, end, ev.id)
+            except (ConnectionError, OSError, ValueError) as e:
+                print(str(e), file=sys.stderr, flush=True)
+                time.sleep(1.0)
+            finally:
+                sub.close()
+                sub = None
+
+    if bus_path is not None:
+        yield from follow_bus(bus_path, (cur_ym, tail_offset))
+        return
+
+    pickup = pickup_for("tail")
+    probe_at = 0.0
+    sub = None
+    tail = _Tail(_events_path(repo_root, cur_ym), offset=tail_offset)
+    try:
+        while stop is None or not stop.is_set():
+            lines = tail.read_lines()
+            if not lines:
+                if bus_probe is not None and time.monotonic() >= probe_at:
+                    probe_at = time.monotonic() + _BUS_PROBE_SEC
+                    sub = _try_subscribe(bus_probe, cur_ym, tail.offset)
+                    if sub is not None:
+                        print("watch=bus switched_from=tail", file=sys.stderr, flush=True)
+                        break
+                left = roll_at - time.time()
+                if left <= 0:
+                    now = now_fn()
+                    now_ym = month_key(now)
+                    roll_at = next_month_start_jst(now).timestamp()
+                    if now_ym != cur_ym:
+                        tail.close()
+                        cur_ym = now_ym
+                        open_in = _restore_open_in(repo_root, now)
+                        tail = _Tail(_events_path(repo_root, cur_ym), offset=0)
+                    continue
+                if watcher.wait(min(left, _IDLE_MAX_SEC if bus_probe is None else _BUS_PROBE_SEC), tail.path.name):
+                    tail.check_replaced()
+                continue
+
+            for raw, end in lines:
+                ev = decode_line(raw)
+                if ev is None:
+                    continue
+                if pickup is not None:
+                    _observe_age(pickup, ev)
+                msg = _format_event(ev, open_in, get_name)
+                if msg:
+                    yield msg, (cur_ym, end, ev.id)
+    finally:
+        tail.close()
+    if sub is not None:
+        yield from follow_bus(bus_probe, (cur_ym, tail.offset), sub)
+
+
+def _try_subscribe(path: Path, ym: str, offset: int):
+    if not path.exists():
+        return None
+    try:
+        return EventSubscriber(path, ym, offset)
+    except OSError:
+        return None
+
+
+def _observe_age(h, ev: EventRecord) -> None:
+    h.observe(max(0.0, time.time() - ev.epoch))
+
+
+def _resume_point(repo_root: Path, cursor: dict | None, cur_ym: str):
+    if not cursor:
+        return None
+    ym = cursor.get("month", "")
+    offset = int(cursor.get("offset", 0))
+    if len(ym) != 7 or ym > cur_ym or offset < 0:
+        return None
+    size = events_month_size(repo_root, ym)
+    if offset > size:
+        print(f"notify_cursor_ignored month={ym} offset={offset} size={size}", file=sys.stderr, flush=True)
+        return None
+    last_id = cursor.get("last_id", "")
+    if last_id and offset > 0 and event_id_before(repo_root, ym, offset) != last_id:
+        print(f"notify_cursor_ignored month={ym} offset={offset} id_mismatch", file=sys.stderr, flush=True)
+        return None
+    return ym, offset
+
+
+def _backlog_summary(events: list[EventRecord]) -> str:
+    acts = {}
+    for ev in events:
+        acts[ev.act] = acts.get(ev.act, 0) + 1
+    parts = " / ".join(f"{a} {acts[a]}" for a in ("IN", "OUT", "ERROR") if a in acts)
+    span = f"{_fmt_ev_dt(events[0])} – {_fmt_ev_dt(events[-1])}  " if events else ""
+    return f"… {len(events)} earlier events not posted  {span}({parts})"
 
-        try:
-            ts = parse_iso(ts_s)
-        except Exception:
-            continue
 
-        dt = _fmt_jst_dt(ts)
-        disp = get_name(emp)
-
-        if act == "IN":
-            open_in[emp] = ts
-            msg = f"{dt}  {disp}  IN"
-        elif act == "OUT":
-            if emp in open_in:
-                t0 = open_in.pop(emp)
-                dur = _fmt_dur(t0, ts)
-                msg = f"{dt}  {disp}  OUT  ({dur})" if dur else f"{dt}  {disp}  OUT"
-            else:
-                msg = f"{dt}  {disp}  OUT"
-        elif act == "ERROR":
-            code = ev.get("code")
-            code_s = str(code).strip() if code is not None else ""
-            open_in.pop(emp, None)
-            msg = f"{dt}  {disp}  ERROR  {code_s}" if code_s else f"{dt}  {disp}  ERROR"
-        else:
-            continue
+def main() -> None:
+    repo_root = Path(__file__).resolve().parents[1]
+    webhook_url = _env_str("ATT_DISCORD_WEBHOOK_URL")
+    if not webhook_url:
+        raise RuntimeError("ATT_DISCORD_WEBHOOK_URL_EMPTY")
 
-        try:
-            _post_discord_retry(webhook_url, msg)
-        except Exception as e:
-            print(str(e), file=sys.stderr, flush=True)
+    mode = _env_str("ATT_DISCORD_WATCH").lower() or "auto"
+    bus_path = event_bus_path(repo_root) if mode in ("auto", "bus") else None
+    bus_probe = None
+    if bus_path is not None and mode == "auto" and not bus_path.exists():
+        bus_probe = bus_path
+        bus_path = None
+    watcher = None if bus_path is not None else open_watcher(repo_root / "state" / "attendance" / "events", mode=mode)
+    print(f"watch={'bus' if bus_path is not None else watcher.kind}", file=sys.stderr, flush=True)
+
+    cursor = NotifyCursor(repo_root / "state" / "attendance" / "discord" / "cursor.json", _env_float("ATT_DISCORD_CURSOR_SEC", 2.0))
+    resume = cursor.load()
+    if resume is None:
+        ym = month_key(now_jst())
+        size = events_month_size(repo_root, ym)
+        resume = {"month": ym, "offset": size, "last_id": event_id_before(repo_root, ym, size) if size else ""}
+        cursor.advance((ym, size, resume["last_id"]))
+    cursor.start()
+    metrics = set_default_component("discord")
+    exporters = start_exporters(metrics, "discord")
+    sender = DiscordSender(webhook_url, on_done=cursor.advance, metrics=metrics)
+    collect_stats(metrics, "att_discord", sender.stats, gauges=("pending", "cursor_held"))
+    collect_stats(metrics, "att_http_pool", default_pool().stats, gauges=("idle", "redirect_cache"))
+    try:
+        for msg, pos in follow_messages(repo_root, watcher, cursor=resume, backlog_max=_env_int("ATT_DISCORD_BACKLOG_MAX", 20), bus_path=bus_path, metrics=metrics, bus_probe=bus_probe):
+            sender.submit(msg, pos)
+    finally:
+        sender.close()
+        cursor.close()
+        exporters.close()
+        close_default_pool()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,24 @@
+import argparse
 import json
 import os
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from lib.payroll_calc import build_daily_payroll_records
-from lib.attendance_store import iter_events_month, month_key, month_payroll_path
-from lib.time_jst import now_jst
-from lib.env_loader import load_employee_env
-from lib.gas_sync import post_records
+from lib.payroll_calc import OutOfOrder, PayrollState, build_daily_payroll_records, carry_in, employee_rates, month_view, payroll_record
+from lib.attendance_store import archive_closed_months, events_head_digest, fsync_dir, iter_decoded_month_from, month_key, month_payroll_path, months_between, payroll_month_exists
+from lib.time_jst import iso_epoch, now_jst
+from lib.env_loader import employee_registry
+from lib.event_merge import SiteMerge, site_roots
+from lib.gas_sync import sync_records_delta
+from lib.http_pool import close_default_pool, default_pool
+from lib.metrics import Metrics, collect_stats, set_default_component, start_exporters
+
+
+_CHECKPOINT_VERSION = 1
 
 
 def _env_int(key: str, default: int) -> int:
@@ -49,32 +57,11 @@ def _prev_month_key(ym: str) -> str:
     return f"{y:04d}-{m:02d}"
 
 
-def _emp_name(repo_root: Path, emp: str, cache: dict) -> str:
-    if emp in cache:
-        return cache[emp]
+def _emp_name(registry, emp: str) -> str:
     try:
-        env = load_employee_env(repo_root, emp)
-        name = str(env.get("NAME", "")).strip()
+        return registry.name(emp)
     except Exception:
-        name = ""
-    cache[emp] = name
-    return name
-
-
-def _post_records_retry(gas_url: str, records: list[dict], token: str | None, timeout_sec: int, retries: int, sleep_sec: float) -> dict:
-    last_err = None
-    n = retries if retries > 0 else 1
-    for i in range(n):
-        try:
-            ack = post_records(gas_url, records, token, timeout_sec)
-            out = dict(ack) if isinstance(ack, dict) else {"ok": True}
-            out["sent_records"] = len(records)
-            return out
-        except Exception as e:
-            last_err = e
-            if i + 1 < n:
-                time.sleep(sleep_sec)
-    raise last_err if last_err else RuntimeError("gas_post_failed")
+        return ""
 
 
 def _write_jsonl_replace(path: Path, records: list[dict]) -> None:
@@ -90,14 +77,44 @@ def _write_jsonl_replace(path: Path, records: list[dict]) -> None:
             f.flush()
             os.fsync(f.fileno())
         os.replace(tmp, path)
+        fsync_dir(path.parent)
+    finally:
         try:
-            dfd = os.open(str(path.parent), os.O_DIRECTORY)
-            try:
-                os.fsync(dfd)
-            finally:
-                os.close(dfd)
+            if tmp.exists():
+                tmp.unlink()
         except Exception:
             pass
+
+
+def _checkpoint_path(repo_root: Path, ym: str) -> Path:
+    return month_payroll_path(repo_root, ym).with_suffix(".ckpt.json")
+
+
+def _load_checkpoint(repo_root: Path, ym: str) -> dict | None:
+    try:
+        with open(_checkpoint_path(repo_root, ym), "r", encoding="utf-8") as f:
+            ck = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(ck, dict) or ck.get("v") != _CHECKPOINT_VERSION:
+        return None
+    try:
+        offset = int(ck.get("offset", 0))
+    except Exception:
+        return None
+    if offset <= 0 or ck.get("head") != events_head_digest(repo_root, ym, offset):
+        return None
+    return ck
+
+
+def _write_json_replace(path: Path, obj: dict) -> None:
+    tmp = path.with_name(f"{path.name}.tmp.{os.getpid()}.{time.time_ns()}")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
     finally:
         try:
             if tmp.exists():
@@ -106,33 +123,315 @@ def _write_jsonl_replace(path: Path, records: list[dict]) -> None:
             pass
 
 
-def _build_month(repo_root: Path, ym: str, name_cache: dict) -> tuple[list[dict], dict, Path]:
-    events = [ev for ev in iter_events_month(repo_root, ym) if isinstance(ev, dict)]
-    records, summary = build_daily_payroll_records(repo_root, events)
+def _read_new_events(repo_root: Path, ym: str, offset: int) -> tuple[list, int]:
+    events = []
+    end = offset
+    for end, ev in iter_decoded_month_from(repo_root, ym, offset):
+        events.append(ev)
+    return events, end
+
+
+def _build_month(repo_root: Path, ym: str, full: bool = False) -> tuple[list[dict], dict, Path]:
+    registry = employee_registry(repo_root)
+    registry.refresh()
+    carry = carry_in(repo_root, ym)
+    carry_j = {emp: iso_epoch(t0) for emp, t0 in carry.items()}
+    ck = None if full else _load_checkpoint(repo_root, ym)
+    if ck is not None and ck.get("carry", {}) != carry_j:
+        ck = None
+    ps = PayrollState(carry)
+    rows = {}
+    rates_prev = {}
+    names_prev = {}
+    open_prev = set()
+    offset = 0
+    if ck is not None:
+        try:
+            ps = PayrollState.from_json(ck.get("state", {}))
+            rows = dict(ck.get("rows", {}))
+            rates_prev = dict(ck.get("rates", {}))
+            names_prev = dict(ck.get("names", {}))
+            open_prev = ps.open_keys()
+            offset = int(ck["offset"])
+        except Exception:
+            ck = None
+            ps = PayrollState(carry)
 
+    events, end = _read_new_events(repo_root, ym, offset)
+    try:
+        dirty = ps.add_events(events)
+    except OutOfOrder:
+        ck = None
+        ps = PayrollState(carry)
+        rows = {}
+        events, end = _read_new_events(repo_root, ym, 0)
+        dirty = ps.add_events(events)
+    dirty |= open_prev | ps.open_keys()
+
+    changed = ck is None
+    view = month_view(repo_root, ym, ps)
+    flags = view.final_flags()
+    env_cache = {}
+    rows_out = {}
+    records = []
+    for emp, d in view.keys(ym):
+        rk = f"{d}|{emp}"
+        rates = employee_rates(repo_root, emp, env_cache)
+        if (emp, d) not in dirty and rk in rows and rates_prev.get(emp) == list(rates):
+            rec = rows[rk]
+        else:
+            rec = payroll_record(emp, d, int(view.mins.get((emp, d), 0)), flags.get((emp, d), set()), rates)
+            if rows.get(rk) != rec:
+                changed = True
+        rows_out[rk] = rec
+        if rec is not None:
+            records.append(rec)
+    if set(rows_out) != set(rows):
+        changed = True
+
+    names = {}
+    out = []
     for r in records:
-        if not isinstance(r, dict):
-            continue
+        r = dict(r)
         emp = str(r.get("emp", "")).strip()
         if emp:
-            r["name"] = _emp_name(repo_root, emp, name_cache)
-
-    records = [r for r in records if isinstance(r, dict)]
-    records.sort(key=lambda r: (str(r.get("date", "")), str(r.get("emp", ""))))
+            r["name"] = _emp_name(registry, emp)
+            names[emp] = r["name"]
+        out.append(r)
+    if names != names_prev:
+        changed = True
+    out.sort(key=lambda r: (str(r.get("date", "")), str(r.get("emp", ""))))
 
     out_path = month_payroll_path(repo_root, ym)
-    _write_jsonl_replace(out_path, records)
+    if changed or not payroll_month_exists(repo_root, ym):
+        _write_jsonl_replace(out_path, out)
+
+    if changed or ck is None or end != offset:
+        _write_json_replace(
+            _checkpoint_path(repo_root, ym),
+            {
+                "v": _CHECKPOINT_VERSION,
+                "offset": end,
+                "head": events_head_digest(repo_root, ym, end),
+                "carry": carry_j,
+                "state": ps.to_json(),
+                "rates": {emp: list(v) for emp, v in env_cache.items()},
+                "names": names,
+                "rows": rows_out,
+            },
+        )
+
+    return out, ps.summary(records, ym), out_path
+
+
+def _month_arg(v: str) -> str:
+    s = str(v).strip()
+    if len(s) != 7 or s[4] != "-" or not (s[:4] + s[5:]).isdigit() or not 1 <= int(s[5:]) <= 12:
+        raise argparse.ArgumentTypeError(f"bad_month {v!r} (want YYYY-MM)")
+    return s
+
 
-    if not isinstance(summary, dict):
-        summary = {}
-    return records, summary, out_path
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--full", action="store_true", help="ignore checkpoints and sync manifests; rebuild and resend every record")
+    ap.add_argument("--from", dest="ym_from", type=_month_arg, help="backfill: first month (YYYY-MM)")
+    ap.add_argument("--to", dest="ym_to", type=_month_arg, help="backfill: last month (YYYY-MM), defaults to the current month")
+    ap.add_argument("--workers", type=int, default=0, help="backfill: build processes (default: CPU count)")
+    ap.add_argument("--gas", action="store_true", help="backfill: upload each month to GAS as it completes")
+    ap.add_argument("--archive", action="store_true", help="only compress closed months into block segments and exit")
+    ap.add_argument("--sites", nargs="+", metavar="PATH", help="aggregate: site repo roots, or directories containing them")
+    ap.add_argument("--month", type=_month_arg, help="aggregate: month to build (YYYY-MM), defaults to the current month")
+    args = ap.parse_args(argv)
+    if args.month and not args.sites:
+        ap.error("--month requires --sites")
+    if args.sites and args.ym_from:
+        ap.error("--sites cannot be combined with --from")
+    if args.ym_to and not args.ym_from:
+        ap.error("--to requires --from")
+    if args.ym_from and args.ym_to and args.ym_from > args.ym_to:
+        ap.error("--from is after --to")
+    return args
+
+
+def _gas_config() -> dict | None:
+    gas_url = str(os.environ.get("ATT_GAS_URL", "")).strip()
+    if not gas_url:
+        return None
+    return {
+        "gas_url": gas_url,
+        "token": str(os.environ.get("ATT_GAS_TOKEN", "")).strip() or None,
+        "timeout_sec": _env_int("ATT_GAS_TIMEOUT_SEC", 20),
+        "retries": _env_int("ATT_GAS_RETRIES", 3),
+        "sleep_sec": _env_float("ATT_GAS_RETRY_SLEEP_SEC", 2.0),
+        "backoff_max_sec": _env_float("ATT_GAS_BACKOFF_MAX_SEC", 60.0),
+        "chunk_size": _env_int("ATT_GAS_CHUNK_SIZE", 500),
+        "workers": _env_int("ATT_GAS_WORKERS", 2),
+        "gzip_body": _env_int("ATT_GAS_GZIP", 0) == 1,
+    }
+
+
+def _archive(repo_root: Path, dt) -> list[dict]:
+    codec = str(os.environ.get("ATT_ARCHIVE_CODEC", "")).strip() or "gzip"
+    out = archive_closed_months(repo_root, dt, _env_int("ATT_ARCHIVE_GRACE_DAYS", 7), codec, _env_int("ATT_ARCHIVE_BLOCK_KB", 32) * 1024)
+    for a in out:
+        for kind in ("events", "payroll"):
+            st = a.get(kind)
+            if st:
+                print(f"archived month={a['month']} kind={kind} raw={st['raw_bytes']} stored={st['archived_bytes']} blocks={st['blocks']} codec={codec}", file=sys.stderr, flush=True)
+    return out
+
+
+def _sites_payroll_path(repo_root: Path, ym: str) -> Path:
+    return repo_root / "state" / "attendance" / "payroll" / "sites" / f"{ym}.jsonl"
+
+
+def build_sites_month(repo_root: Path, sites: list, ym: str) -> tuple[list[dict], dict, Path]:
+    merge = SiteMerge.month(sites, ym, _env_float("ATT_MERGE_SLACK_SEC", 300.0), _env_float("ATT_MERGE_DEDUPE_SEC", 300.0))
+    records, summary = build_daily_payroll_records(repo_root, merge)
+    registry = employee_registry(repo_root)
+    registry.refresh()
+    out = []
+    for r in records:
+        r = dict(r)
+        r["name"] = _emp_name(registry, r["emp"])
+        out.append(r)
+    out.sort(key=lambda r: (r["date"], r["emp"]))
+    out_path = _sites_payroll_path(repo_root, ym)
+    _write_jsonl_replace(out_path, out)
+    summary.update(merge.stats)
+    return out, summary, out_path
+
+
+def _month_summary(ym: str, records: list[dict], summary: dict, out_path: Path) -> dict:
+    return {
+        "month": ym,
+        "events": int(summary.get("events", 0)),
+        "events_unknown_emp": int(summary.get("events_unknown_emp", 0)),
+        "days_emps": int(summary.get("days_emps", 0)),
+        "flags_days": int(summary.get("flags_days", 0)),
+        "local_path": str(out_path),
+        "local_records": len(records),
+    }
+
+
+def _sync_month(repo_root: Path, ym: str, records: list[dict], gas: dict, full: bool) -> dict:
+    return sync_records_delta(
+        repo_root,
+        ym,
+        records,
+        gas["gas_url"],
+        gas["token"],
+        gas["timeout_sec"],
+        gas["retries"],
+        gas["sleep_sec"],
+        full=full,
+        chunk_size=gas["chunk_size"],
+        gzip_body=gas["gzip_body"],
+        workers=gas["workers"],
+        backoff_max_sec=gas["backoff_max_sec"],
+    )
+
+
+def _backfill_month(job: tuple) -> tuple[str, list[dict] | None, dict]:
+    repo_root, ym, full, keep_records = job
+    t0 = time.perf_counter()
+    records, summary, out_path = _build_month(repo_root, ym, full=full)
+    s = _month_summary(ym, records, summary, out_path)
+    s["build_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    return ym, records if keep_records else None, s
+
+
+def backfill(repo_root: Path, months: list[str], full: bool = False, workers: int = 0, gas: dict | None = None):
+    workers = max(1, min(len(months), workers or os.cpu_count() or 1))
+    jobs = [(repo_root, ym, full, gas is not None) for ym in months]
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_backfill_month, jobs)
+    else:
+        results = map(_backfill_month, jobs)
+    try:
+        for ym, records, s in results:
+            if gas is not None:
+                t0 = time.perf_counter()
+                try:
+                    s["gas"] = _sync_month(repo_root, ym, records, gas, full)
+                except Exception as e:
+                    s["gas_error"] = str(e)
+                s["sync_sec"] = time.perf_counter() - t0
+            yield s
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def _note_month(metrics: Metrics, s: dict, build_sec: float, sync_sec: float | None) -> None:
+    ym = s["month"]
+    metrics.gauge("att_payroll_build_seconds", "Wall time of the last payroll build", month=ym).set(round(build_sec, 6))
+    metrics.gauge("att_payroll_records", "Payroll records in the last build", month=ym).set(s["local_records"])
+    metrics.gauge("att_payroll_events", "Events read by the last build", month=ym).set(s["events"])
+    if sync_sec is not None:
+        metrics.gauge("att_gas_sync_seconds", "Wall time of the last GAS sync", month=ym).set(round(sync_sec, 6))
 
 
 def main() -> None:
+    args = _parse_args()
+    metrics = set_default_component("payroll")
+    collect_stats(metrics, "att_http_pool", default_pool().stats, gauges=("idle", "redirect_cache"))
+    exporters = start_exporters(metrics, "payroll")
+    try:
+        _run(args, metrics)
+    finally:
+        metrics.gauge("att_payroll_last_run_timestamp_seconds", "Unix time the last payroll run finished").set(round(time.time(), 3))
+        exporters.close()
+        close_default_pool()
+
+
+def _run(args: argparse.Namespace, metrics: Metrics) -> None:
     repo_root = Path(__file__).resolve().parents[1]
     dt = now_jst()
     ym_this = month_key(dt)
 
+    if args.archive:
+        print(json.dumps({"archived": _archive(repo_root, dt)}, ensure_ascii=False, separators=(",", ":")), flush=True)
+        return
+
+    if args.sites:
+        ym = args.month or ym_this
+        sites = site_roots(args.sites)
+        if not sites:
+            raise RuntimeError("no_sites_found")
+        t0 = time.perf_counter()
+        records, summary, out_path = build_sites_month(repo_root, sites, ym)
+        build_sec = time.perf_counter() - t0
+        s = _month_summary(ym, records, summary, out_path)
+        for k in ("sites", "duplicates"):
+            s[k] = int(summary.get(k, 0))
+        s["elapsed_ms"] = round(build_sec * 1000.0, 1)
+        _note_month(metrics, s, build_sec, None)
+        print(json.dumps(s, ensure_ascii=False, separators=(",", ":")), flush=True)
+        return
+
+    if args.ym_from:
+        months = months_between(args.ym_from, args.ym_to or ym_this)
+        gas = _gas_config() if args.gas else None
+        if args.gas and gas is None:
+            raise RuntimeError("missing ATT_GAS_URL")
+        t0 = time.perf_counter()
+        out_months = []
+        for s in backfill(repo_root, months, full=args.full, workers=args.workers, gas=gas):
+            _note_month(metrics, s, s["build_ms"] / 1000.0, s.pop("sync_sec", None))
+            out_months.append(s)
+        print(
+            json.dumps(
+                {"months": out_months, "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1)},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ),
+            flush=True,
+        )
+        return
+
     months = [ym_this]
     try:
         day = int(getattr(dt, "day", 0) or 0)
@@ -143,30 +442,27 @@ def main() -> None:
         if ym_prev and ym_prev != ym_this:
             months = [ym_prev, ym_this]
 
-    gas_url = str(os.environ.get("ATT_GAS_URL", "")).strip()
-    token = str(os.environ.get("ATT_GAS_TOKEN", "")).strip() or None
-    timeout_sec = _env_int("ATT_GAS_TIMEOUT_SEC", 20)
-    retries = _env_int("ATT_GAS_RETRIES", 3)
-    sleep_sec = _env_float("ATT_GAS_RETRY_SLEEP_SEC", 2.0)
-
-    name_cache = {}
+    gas = _gas_config()
     out_months = []
     for ym in months:
-        records, summary, out_path = _build_month(repo_root, ym, name_cache)
-        s = {
-            "month": ym,
-            "events": int(summary.get("events", 0)),
-            "events_unknown_emp": int(summary.get("events_unknown_emp", 0)),
-            "days_emps": int(summary.get("days_emps", 0)),
-            "flags_days": int(summary.get("flags_days", 0)),
-            "local_path": str(out_path),
-            "local_records": len(records),
-        }
-        if gas_url:
-            ack = _post_records_retry(gas_url, records, token, timeout_sec, retries, sleep_sec)
-            s["gas"] = ack
+        t0 = time.perf_counter()
+        records, summary, out_path = _build_month(repo_root, ym, full=args.full)
+        s = _month_summary(ym, records, summary, out_path)
+        build_sec = time.perf_counter() - t0
+        sync_sec = None
+        if gas is not None:
+            t0 = time.perf_counter()
+            s["gas"] = _sync_month(repo_root, ym, records, gas, args.full)
+            sync_sec = time.perf_counter() - t0
+        _note_month(metrics, s, build_sec, sync_sec)
         out_months.append(s)
 
+    if str(os.environ.get("ATT_ARCHIVE", "")).strip().lower() in ("1", "on", "true", "yes"):
+        try:
+            _archive(repo_root, dt)
+        except Exception as e:
+            print(f"archive_failed err={e}", file=sys.stderr, flush=True)
+
     if len(out_months) == 1:
         print(json.dumps(out_months[0], ensure_ascii=False, separators=(",", ":")), flush=True)
         return
@@ -1,4 +1,8 @@
+import argparse
 import json
+import os
+import queue
+import signal
 import sys
 import threading
 import time
@@ -6,62 +10,296 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from lib.rcs300_pcsc import read_uid_blocking
-from lib.attendance_rules import State, apply_rules, sweep_errors
-from lib.attendance_store import append_event, month_events_path
-from lib.time_jst import now_jst, iso_jst
+from lib.rcs300_pcsc import list_readers, read_uid_blocking, reader_registry_stats, take_read_timing
+from lib.attendance_rules import State, apply_rules, next_deadline, sweep_errors
+from lib.attendance_store import EventWriter
+from lib.event_bus import EventBus, event_bus_path
+from lib.metrics import Metrics, StageRecorder, collect_stats, set_default_component, start_exporters
+from lib.time_jst import now_jst
+from lib.uid_map import UidMap
 
 
-def load_uid_map(path: Path) -> dict:
+_SWEEP_MAX_SLEEP = 60.0
+
+
+def _env_int(key: str, default: int) -> int:
+    v = str(os.environ.get(key, "")).strip()
+    if not v:
+        return default
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            o = json.load(f)
-        return o if isinstance(o, dict) else {}
+        return int(v)
     except Exception:
-        return {}
+        return default
+
+
+def open_event_writer(repo_root: Path) -> EventWriter:
+    mode = str(os.environ.get("ATT_EVENTS_FSYNC", "")).strip().lower() or "none"
+    if mode not in EventWriter.MODES:
+        mode = "none"
+    return EventWriter(
+        repo_root,
+        mode=mode,
+        interval_ms=_env_int("ATT_EVENTS_FSYNC_MS", 200),
+        interval_events=_env_int("ATT_EVENTS_FSYNC_N", 32),
+    )
+
+
+def open_event_bus(repo_root: Path, writer: EventWriter) -> EventBus | None:
+    path = event_bus_path(repo_root)
+    if path is None:
+        return None
+    try:
+        bus = EventBus(repo_root, path).start(writer.position())
+    except OSError as e:
+        print(f"event_bus_disabled path={path} err={e}", file=sys.stderr, flush=True)
+        return None
+    writer.on_append = bus.publish
+    return bus
+
+
+def open_uid_map(repo_root: Path, stop: threading.Event) -> UidMap:
+    uid_map = UidMap(repo_root / "config" / "attendance" / "uid_map.json")
+    uid_map.reload()
+    mode = str(os.environ.get("ATT_UID_MAP_WATCH", "")).strip().lower() or "auto"
+    if mode == "off":
+        return uid_map
+    try:
+        uid_map.watch(stop, mode=mode if mode in ("inotify", "poll") else "auto")
+    except OSError as e:
+        print(f"uid_map_watch_disabled err={e}", file=sys.stderr, flush=True)
+    return uid_map
+
+
+_STAGES = ("uid_capture", "card_release", "lock_wait", "apply_rules", "append", "tap_total")
+
+
+class TapMetrics:
+    def __init__(self, metrics: Metrics):
+        self.recorder = StageRecorder()
+        self.append = self.recorder.append
+        self._stage = {k: metrics.histogram("att_reader_stage_seconds", "Per-tap latency by stage", stage=k) for k in _STAGES}
+        self._taps = metrics.counter("att_reader_taps_total", "Card taps handed to the rules engine")
+        self._debounced = metrics.counter("att_reader_taps_suppressed_total", "Taps that produced no event", reason="debounce")
+        self._done_day = metrics.counter("att_reader_taps_suppressed_total", "Taps that produced no event", reason="done_day")
+        self._unknown = metrics.counter("att_reader_unknown_taps_total", "Taps from cards missing from uid_map")
+        self._read_errors = metrics.counter("att_reader_read_errors_total", "Failed PC/SC reads")
+        self._m = metrics
+        metrics.collect(self.flush)
+
+    def flush(self, m: Metrics) -> None:
+        stage = self._stage
+        for r in self.recorder.drain():
+            kind = r[0]
+            if kind == "tap":
+                _, t_read, t0, t1, t2, t3, acts, suppressed, unknown = r
+                self._taps.inc()
+                stage["lock_wait"].observe((t1 - t0) / 1e9)
+                stage["apply_rules"].observe((t2 - t1) / 1e9)
+                if acts:
+                    stage["append"].observe((t3 - t2) / 1e9)
+                stage["tap_total"].observe((t3 - (t_read or t0)) / 1e9)
+                if suppressed == "debounce":
+                    self._debounced.inc()
+                elif suppressed:
+                    self._done_day.inc()
+                if unknown:
+                    self._unknown.inc()
+                self._count(acts)
+            elif kind == "read":
+                stage["uid_capture"].observe(r[1] / 1e9)
+                stage["card_release"].observe(r[2] / 1e9)
+            elif kind == "sweep":
+                self._count(r[1])
+            elif kind == "read_error":
+                self._read_errors.inc()
+
+    def _count(self, acts) -> None:
+        for act, code in ((acts, None),) if isinstance(acts, str) else acts:
+            self._m.counter("att_reader_events_total", "Events appended to the log", act=act).inc()
+            if act == "ERROR":
+                self._m.counter("att_reader_errors_total", "ERROR events by code", code=code or "error").inc()
+
+
+class TapHandler:
+    def __init__(self, st: State, lock: threading.Lock, uid_map, emit, tap_metrics: TapMetrics | None = None):
+        self.st = st
+        self.lock = lock
+        self.uid_map = uid_map
+        self.emit = emit
+        self.tap_metrics = tap_metrics
+
+    def __call__(self, ts, uid: str, t_read: int | None = None) -> list[dict]:
+        tm = self.tap_metrics
+        if tm is None:
+            emp = self.uid_map.lookup(uid)
+            with self.lock:
+                evs = apply_rules(self.st, ts, uid, emp)
+                for ev in evs:
+                    self.emit(ev)
+            return evs
+        t0 = time.perf_counter_ns()
+        emp = self.uid_map.lookup(uid)
+        with self.lock:
+            t1 = time.perf_counter_ns()
+            cs = self.st.cards.get(uid)
+            seen = None if cs is None else cs.last_seen
+            evs = apply_rules(self.st, ts, uid, emp)
+            t2 = time.perf_counter_ns()
+            for ev in evs:
+                self.emit(ev)
+            t3 = time.perf_counter_ns()
+        suppressed = None
+        if not evs:
+            suppressed = "debounce" if cs is not None and cs.last_seen == seen else "done_day"
+        tm.append(("tap", t_read, t0, t1, t2, t3, _acts(evs), suppressed, emp == "unknown"))
+        return evs
+
+
+def _acts(evs: list[dict]):
+    if len(evs) == 1 and evs[0]["act"] != "ERROR":
+        return evs[0]["act"]
+    return tuple((ev["act"], ev.get("code")) for ev in evs)
+
+
+def _note_read(tap_metrics: TapMetrics | None) -> int | None:
+    if tap_metrics is None:
+        return None
+    t = take_read_timing()
+    if t is not None:
+        tap_metrics.append(("read", t[0], t[1]))
+    return time.perf_counter_ns()
+
+
+class TapClock:
+    def __init__(self, now_fn=now_jst):
+        self._now = now_fn
+        self._lock = threading.Lock()
+        self._last = None
+
+    def submit(self, taps: queue.Queue, uid: str, reader_index: int, t_read: int | None = None) -> None:
+        with self._lock:
+            ts = self._now()
+            if self._last is not None and ts < self._last:
+                ts = self._last
+            self._last = ts
+            taps.put((ts, uid, reader_index, t_read))
+
+
+def reader_worker(reader_index: int, taps: queue.Queue, clock: TapClock, stop: threading.Event, read_fn=read_uid_blocking, tap_metrics: TapMetrics | None = None) -> None:
+    while not stop.is_set():
+        try:
+            uid = read_fn(reader_index, exact=True)
+        except Exception as e:
+            if tap_metrics is not None:
+                tap_metrics.append(("read_error",))
+            print(f"reader={reader_index} {e}", file=sys.stderr, flush=True)
+            stop.wait(1.0)
+            continue
+        clock.submit(taps, uid, reader_index, _note_read(tap_metrics))
+
+
+def start_reader_workers(
+    indices: list[int],
+    taps: queue.Queue,
+    clock: TapClock,
+    stop: threading.Event,
+    read_fn=read_uid_blocking,
+    tap_metrics: TapMetrics | None = None,
+) -> list[threading.Thread]:
+    ths = []
+    for ri in indices:
+        th = threading.Thread(target=reader_worker, args=(ri, taps, clock, stop, read_fn, tap_metrics), name=f"reader-{ri}", daemon=True)
+        th.start()
+        ths.append(th)
+    return ths
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--multi", action="store_true", help="read every detected reader concurrently")
+    return ap.parse_args(argv)
 
 
 def main() -> None:
+    args = _parse_args()
     repo_root = Path(__file__).resolve().parents[1]
-    uid_map_path = repo_root / "config" / "attendance" / "uid_map.json"
-    uid_map = load_uid_map(uid_map_path)
+    stop = threading.Event()
+    uid_map = open_uid_map(repo_root, stop)
 
-    st = State.from_current_month(repo_root)
+    st = State.restore(repo_root)
     lock = threading.Lock()
-    stop = threading.Event()
+    wake = threading.Event()
+
+    writer = open_event_writer(repo_root)
+    repaired = writer.open_month(now_jst())
+    if repaired:
+        print(f"events_tail_repaired bytes={repaired}", file=sys.stderr, flush=True)
+    bus = open_event_bus(repo_root, writer)
+
+    metrics = set_default_component("reader")
+    exporters = start_exporters(metrics, "reader")
+    tap_metrics = TapMetrics(metrics) if exporters.items else None
+    for backend in ("native", "opensc"):
+        collect_stats(metrics, "att_reader_pcsc", lambda b=backend: reader_registry_stats()[b], labels={"backend": backend})
+    if bus is not None:
+        collect_stats(metrics, "att_event_bus", bus.stats, gauges=("connected",))
 
     def emit(ev: dict) -> None:
-        p = month_events_path(repo_root, ev["ts"])
-        append_event(p, ev)
-        ev_out = dict(ev)
-        ev_out["ts"] = iso_jst(ev_out["ts"])
-        print(json.dumps(ev_out, ensure_ascii=False, separators=(",", ":")), flush=True)
+        print(writer.append(ev), flush=True)
+
+    handle = TapHandler(st, lock, uid_map, emit, tap_metrics)
 
     def sweeper() -> None:
         while not stop.is_set():
-            time.sleep(1.0)
+            with lock:
+                due = next_deadline(st)
+            wait = _SWEEP_MAX_SLEEP if due is None else due - time.time()
+            if wait > 0:
+                if wake.wait(min(wait, _SWEEP_MAX_SLEEP)):
+                    wake.clear()
+                continue
             ts = now_jst()
             try:
                 with lock:
-                    for ev in sweep_errors(st, ts):
+                    evs = sweep_errors(st, ts)
+                    for ev in evs:
                         emit(ev)
+                if evs and tap_metrics is not None:
+                    tap_metrics.append(("sweep", _acts(evs)))
             except Exception as e:
                 print(str(e), file=sys.stderr, flush=True)
+                stop.wait(1.0)
 
     th = threading.Thread(target=sweeper, daemon=True)
     th.start()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: stop.set())
 
     try:
-        while True:
-            uid = read_uid_blocking()
-            ts = now_jst()
-            emp = str(uid_map.get(uid, "unknown"))
-            with lock:
-                for ev in apply_rules(st, ts, uid, emp):
-                    emit(ev)
-    except KeyboardInterrupt:
+        taps = queue.Queue()
+        if args.multi:
+            readers = list_readers()
+            if not readers:
+                raise RuntimeError("no pcsc readers")
+            start_reader_workers([idx for idx, _ in readers], taps, TapClock(), stop, tap_metrics=tap_metrics)
+            print(f"readers={json.dumps([name for _, name in readers], ensure_ascii=False)}", file=sys.stderr, flush=True)
+        else:
+            start_reader_workers([0], taps, TapClock(), stop, read_fn=lambda ri, exact: read_uid_blocking(ri), tap_metrics=tap_metrics)
+        while not stop.is_set():
+            try:
+                ts, uid, _ri, t_read = taps.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            handle(ts, uid, t_read)
+            wake.set()
+    finally:
         stop.set()
-        return
+        try:
+            writer.close()
+        finally:
+            if bus is not None:
+                bus.close()
+            exporters.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from lib.file_watch import open_watcher
+from lib.http_pool import close_default_pool, default_pool
+from lib.metrics import collect_stats, set_default_component, start_exporters
+from lib.replica import Replicator
+from lib.time_jst import now_jst
+
+
+def _env_str(key: str) -> str:
+    return str(os.environ.get(key, "")).strip()
+
+
+def _env_int(key: str, default: int) -> int:
+    try:
+        return int(_env_str(key) or default)
+    except Exception:
+        return default
+
+
+def _env_float(key: str, default: float) -> float:
+    try:
+        return float(_env_str(key) or default)
+    except Exception:
+        return default
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", action="store_true", help="ship everything not yet acknowledged, print stats and exit")
+    return ap.parse_args(argv)
+
+
+def open_replicator(repo_root: Path, metrics=None) -> Replicator:
+    url = _env_str("ATT_REPLICA_URL")
+    if not url:
+        raise RuntimeError("ATT_REPLICA_URL_EMPTY")
+    return Replicator(
+        repo_root,
+        url,
+        _env_str("ATT_SITE_ID") or socket.gethostname().split(".")[0],
+        token=_env_str("ATT_REPLICA_TOKEN") or None,
+        batch_lines=_env_int("ATT_REPLICA_BATCH", 2000),
+        batch_bytes=_env_int("ATT_REPLICA_BATCH_KB", 256) * 1024,
+        gzip_body=_env_int("ATT_REPLICA_GZIP", 1) == 1,
+        timeout_sec=_env_float("ATT_REPLICA_TIMEOUT_SEC", 20.0),
+        backoff_sec=_env_float("ATT_REPLICA_BACKOFF_SEC", 1.0),
+        backoff_max_sec=_env_float("ATT_REPLICA_BACKOFF_MAX_SEC", 300.0),
+        month_grace_sec=_env_float("ATT_REPLICA_MONTH_GRACE_H", 48.0) * 3600.0,
+        from_month=_env_str("ATT_REPLICA_FROM") or None,
+        metrics=metrics,
+    )
+
+
+def main() -> None:
+    args = _parse_args()
+    repo_root = Path(__file__).resolve().parents[1]
+    metrics = set_default_component("replicate")
+    exporters = start_exporters(metrics, "replicate")
+    rep = open_replicator(repo_root, metrics)
+    collect_stats(metrics, "att_replica", rep.stats, gauges=("lag_seconds", "halted"))
+    collect_stats(metrics, "att_http_pool", default_pool().stats, gauges=("idle", "redirect_cache"))
+    stop = threading.Event()
+    try:
+        if args.once:
+            t0 = time.perf_counter()
+            rep.drain(now_jst(), stop)
+            out = rep.stats()
+            out["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+            print(json.dumps(out, ensure_ascii=False, separators=(",", ":")), flush=True)
+        else:
+            mode = _env_str("ATT_REPLICA_WATCH").lower() or "auto"
+            watcher = open_watcher(repo_root / "state" / "attendance" / "events", mode=mode)
+            print(f"replica site={rep.site} url={rep.url} watch={watcher.kind}", file=sys.stderr, flush=True)
+            try:
+                rep.follow(watcher, stop, now_jst)
+            finally:
+                watcher.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        exporters.close()
+        close_default_pool()
+    if rep.halted:
+        raise RuntimeError(rep.halted)
+
+
+if __name__ == "__main__":
+    main()
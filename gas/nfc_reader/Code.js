@@ -11,6 +11,9 @@ function doPost(e) {
 
     var bodyText = (e && e.postData && e.postData.contents) ? e.postData.contents : "";
     var body = bodyText ? JSON.parse(bodyText) : {};
+    if (body && typeof body.gzip === "string") {
+      body = _ungzipJson_(body.gzip);
+    }
 
     var op = "";
     if (body && typeof body === "object" && !Array.isArray(body)) {
@@ -27,22 +30,21 @@ function doPost(e) {
     if (Array.isArray(body)) records = body;
     else if (body && Array.isArray(body.records)) records = body.records;
 
+    var deletes = [];
+    if (body && !Array.isArray(body) && Array.isArray(body.deletes)) deletes = body.deletes;
+
     var inserted = 0;
     var updated = 0;
     var skipped = 0;
+    var deleted = 0;
+
+    if (deletes && deletes.length > 0) {
+      deleted = _deleteIds_(sh, deletes);
+    }
 
     if (records && records.length > 0) {
       var needCols = PAYROLL_RAW_HEADERS.length;
-      var lastRow = sh.getLastRow();
-      var idToRow = {};
-
-      if (lastRow >= 2) {
-        var ids = sh.getRange(2, 1, lastRow - 1, 1).getValues();
-        for (var r = 0; r < ids.length; r++) {
-          var id0 = String(ids[r][0] || "").trim();
-          if (id0) idToRow[id0] = r + 2;
-        }
-      }
+      var idToRow = _idToRow_(sh);
 
       var nowIso = new Date().toISOString();
       var appendRows = [];
@@ -80,6 +82,10 @@ function doPost(e) {
 
     SpreadsheetApp.flush();
 
+    if (body && !Array.isArray(body) && body.refresh === false) {
+      return _json({ ok: true, inserted: inserted, updated: updated, skipped: skipped, deleted: deleted, refreshed: false });
+    }
+
     var refreshed = false;
     var refreshError = "";
 
@@ -97,12 +103,12 @@ function doPost(e) {
     }
 
     if (!refreshed) {
-      var outNg = { ok: false, inserted: inserted, updated: updated, skipped: skipped, refreshed: false };
+      var outNg = { ok: false, inserted: inserted, updated: updated, skipped: skipped, deleted: deleted, refreshed: false };
       if (refreshError) outNg.refresh_error = refreshError;
       return _json(outNg);
     }
 
-    return _json({ ok: true, inserted: inserted, updated: updated, skipped: skipped, refreshed: true });
+    return _json({ ok: true, inserted: inserted, updated: updated, skipped: skipped, deleted: deleted, refreshed: true });
   } catch (err) {
     return _json({ ok: false, error: String(err) });
   } finally {
@@ -179,6 +185,44 @@ function _getSheet_() {
   return sh;
 }
 
+function _ungzipJson_(b64) {
+  var blob = Utilities.newBlob(Utilities.base64Decode(b64), "application/x-gzip");
+  var text = Utilities.ungzip(blob).getDataAsString("UTF-8");
+  return text ? JSON.parse(text) : {};
+}
+
+function _idToRow_(sh) {
+  var lastRow = sh.getLastRow();
+  var idToRow = {};
+
+  if (lastRow >= 2) {
+    var ids = sh.getRange(2, 1, lastRow - 1, 1).getValues();
+    for (var r = 0; r < ids.length; r++) {
+      var id0 = String(ids[r][0] || "").trim();
+      if (id0) idToRow[id0] = r + 2;
+    }
+  }
+
+  return idToRow;
+}
+
+function _deleteIds_(sh, deletes) {
+  var idToRow = _idToRow_(sh);
+  var rows = [];
+
+  for (var i = 0; i < deletes.length; i++) {
+    var id = String(deletes[i] || "").trim();
+    if (id && idToRow[id]) rows.push(idToRow[id]);
+  }
+
+  rows.sort(function (a, b) { return b - a; });
+  for (var j = 0; j < rows.length; j++) {
+    sh.deleteRow(rows[j]);
+  }
+
+  return rows.length;
+}
+
 function _readCell_(sh, row, col) {
   try {
     var v = sh.getRange(row, col, 1, 1).getValues()[0][0];
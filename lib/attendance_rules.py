@@ -1,100 +1,163 @@
+import heapq
 import uuid
 from dataclasses import dataclass
 from datetime import timedelta
 from pathlib import Path
 
-from lib.attendance_store import iter_events_month, month_key
-from lib.time_jst import date_jst, now_jst, parse_iso
+from lib.attendance_store import EventRecord, iter_decoded_since, last_event_epoch
+from lib.time_jst import date_jst, day_date, epoch_jst, midnight_jst, now_jst, start_of_day_jst
 
 
 _DEBOUNCE = timedelta(minutes=5)
 _TIMEOUT = timedelta(hours=15)
+_TIMEOUT_DUE = _TIMEOUT + timedelta(seconds=1)
 
 
-@dataclass
+@dataclass(slots=True)
 class CardState:
     inside: bool
     last_ts: object
     emp: str
+    last_seen: object = None
+    done_day: object = None
 
 
-@dataclass
+@dataclass(slots=True)
 class State:
-    uid_state: dict
-    uid_last_seen: dict
-    uid_done_day: dict
+    cards: dict
+    deadlines: list
 
     @staticmethod
     def empty():
-        return State(uid_state={}, uid_last_seen={}, uid_done_day={})
+        return State(cards={}, deadlines=[])
 
     @staticmethod
-    def from_current_month(repo_root: Path):
+    def restore(repo_root: Path, now=None):
         st = State.empty()
-        ym = month_key(now_jst())
-        for ev in iter_events_month(repo_root, ym):
+        if now is None:
+            now = now_jst()
+        for ev in iter_decoded_since(repo_root, restore_window(repo_root, now), now):
             _apply_event_for_restore(st, ev)
+        _schedule_all(st)
         return st
 
 
+def restore_since(now):
+    return min(start_of_day_jst(now), now - _TIMEOUT) - _DEBOUNCE
+
+
+def restore_window(repo_root: Path, now):
+    last = last_event_epoch(repo_root, now)
+    return restore_since(now if last is None else min(now, epoch_jst(last)))
+
+
 def apply_rules(st: State, ts, uid: str, emp: str) -> list[dict]:
-    if uid in st.uid_last_seen:
-        if ts - st.uid_last_seen[uid] < _DEBOUNCE:
+    cs = st.cards.get(uid)
+    if cs is not None and cs.last_seen is not None:
+        if ts - cs.last_seen < _DEBOUNCE:
             return []
-    st.uid_last_seen[uid] = ts
+    if cs is None:
+        cs = CardState(inside=False, last_ts=ts, emp=emp)
+        st.cards[uid] = cs
+    cs.last_seen = ts
 
     today = date_jst(ts)
-    if uid in st.uid_done_day and st.uid_done_day[uid] != today:
-        st.uid_done_day.pop(uid, None)
-    if uid in st.uid_done_day and st.uid_done_day[uid] == today:
+    if cs.done_day is not None and cs.done_day != today:
+        cs.done_day = None
+    if cs.done_day == today:
         return []
 
-    if uid not in st.uid_state:
-        st.uid_state[uid] = CardState(inside=False, last_ts=ts, emp=emp)
-    cs = st.uid_state[uid]
-
     if emp != "unknown":
         cs.emp = emp
 
     events = []
-    events.extend(_errors_for_uid(st, ts, uid))
-    cs = st.uid_state[uid]
+    events.extend(_errors_for_uid(cs, ts, uid))
 
     act = "IN" if not cs.inside else "OUT"
     emp_out = cs.emp if emp == "unknown" else emp
     events.append(_event(ts, uid, emp_out, act, None))
 
-    st.uid_state[uid] = CardState(inside=(act == "IN"), last_ts=ts, emp=emp_out)
+    cs.inside = act == "IN"
+    cs.last_ts = ts
+    cs.emp = emp_out
     if act == "OUT":
-        st.uid_done_day[uid] = today
+        cs.done_day = today
 
+    _schedule(st, uid, cs)
     return events
 
 
 def sweep_errors(st: State, ts) -> list[dict]:
     events = []
-    for uid, cs in list(st.uid_state.items()):
-        if not cs.inside:
+    dl = st.deadlines
+    now = ts.timestamp()
+    evicted = 0
+    today = None
+    while dl and dl[0][0] <= now:
+        _, uid = heapq.heappop(dl)
+        cs = st.cards.get(uid)
+        if cs is None:
             continue
-        if date_jst(cs.last_ts) != date_jst(ts):
-            events.append(_event(ts, uid, cs.emp, "ERROR", "day_rollover"))
-            st.uid_state[uid] = CardState(inside=False, last_ts=ts, emp=cs.emp)
+        if today is None:
+            today = date_jst(ts)
+        if cs.inside:
+            if date_jst(cs.last_ts) != today:
+                events.append(_event(ts, uid, cs.emp, "ERROR", "day_rollover"))
+            elif ts - cs.last_ts > _TIMEOUT:
+                events.append(_event(ts, uid, cs.emp, "ERROR", "timeout_15h"))
+            else:
+                continue
+            cs.inside = False
+            cs.last_ts = ts
+            _schedule(st, uid, cs)
             continue
-        if ts - cs.last_ts > _TIMEOUT:
-            events.append(_event(ts, uid, cs.emp, "ERROR", "timeout_15h"))
-            st.uid_state[uid] = CardState(inside=False, last_ts=ts, emp=cs.emp)
+        if _evict_at(cs) <= ts:
+            del st.cards[uid]
+            evicted += 1
+        else:
+            _schedule(st, uid, cs)
+    if evicted and evicted > len(st.cards):
+        st.cards = dict(st.cards)
     return events
 
 
-def _errors_for_uid(st: State, ts, uid: str) -> list[dict]:
-    cs = st.uid_state[uid]
+def next_deadline(st: State):
+    return st.deadlines[0][0] if st.deadlines else None
+
+
+def _schedule(st: State, uid: str, cs: CardState) -> None:
+    due = _sweep_at(cs) if cs.inside else _evict_at(cs)
+    heapq.heappush(st.deadlines, (due.timestamp(), uid))
+
+
+def _schedule_all(st: State) -> None:
+    st.deadlines = [((_sweep_at(cs) if cs.inside else _evict_at(cs)).timestamp(), uid) for uid, cs in st.cards.items()]
+    heapq.heapify(st.deadlines)
+
+
+def _sweep_at(cs: CardState):
+    return min(start_of_day_jst(cs.last_ts) + timedelta(days=1), cs.last_ts + _TIMEOUT_DUE)
+
+
+def _evict_at(cs: CardState):
+    due = cs.last_ts
+    if cs.last_seen is not None:
+        due = max(due, cs.last_seen + _DEBOUNCE)
+    if cs.done_day is not None:
+        due = max(due, midnight_jst(cs.done_day) + timedelta(days=1))
+    return due
+
+
+def _errors_for_uid(cs: CardState, ts, uid: str) -> list[dict]:
     if not cs.inside:
         return []
     if date_jst(cs.last_ts) != date_jst(ts):
-        st.uid_state[uid] = CardState(inside=False, last_ts=ts, emp=cs.emp)
+        cs.inside = False
+        cs.last_ts = ts
         return [_event(ts, uid, cs.emp, "ERROR", "day_rollover")]
     if ts - cs.last_ts > _TIMEOUT:
-        st.uid_state[uid] = CardState(inside=False, last_ts=ts, emp=cs.emp)
+        cs.inside = False
+        cs.last_ts = ts
         return [_event(ts, uid, cs.emp, "ERROR", "timeout_15h")]
     return []
 
@@ -106,36 +169,36 @@ def _event(ts, uid: str, emp: str, act: str, code) -> dict:
     return o
 
 
-def _apply_event_for_restore(st: State, ev: dict) -> None:
-    try:
-        ts = parse_iso(str(ev.get("ts", "")))
-    except Exception:
-        return
-    uid = str(ev.get("uid", ""))
+def _apply_event_for_restore(st: State, ev: EventRecord) -> None:
+    uid = ev.uid
     if not uid:
         return
-    emp = str(ev.get("emp", "unknown"))
-    act = str(ev.get("act", ""))
-
-    st.uid_last_seen[uid] = ts
+    ts = epoch_jst(ev.epoch)
+    emp = ev.emp
+    act = ev.act
 
-    if uid not in st.uid_state:
-        st.uid_state[uid] = CardState(inside=False, last_ts=ts, emp=emp)
+    cs = st.cards.get(uid)
+    if cs is None:
+        cs = CardState(inside=False, last_ts=ts, emp=emp)
+        st.cards[uid] = cs
+    cs.last_seen = ts
 
-    cs = st.uid_state[uid]
     if cs.emp == "unknown" and emp != "unknown":
         cs.emp = emp
 
-    d = date_jst(ts)
+    d = day_date(ev.day)
 
     if act == "IN":
-        st.uid_state[uid] = CardState(inside=True, last_ts=ts, emp=cs.emp)
-        if uid in st.uid_done_day and st.uid_done_day[uid] == d:
-            st.uid_done_day.pop(uid, None)
+        cs.inside = True
+        cs.last_ts = ts
+        if cs.done_day == d:
+            cs.done_day = None
     elif act == "OUT":
-        st.uid_state[uid] = CardState(inside=False, last_ts=ts, emp=cs.emp)
-        st.uid_done_day[uid] = d
+        cs.inside = False
+        cs.last_ts = ts
+        cs.done_day = d
     elif act == "ERROR":
-        st.uid_state[uid] = CardState(inside=False, last_ts=ts, emp=cs.emp)
-        if uid in st.uid_done_day and st.uid_done_day[uid] == d:
-            st.uid_done_day.pop(uid, None)
+        cs.inside = False
+        cs.last_ts = ts
+        if cs.done_day == d:
+            cs.done_day = None
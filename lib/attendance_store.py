@@ -1,7 +1,64 @@
+import hashlib
 import json
+import mmap
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
 from pathlib import Path
 
-from lib.time_jst import iso_jst
+from lib.month_archive import Segment, fsync_dir, segment_path, verify_segment, write_segment
+from lib.time_jst import date_jst, day_iso, iso_jst, parse_iso, parse_ts
+
+
+_LINE_LAYOUT = {
+    21: (["{"] + [":", ","] * 4 + [":", "}"], ["id", "ts", "uid", "emp", "act"]),
+    25: (["{"] + [":", ","] * 5 + [":", "}"], ["id", "ts", "uid", "emp", "act", "code"]),
+}
+
+
+@dataclass(slots=True)
+class EventRecord:
+    id: str
+    ts: str
+    epoch: int | float
+    day: int
+    uid: str
+    emp: str
+    act: str
+    code: str = ""
+
+
+def decode_event(o) -> EventRecord | None:
+    if not isinstance(o, dict):
+        return None
+    ts = o.get("ts")
+    if not isinstance(ts, str) or not ts:
+        return None
+    try:
+        epoch, day = parse_ts(ts)
+    except Exception:
+        return None
+    code = o.get("code")
+    return EventRecord(str(o.get("id", "")), ts, epoch, day, str(o.get("uid", "")), str(o.get("emp", "unknown")), str(o.get("act", "")), str(code) if code is not None else "")
+
+
+def decode_line(raw: bytes) -> EventRecord | None:
+    try:
+        s = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    if "\\" not in s:
+        p = s.strip().split('"')
+        layout = _LINE_LAYOUT.get(len(p))
+        if layout is not None and p[0::2] == layout[0] and p[1::4] == layout[1]:
+            try:
+                epoch, day = parse_ts(p[7])
+            except Exception:
+                return None
+            return EventRecord(p[3], p[7], epoch, day, p[11], p[15], p[19], p[23] if len(p) == 25 else "")
+    return decode_event(_loads_line(raw))
 
 
 def month_key(dt) -> str:
@@ -30,14 +87,372 @@ def append_jsonl(path: Path, obj: dict) -> None:
         f.write(line + "\n")
 
 
+class EventWriter:
+    MODES = ("none", "event", "interval")
+
+    def __init__(self, repo_root: Path, mode: str = "none", interval_ms: int = 200, interval_events: int = 32):
+        if mode not in self.MODES:
+            raise ValueError(f"bad_fsync_mode mode={mode}")
+        self.repo_root = repo_root
+        self.mode = mode
+        self.interval_sec = max(0.0, float(interval_ms) / 1000.0)
+        self.interval_events = max(1, int(interval_events))
+        self.repaired_bytes = 0
+        self._lock = threading.Lock()
+        self._cv = threading.Condition(self._lock)
+        self._ym = None
+        self._path = None
+        self._fd = None
+        self._size = 0
+        self._idx_fd = None
+        self._pending = 0
+        self._pending_since = 0.0
+        self._closed = False
+        self._flusher = None
+        self.on_append = None
+        if mode == "interval":
+            self._flusher = threading.Thread(target=self._flush_loop, name="event-writer-fsync", daemon=True)
+            self._flusher.start()
+
+    def append(self, ev: dict) -> str:
+        o = _jsonify(ev)
+        line = json.dumps(o, ensure_ascii=False, separators=(",", ":"))
+        data = (line + "\n").encode("utf-8")
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("event_writer_closed")
+            self._roll(ev["ts"])
+            off = self._size
+            _write_all(self._fd, data)
+            self._size += len(data)
+            if self._idx_fd is not None:
+                try:
+                    _write_all(self._idx_fd, _index_line(off, len(data), o))
+                except Exception:
+                    _close_fd(self._idx_fd)
+                    self._idx_fd = None
+            if self.on_append is not None:
+                try:
+                    self.on_append(self._ym, self._size, data)
+                except Exception:
+                    pass
+            if self.mode == "event":
+                os.fsync(self._fd)
+            elif self.mode == "interval":
+                if self._pending == 0:
+                    self._pending_since = time.monotonic()
+                    self._cv.notify()
+                self._pending += 1
+                if self._pending >= self.interval_events:
+                    self._cv.notify()
+        return line
+
+    def open_month(self, ts) -> int:
+        with self._lock:
+            before = self.repaired_bytes
+            self._roll(ts)
+            return self.repaired_bytes - before
+
+    def position(self) -> tuple[str, int] | None:
+        with self._lock:
+            if self._fd is None:
+                return None
+            return self._ym, self._size
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._close_locked()
+            self._cv.notify_all()
+        if self._flusher is not None:
+            self._flusher.join(timeout=1.0)
+
+    def _roll(self, ts) -> None:
+        ym = month_key(ts)
+        if self._fd is not None and ym == self._ym:
+            return
+        self._close_locked()
+        p = month_events_path(self.repo_root, ts)
+        self.repaired_bytes += repair_jsonl_tail(p)
+        self._fd = os.open(str(p), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._size = os.fstat(self._fd).st_size
+        self._ym = ym
+        self._path = p
+        try:
+            self._idx_fd = _open_event_index(p, self._size)
+        except Exception:
+            self._idx_fd = None
+
+    def _close_locked(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            self._sync_locked()
+        finally:
+            _close_fd(self._fd)
+            _close_fd(self._idx_fd)
+            self._fd = None
+            self._idx_fd = None
+            self._ym = None
+
+    def _sync_locked(self) -> None:
+        if self._fd is not None and (self._pending or self.mode == "event"):
+            os.fsync(self._fd)
+        self._pending = 0
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._closed:
+                    if not self._pending:
+                        self._cv.wait()
+                        continue
+                    wait = self._pending_since + self.interval_sec - time.monotonic()
+                    if wait <= 0 or self._pending >= self.interval_events:
+                        break
+                    self._cv.wait(wait)
+                if self._closed:
+                    return
+                fd = os.dup(self._fd)
+                self._pending = 0
+            try:
+                os.fsync(fd)
+            except Exception:
+                pass
+            finally:
+                os.close(fd)
+
+
+def repair_jsonl_tail(path: Path) -> int:
+    try:
+        with open(path, "r+b") as f:
+            size = f.seek(0, 2)
+            if size <= 0:
+                return 0
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return 0
+            pos = size
+            step = 4096
+            keep = 0
+            while pos > 0:
+                start = max(0, pos - step)
+                f.seek(start)
+                chunk = f.read(pos - start)
+                i = chunk.rfind(b"\n")
+                if i >= 0:
+                    keep = start + i + 1
+                    break
+                pos = start
+            f.truncate(keep)
+            f.flush()
+            os.fsync(f.fileno())
+            return size - keep
+    except FileNotFoundError:
+        return 0
+
+
+def event_index_path(log_path: Path) -> Path:
+    return log_path.with_suffix(".idx")
+
+
+def rebuild_event_index(repo_root: Path, ym: str) -> int:
+    p = _events_dir(repo_root) / f"{ym}.jsonl"
+    idx = event_index_path(p)
+    if not p.exists():
+        return 0
+    tmp = idx.with_name(f"{idx.name}.tmp.{os.getpid()}")
+    n = 0
+    with open(tmp, "wb") as out:
+        for off, ln, o in _scan_log(p, 0, p.stat().st_size):
+            out.write(_index_line(off, ln, o))
+            n += 1
+    os.replace(tmp, idx)
+    return n
+
+
 def iter_events_month(repo_root: Path, ym: str):
-    p = repo_root / "state" / "attendance" / "events" / f"{ym}.jsonl"
-    yield from _iter_jsonl(p)
+    for _end, raw in _month_lines(repo_root, ym):
+        o = _loads_line(raw)
+        if o is not None:
+            yield o
+
+
+def iter_decoded_month(repo_root: Path, ym: str):
+    for _end, ev in iter_decoded_month_from(repo_root, ym, 0):
+        yield ev
+
+
+def iter_decoded_month_from(repo_root: Path, ym: str, offset: int):
+    for end, raw in _month_lines(repo_root, ym, offset):
+        ev = decode_line(raw)
+        if ev is not None:
+            yield end, ev
+
+
+def iter_event_lines(repo_root: Path, ym: str, start: int, end: int | None = None):
+    for off, raw in _month_lines(repo_root, ym, start, end):
+        if raw.strip():
+            yield off, raw
+
+
+def months_between(ym_from: str, ym_to: str) -> list[str]:
+    out = []
+    y, m = int(ym_from[0:4]), int(ym_from[5:7])
+    while True:
+        ym = f"{y:04d}-{m:02d}"
+        out.append(ym)
+        if ym >= ym_to or len(out) > 1200:
+            return out
+        m += 1
+        if m > 12:
+            y += 1
+            m = 1
+
+
+def events_head_digest(repo_root: Path, ym: str, length: int) -> str:
+    n = max(0, min(4096, int(length)))
+    seg, p, skip = _event_parts(repo_root, ym)
+    if seg is None and p is None:
+        return ""
+    buf = b""
+    for _end, raw in _month_lines(repo_root, ym, 0, n + 65536):
+        buf += raw
+        if len(buf) >= n:
+            break
+    return hashlib.sha1(buf[:n]).hexdigest()
+
+
+def events_month_size(repo_root: Path, ym: str) -> int:
+    seg, p, skip = _event_parts(repo_root, ym)
+    size = seg.raw_len if seg is not None else 0
+    if p is not None:
+        try:
+            size += os.stat(p).st_size - skip
+        except FileNotFoundError:
+            pass
+    return size
+
+
+def event_id_before(repo_root: Path, ym: str, offset: int) -> str:
+    last = b""
+    for end, raw in _month_lines(repo_root, ym, max(0, int(offset) - 4096), int(offset)):
+        if end == offset:
+            last = raw
+    ev = decode_line(last) if last.strip() else None
+    return ev.id if ev is not None else ""
+
+
+def iter_decoded_since(repo_root: Path, since, now):
+    since_epoch = since.timestamp()
+    buf = []
+    for ym in _month_keys_back(month_key(now), month_key(since)):
+        done = False
+        for raw in _month_lines_reverse(repo_root, ym):
+            ev = decode_line(raw)
+            if ev is None:
+                continue
+            if ev.epoch < since_epoch:
+                done = True
+                break
+            buf.append(ev)
+        if done:
+            break
+    buf.reverse()
+    yield from buf
+
+
+def last_event_epoch(repo_root: Path, now) -> float | None:
+    until = now.timestamp()
+    try:
+        names = os.listdir(_events_dir(repo_root))
+    except FileNotFoundError:
+        return None
+    yms = [n[:7] for n in names if n.endswith((".jsonl", ".seg")) and len(n) in (13, 11) and n[4] == "-"]
+    if not yms:
+        return None
+    for ym in _month_keys_back(month_key(now), min(yms)):
+        for raw in _month_lines_reverse(repo_root, ym):
+            ev = decode_line(raw)
+            if ev is not None and ev.epoch <= until:
+                return ev.epoch
+    return None
 
 
 def iter_payroll_month(repo_root: Path, ym: str):
-    p = repo_root / "state" / "attendance" / "payroll" / f"{ym}.jsonl"
-    yield from _iter_jsonl(p)
+    p = _payroll_dir(repo_root) / f"{ym}.jsonl"
+    if p.exists():
+        yield from _iter_jsonl(p)
+        return
+    seg = _segment(segment_path(p))
+    if seg is not None:
+        for _end, raw in seg.iter_lines():
+            o = _loads_line(raw)
+            if o is not None:
+                yield o
+
+
+def query_payroll_month(repo_root: Path, ym: str, day: str | None = None, emp: str | None = None):
+    p = _payroll_dir(repo_root) / f"{ym}.jsonl"
+    seg = None if p.exists() else _segment(segment_path(p))
+    if seg is None:
+        rows = iter_payroll_month(repo_root, ym)
+    else:
+        needle = _emp_needle(emp)
+        rows = (_loads_line(raw) for raw in seg.query(day, emp) if needle is None or needle in raw)
+    for o in rows:
+        if o is None:
+            continue
+        if day is not None and str(o.get("date", "")) != day:
+            continue
+        if emp is not None and str(o.get("emp", "")) != emp:
+            continue
+        yield o
+
+
+def payroll_month_exists(repo_root: Path, ym: str) -> bool:
+    p = _payroll_dir(repo_root) / f"{ym}.jsonl"
+    return p.exists() or segment_path(p).exists()
+
+
+def archive_month(repo_root: Path, ym: str, codec: str = "gzip", block_bytes: int = 32768) -> dict:
+    out = {"month": ym}
+    seg, p, skip = _event_parts(repo_root, ym)
+    if p is not None:
+        st = os.stat(p)
+        with open(p, "rb") as f:
+            head = hashlib.sha1(f.read(_SRC_HEAD)).hexdigest()
+        rows = []
+        for _end, raw in _month_lines(repo_root, ym):
+            ev = decode_line(raw)
+            rows.append((raw, day_iso(ev.day), ev.emp) if ev is not None else (raw, "", ""))
+        meta = {"src_ino": st.st_ino, "src_len": st.st_size, "src_head": head}
+        out["events"] = _replace_with_segment(p, rows, codec, block_bytes, meta)
+        _unlink(event_index_path(p))
+    p = _payroll_dir(repo_root) / f"{ym}.jsonl"
+    if p.exists():
+        rows = []
+        with open(p, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                o = _loads_line(raw) or {}
+                rows.append((raw, str(o.get("date", "")), str(o.get("emp", ""))))
+        out["payroll"] = _replace_with_segment(p, rows, codec, block_bytes, None)
+    return out
+
+
+def archive_closed_months(repo_root: Path, now, grace_days: int = 7, codec: str = "gzip", block_bytes: int = 32768) -> list[dict]:
+    cutoff = month_key(now - timedelta(days=max(0, int(grace_days))))
+    months = set()
+    for d in (_events_dir(repo_root), _payroll_dir(repo_root)):
+        if not d.is_dir():
+            continue
+        for q in d.glob("*.jsonl"):
+            ym = q.stem
+            if len(ym) == 7 and ym[4] == "-" and ym < cutoff:
+                months.add(ym)
+    return [archive_month(repo_root, ym, codec, block_bytes) for ym in sorted(months)]
 
 
 def _iter_jsonl(path: Path):
@@ -56,6 +471,241 @@ def _iter_jsonl(path: Path):
                 yield o
 
 
+def _iter_lines_reverse(path: Path, lo: int = 0):
+    if not path.exists():
+        return
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        if size <= lo:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = size
+            while end > lo:
+                start = max(lo, mm.rfind(b"\n", lo, end - 1) + 1) if end - 1 > lo else lo
+                raw = mm[start:end]
+                end = start
+                if raw.strip():
+                    yield raw
+
+
+_SEGMENTS = {}
+_SRC_HEAD = 4096
+
+
+def _segment(path: Path) -> Segment | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+    hit = _SEGMENTS.get(path)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    seg = Segment(path)
+    _SEGMENTS[path] = (stamp, seg)
+    return seg
+
+
+def _event_parts(repo_root: Path, ym: str):
+    p = _events_dir(repo_root) / f"{ym}.jsonl"
+    seg = _segment(segment_path(p))
+    try:
+        st = os.stat(p)
+    except FileNotFoundError:
+        return seg, None, 0
+    skip = 0
+    if seg is not None and seg.meta.get("src_ino") == st.st_ino and st.st_size >= int(seg.meta.get("src_len", 0)):
+        with open(p, "rb") as f:
+            if hashlib.sha1(f.read(_SRC_HEAD)).hexdigest() == seg.meta.get("src_head"):
+                skip = int(seg.meta["src_len"])
+    return seg, p, skip
+
+
+def _month_lines(repo_root: Path, ym: str, start: int = 0, end: int | None = None):
+    seg, p, skip = _event_parts(repo_root, ym)
+    base = 0
+    if seg is not None:
+        yield from seg.iter_lines(start, end)
+        base = seg.raw_len
+    if p is not None:
+        shift = base - skip
+        for off, raw in _live_lines(p, max(skip, start - shift), None if end is None else end - shift):
+            yield off + shift, raw
+
+
+def _month_lines_reverse(repo_root: Path, ym: str):
+    seg, p, skip = _event_parts(repo_root, ym)
+    if p is not None:
+        yield from _iter_lines_reverse(p, skip)
+    if seg is not None:
+        for raw in seg.iter_lines_reverse():
+            if raw.strip():
+                yield raw
+
+
+def _live_lines(path: Path, start: int, end: int | None = None):
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        size = f.seek(0, 2)
+        stop = size if end is None else min(end, size)
+        if stop <= start:
+            return
+        f.seek(start)
+        off = start
+        for raw in f:
+            nxt = off + len(raw)
+            if nxt > stop or not raw.endswith(b"\n"):
+                return
+            off = nxt
+            yield off, raw
+
+
+def _replace_with_segment(p: Path, rows: list, codec: str, block_bytes: int, meta: dict | None) -> dict:
+    seg_p = segment_path(p)
+    st = write_segment(seg_p, rows, codec, block_bytes, meta)
+    if not verify_segment(seg_p, st["sha1"]):
+        raise RuntimeError(f"archive_verify_failed path={seg_p}")
+    p.unlink()
+    fsync_dir(p.parent)
+    return {k: v for k, v in st.items() if k != "sha1"}
+
+
+def _unlink(p: Path) -> None:
+    try:
+        p.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _month_keys_back(ym_from: str, ym_to: str) -> list[str]:
+    out = []
+    y, m = int(ym_from[0:4]), int(ym_from[5:7])
+    while True:
+        ym = f"{y:04d}-{m:02d}"
+        out.append(ym)
+        if ym <= ym_to or len(out) > 1200:
+            return out
+        m -= 1
+        if m <= 0:
+            y -= 1
+            m = 12
+
+
+def _events_dir(repo_root: Path) -> Path:
+    return repo_root / "state" / "attendance" / "events"
+
+
+def _payroll_dir(repo_root: Path) -> Path:
+    return repo_root / "state" / "attendance" / "payroll"
+
+
+def _open_event_index(log_path: Path, log_size: int) -> int:
+    idx = event_index_path(log_path)
+    repair_jsonl_tail(idx)
+    end = 0
+    if idx.exists():
+        with open(idx, "rb") as f:
+            size = f.seek(0, 2)
+            f.seek(max(0, size - 4096))
+            for raw in reversed(f.read().splitlines()):
+                e = _parse_index_line(raw.decode("utf-8", "replace"))
+                if e is not None:
+                    end = e[0] + e[1]
+                    break
+    if end > log_size:
+        idx.unlink()
+        end = 0
+    fd = os.open(str(idx), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    if end < log_size:
+        for off, ln, o in _scan_log(log_path, end, log_size):
+            _write_all(fd, _index_line(off, ln, o))
+    return fd
+
+
+def _scan_log(path: Path, start: int, end: int):
+    if end <= start:
+        return
+    with open(path, "rb") as f:
+        f.seek(start)
+        off = start
+        while off < end:
+            raw = f.readline()
+            if not raw or not raw.endswith(b"\n"):
+                return
+            ln = len(raw)
+            o = _loads_line(raw)
+            if o is not None:
+                yield off, ln, o
+            off += ln
+
+
+def _loads_line(raw: bytes):
+    try:
+        s = raw.decode("utf-8").strip()
+    except UnicodeDecodeError:
+        return None
+    if not s:
+        return None
+    try:
+        o = json.loads(s)
+    except Exception:
+        return None
+    return o if isinstance(o, dict) else None
+
+
+def _emp_needle(emp: str | None) -> bytes | None:
+    if emp is None or not emp.isascii():
+        return None
+    s = json.dumps(emp)
+    return s.encode("utf-8") if s[1:-1] == emp else None
+
+
+def _event_day(o: dict) -> str:
+    ts_s = o.get("ts")
+    if not isinstance(ts_s, str) or len(ts_s) < 10:
+        return ""
+    if ts_s.endswith("+09:00"):
+        return ts_s[:10]
+    try:
+        return str(date_jst(parse_iso(ts_s)))
+    except Exception:
+        return ""
+
+
+def _index_line(off: int, ln: int, o: dict) -> bytes:
+    emp = str(o.get("emp", "")).replace("\t", " ").replace("\n", " ")
+    return f"{off}\t{ln}\t{_event_day(o)}\t{emp}\n".encode("utf-8")
+
+
+def _parse_index_line(line: str):
+    parts = line.rstrip("\n").split("\t")
+    if len(parts) != 4:
+        return None
+    try:
+        return int(parts[0]), int(parts[1]), parts[2], parts[3]
+    except Exception:
+        return None
+
+
+def _close_fd(fd) -> None:
+    if fd is None:
+        return
+    try:
+        os.close(fd)
+    except Exception:
+        pass
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+
+
 def _jsonify(ev: dict) -> dict:
     o = dict(ev)
     if "ts" in o and hasattr(o["ts"], "isoformat"):
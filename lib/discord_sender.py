@@ -0,0 +1,213 @@
+import json
+import queue
+import sys
+import threading
+import time
+
+from lib.http_pool import HttpPool, default_pool
+
+
+DISCORD_MAX_CHARS = 2000
+
+
+class DiscordSender:
+    def __init__(
+        self,
+        webhook_url: str,
+        pool: HttpPool | None = None,
+        max_queue: int = 1000,
+        max_chars: int = DISCORD_MAX_CHARS,
+        max_attempts: int = 5,
+        backoff_sec: float = 1.0,
+        backoff_max_sec: float = 60.0,
+        timeout_sec: float = 10.0,
+        on_done=None,
+        metrics=None,
+    ):
+        self.webhook_url = webhook_url
+        self.max_chars = int(max_chars)
+        self.max_attempts = int(max_attempts)
+        self.backoff_sec = float(backoff_sec)
+        self.backoff_max_sec = float(backoff_max_sec)
+        self.timeout_sec = float(timeout_sec)
+        self.on_done = on_done
+        self._pool = pool
+        self._q = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._carry = None
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "posts": 0, "lines": 0, "rate_limited": 0, "retries": 0, "dropped": 0, "failed_lines": 0, "cursor_held": 0}
+        self._h_post = None
+        self._h_deliver = None
+        if metrics is not None:
+            self._h_post = metrics.histogram("att_discord_post_seconds", "Discord webhook POST round trip")
+            self._h_deliver = metrics.histogram("att_discord_delivery_seconds", "submit() to successful POST per line")
+        self._th = threading.Thread(target=self._run, name="discord-sender", daemon=True)
+        self._th.start()
+
+    def submit(self, line: str, token=None) -> bool:
+        self._idle.clear()
+        while True:
+            try:
+                self._q.put_nowait((line, token, time.monotonic()))
+                self._bump("queued")
+                return True
+            except queue.Full:
+                try:
+                    self._q.get_nowait()
+                    self._bump("dropped")
+                except queue.Empty:
+                    pass
+
+    def flush(self, timeout_sec: float | None = None) -> bool:
+        deadline = None if timeout_sec is None else time.monotonic() + timeout_sec
+        while True:
+            if self._q.empty() and self._carry is None and self._idle.is_set():
+                return True
+            left = None if deadline is None else deadline - time.monotonic()
+            if left is not None and left <= 0:
+                return False
+            self._idle.wait(0.05 if left is None else min(0.05, left))
+
+    def close(self, timeout_sec: float = 10.0) -> None:
+        self.flush(timeout_sec)
+        self._stop.set()
+        self._th.join(timeout_sec)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+        out["pending"] = self._q.qsize()
+        return out
+
+    def _bump(self, k: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[k] += n
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._carry is None:
+                try:
+                    first = _item(self._q.get(timeout=0.5), self.max_chars)
+                except queue.Empty:
+                    if self._q.empty():
+                        self._idle.set()
+                    continue
+                self._idle.clear()
+            else:
+                first = self._carry
+                self._carry = None
+            batch = [first]
+            if self._deliver(batch):
+                self._done(batch)
+            if self._q.empty() and self._carry is None:
+                self._idle.set()
+
+    def _deliver(self, batch: list[tuple]) -> bool:
+        attempt = 0
+        delay = self.backoff_sec
+        while True:
+            wait = self._not_before - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._top_up(batch)
+            t0 = time.monotonic()
+            try:
+                resp = self._post("\n".join(item[0] for item in batch))
+            except Exception as e:
+                resp = None
+                err = str(e)
+            if self._h_post is not None:
+                self._h_post.observe(time.monotonic() - t0)
+            if resp is not None:
+                self._note_bucket(resp)
+                if resp.status < 300:
+                    self._bump("posts")
+                    self._bump("lines", len(batch))
+                    if self._h_deliver is not None:
+                        now = time.monotonic()
+                        for item in batch:
+                            self._h_deliver.observe(now - item[2])
+                    return True
+                if resp.status == 429:
+                    self._bump("rate_limited")
+                    self._not_before = max(self._not_before, time.monotonic() + _retry_after(resp))
+                    continue
+                err = f"HTTP {resp.status} {resp.reason} {resp.text()[:200]}".strip()
+                if resp.status < 500:
+                    self._fail(batch, err)
+                    return False
+            attempt += 1
+            if attempt >= self.max_attempts:
+                self._fail(batch, err)
+                return False
+            self._bump("retries")
+            self._not_before = max(self._not_before, time.monotonic() + min(delay, self.backoff_max_sec))
+            delay *= 2
+
+    def _top_up(self, batch: list[tuple]) -> None:
+        size = sum(len(item[0]) for item in batch) + len(batch) - 1
+        while True:
+            if self._carry is None:
+                try:
+                    self._carry = _item(self._q.get_nowait(), self.max_chars)
+                except queue.Empty:
+                    return
+            if size + 1 + len(self._carry[0]) > self.max_chars:
+                return
+            batch.append(self._carry)
+            size += 1 + len(self._carry[0])
+            self._carry = None
+
+    def _done(self, batch: list[tuple]) -> None:
+        if self.on_done is None or self._stats["cursor_held"]:
+            return
+        token = batch[-1][1]
+        if token is None:
+            return
+        try:
+            self.on_done(token)
+        except Exception as e:
+            print(f"discord_on_done_failed {e}", file=sys.stderr, flush=True)
+
+    def _post(self, content: str):
+        body = json.dumps({"content": content}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        p = self._pool if self._pool is not None else default_pool()
+        return p.fetch("POST", self.webhook_url, body=body, headers={"Content-Type": "application/json"}, timeout_sec=self.timeout_sec)
+
+    def _note_bucket(self, resp) -> None:
+        if resp.header("x-ratelimit-remaining") != "0":
+            return
+        try:
+            after = float(resp.header("x-ratelimit-reset-after") or 0)
+        except ValueError:
+            return
+        if after > 0:
+            self._not_before = max(self._not_before, time.monotonic() + after)
+
+    def _fail(self, batch: list[tuple], err: str) -> None:
+        self._bump("failed_lines", len(batch))
+        with self._lock:
+            self._stats["cursor_held"] = 1
+        print(f"discord_post_failed lines={len(batch)} cursor_held=1 {err}", file=sys.stderr, flush=True)
+
+
+def _retry_after(resp) -> float:
+    for v in (resp.header("retry-after"), resp.header("x-ratelimit-reset-after")):
+        try:
+            if v:
+                return max(0.0, float(v))
+        except ValueError:
+            pass
+    try:
+        return max(0.0, float(json.loads(resp.body or b"{}").get("retry_after", 1.0)))
+    except Exception:
+        return 1.0
+
+
+def _item(item: tuple, limit: int) -> tuple:
+    line, token, t = item
+    return (line if len(line) <= limit else line[: limit - 1] + "…"), token, t
@@ -1,3 +1,7 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
 
 
@@ -37,3 +41,106 @@ def employee_env_path(repo_root: Path, emp: str) -> Path:
 
 def load_employee_env(repo_root: Path, emp: str) -> dict:
     return load_env_file(employee_env_path(repo_root, emp))
+
+
+@dataclass(slots=True, frozen=True)
+class Employee:
+    name: str
+    hourly_yen: int
+    round_unit: int
+
+
+_MISSING = Employee("", 0, 5)
+
+
+class EmployeeRegistry:
+    def __init__(self, repo_root: Path, check_interval_sec: float = 1.0):
+        self.dir = Path(repo_root) / "config" / "employees"
+        self.check_interval_sec = float(check_interval_sec)
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._emps = {}
+        self._stamps = {}
+        self._dir_stamp = None
+        self._checked = None
+
+    def get(self, emp: str) -> Employee:
+        self._maybe_refresh()
+        return self._emps.get(emp, _MISSING)
+
+    def name(self, emp: str) -> str:
+        return self.get(emp).name
+
+    def rates(self, emp: str) -> tuple[int, int]:
+        e = self.get(emp)
+        return e.hourly_yen, e.round_unit
+
+    def refresh(self) -> bool:
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                dir_stamp = self.dir.stat().st_mtime_ns
+            except FileNotFoundError:
+                changed = bool(self._emps)
+                self._emps, self._stamps, self._dir_stamp = {}, {}, None
+                return changed
+            if dir_stamp != self._dir_stamp:
+                try:
+                    names = [p.name for p in os.scandir(self.dir) if p.name.endswith(".env") and p.is_file()]
+                except FileNotFoundError:
+                    names = []
+                self._dir_stamp = dir_stamp
+            else:
+                names = list(self._stamps)
+            emps = {}
+            stamps = {}
+            changed = False
+            for fn in names:
+                try:
+                    st = os.stat(self.dir / fn)
+                except FileNotFoundError:
+                    continue
+                stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+                emp = fn[:-4]
+                if self._stamps.get(fn) == stamp:
+                    emps[emp] = self._emps[emp]
+                else:
+                    emps[emp] = _compile_employee(load_env_file(self.dir / fn))
+                    self.loads += 1
+                    changed = True
+                stamps[fn] = stamp
+            if len(stamps) != len(self._stamps):
+                changed = True
+            self._emps = emps
+            self._stamps = stamps
+            return changed
+
+    def _maybe_refresh(self) -> None:
+        c = self._checked
+        if c is None or time.monotonic() - c >= self.check_interval_sec:
+            self.refresh()
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def employee_registry(repo_root: Path) -> EmployeeRegistry:
+    reg = _registries.get(repo_root)
+    if reg is not None:
+        return reg
+    key = Path(repo_root).resolve()
+    with _registries_lock:
+        reg = _registries.get(key)
+        if reg is None:
+            reg = EmployeeRegistry(key)
+            _registries[key] = reg
+        _registries[repo_root] = reg
+        return reg
+
+
+def _compile_employee(d: dict) -> Employee:
+    unit = env_int(d, "ROUND_UNIT_MINUTES", 5)
+    if unit <= 0:
+        unit = 5
+    return Employee(str(d.get("NAME", "")).strip(), env_int(d, "HOURLY_YEN", 0), unit)
@@ -0,0 +1,250 @@
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+from pathlib import Path
+
+from lib.attendance_store import iter_event_lines, months_between
+
+
+_HANDSHAKE_MAX = 4096
+
+
+class EventBus:
+    def __init__(self, repo_root: Path, sock_path: Path, max_pending: int = 1024, send_timeout_sec: float = 5.0):
+        self.repo_root = repo_root
+        self.sock_path = Path(sock_path)
+        self.max_pending = max(1, int(max_pending))
+        self.send_timeout_sec = float(send_timeout_sec)
+        self._lock = threading.Lock()
+        self._subs = set()
+        self._pos = None
+        self._srv = None
+        self._closed = False
+        self._stats = {"published": 0, "subscribers": 0, "overflows": 0}
+
+    def start(self, pos: tuple[str, int] | None):
+        self._pos = pos
+        self.sock_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.sock_path.unlink()
+        except FileNotFoundError:
+            pass
+        srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        srv.bind(str(self.sock_path))
+        srv.listen(16)
+        self._srv = srv
+        threading.Thread(target=self._accept_loop, name="event-bus-accept", daemon=True).start()
+        return self
+
+    def publish(self, ym: str, end_offset: int, data: bytes) -> None:
+        frame = _frame(ym, end_offset, data)
+        with self._lock:
+            self._pos = (ym, end_offset)
+            self._stats["published"] += 1
+            subs = list(self._subs)
+        for sub in subs:
+            if not sub.offer(frame):
+                self._drop(sub, "overflow")
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            subs = list(self._subs)
+            self._subs.clear()
+        for sub in subs:
+            sub.close()
+        if self._srv is not None:
+            try:
+                self._srv.close()
+            except OSError:
+                pass
+            try:
+                self.sock_path.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["connected"] = len(self._subs)
+        return out
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                conn, _ = self._srv.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="event-bus-sub", daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        sub = _Subscriber(conn, self.max_pending)
+        try:
+            conn.settimeout(self.send_timeout_sec)
+            req = _read_handshake(conn)
+            with self._lock:
+                if self._closed:
+                    return
+                reg = self._pos
+                self._subs.add(sub)
+                self._stats["subscribers"] += 1
+            start = _start_pos(req, reg)
+            if start is not None and reg is not None:
+                for ym in months_between(start[0], reg[0]):
+                    first = start[1] if ym == start[0] else 0
+                    last = reg[1] if ym == reg[0] else None
+                    for end, raw in iter_event_lines(self.repo_root, ym, first, last):
+                        conn.sendall(_frame(ym, end, raw))
+            live = reg if reg is not None else ("", 0)
+            conn.sendall(json.dumps({"live": True, "month": live[0], "offset": live[1]}, separators=(",", ":")).encode("utf-8") + b"\n")
+            sub.pump()
+        except (OSError, ValueError) as e:
+            if not sub.closed:
+                print(f"event_bus_subscriber_closed {e}", file=sys.stderr, flush=True)
+        finally:
+            self._drop(sub, None)
+
+    def _drop(self, sub, reason: str | None) -> None:
+        with self._lock:
+            if sub not in self._subs:
+                sub.close()
+                return
+            self._subs.discard(sub)
+            if reason == "overflow":
+                self._stats["overflows"] += 1
+        sub.close(reason)
+
+
+class _Subscriber:
+    def __init__(self, conn: socket.socket, max_pending: int):
+        self.conn = conn
+        self.closed = False
+        self._q = queue.Queue(maxsize=max_pending)
+
+    def offer(self, frame: bytes) -> bool:
+        if self.closed:
+            return True
+        try:
+            self._q.put_nowait(frame)
+            return True
+        except queue.Full:
+            return False
+
+    def pump(self) -> None:
+        while True:
+            frame = self._q.get()
+            if frame is None or self.closed:
+                return
+            self.conn.sendall(frame)
+
+    def close(self, reason: str | None = None) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if reason:
+            try:
+                self.conn.setblocking(False)
+                self.conn.send(json.dumps({"error": reason}).encode("utf-8") + b"\n")
+            except OSError:
+                pass
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        try:
+            self._q.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class EventSubscriber:
+    def __init__(self, sock_path: Path, month: str | None = None, offset: int | None = None, timeout_sec: float = 1.0):
+        self.month = month
+        self.offset = offset
+        self.live = False
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(str(sock_path))
+        except OSError:
+            self._sock.close()
+            raise
+        req = {} if month is None else {"month": month, "offset": int(offset or 0)}
+        self._sock.sendall(json.dumps(req, separators=(",", ":")).encode("utf-8") + b"\n")
+        self._sock.settimeout(timeout_sec)
+        self._buf = b""
+
+    def events(self, stop=None):
+        while stop is None or not stop.is_set():
+            nl = self._buf.find(b"\n")
+            if nl < 0:
+                try:
+                    chunk = self._sock.recv(65536)
+                except socket.timeout:
+                    yield None
+                    continue
+                if not chunk:
+                    raise ConnectionError("event_bus_closed")
+                self._buf += chunk
+                continue
+            line = self._buf[:nl]
+            self._buf = self._buf[nl + 1 :]
+            o = json.loads(line)
+            if "error" in o:
+                raise ConnectionError(f"event_bus_{o['error']}")
+            if o.get("live"):
+                self.live = True
+                if o.get("month"):
+                    self.month, self.offset = str(o["month"]), int(o["offset"])
+                continue
+            self.month, self.offset = str(o["month"]), int(o["offset"])
+            yield self.month, self.offset, o["event"]
+
+    def close(self) -> None:
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+
+def event_bus_path(repo_root: Path) -> Path | None:
+    v = str(os.environ.get("ATT_EVENT_BUS_SOCK", "")).strip()
+    if v.lower() in ("off", "0", "none"):
+        return None
+    return Path(v) if v else repo_root / "state" / "attendance" / "events.sock"
+
+
+def _frame(ym: str, end_offset: int, raw: bytes) -> bytes:
+    return b'{"month":"%s","offset":%d,"event":%s}\n' % (ym.encode("ascii"), end_offset, raw.rstrip(b"\r\n"))
+
+
+def _read_handshake(conn: socket.socket) -> dict:
+    buf = b""
+    while b"\n" not in buf:
+        chunk = conn.recv(256)
+        if not chunk:
+            raise ValueError("handshake_eof")
+        buf += chunk
+        if len(buf) > _HANDSHAKE_MAX:
+            raise ValueError("handshake_too_long")
+    o = json.loads(buf.split(b"\n", 1)[0] or b"{}")
+    return o if isinstance(o, dict) else {}
+
+
+def _start_pos(req: dict, reg):
+    ym = str(req.get("month", "") or "")
+    if not ym or reg is None:
+        return None
+    try:
+        offset = max(0, int(req.get("offset", 0)))
+    except Exception:
+        return None
+    if ym > reg[0] or (ym == reg[0] and offset >= reg[1]):
+        return None
+    return ym, offset
@@ -0,0 +1,107 @@
+import collections
+import heapq
+from pathlib import Path
+
+from lib.attendance_store import iter_decoded_month_from
+from lib.payroll_calc import OutOfOrder
+
+
+def site_roots(paths: list) -> list[tuple[str, Path]]:
+    out = []
+    seen = set()
+    for p in paths:
+        p = Path(p)
+        if (p / "state" / "attendance" / "events").is_dir():
+            cands = [p]
+        elif p.is_dir():
+            cands = sorted(q for q in p.iterdir() if (q / "state" / "attendance" / "events").is_dir())
+        else:
+            raise ValueError(f"bad_site_path path={p}")
+        for q in cands:
+            key = q.resolve()
+            if key in seen:
+                continue
+            seen.add(key)
+            out.append((q.name, q))
+    return out
+
+
+class SiteMerge:
+    def __init__(self, sources: list, slack_sec: float = 300.0, dedupe_sec: float = 300.0):
+        self.sources = list(sources)
+        self.slack_sec = max(0.0, float(slack_sec))
+        self.dedupe_sec = max(0.0, float(dedupe_sec))
+        self.stats = {"sites": len(self.sources), "read": 0, "emitted": 0, "duplicates": 0, "peak_buffered": 0, "peak_ids": 0}
+
+    @staticmethod
+    def month(sites: list, ym: str, slack_sec: float = 300.0, dedupe_sec: float = 300.0):
+        return SiteMerge([(name, (ev for _off, ev in iter_decoded_month_from(root, ym, 0))) for name, root in sites], slack_sec, dedupe_sec)
+
+    def __iter__(self):
+        st = self.stats
+        slack = self.slack_sec
+        window = self.dedupe_sec
+        heads = []
+        for i, (_name, it) in enumerate(self.sources):
+            it = iter(it)
+            for ev in it:
+                heads.append((ev.epoch, i, ev, it))
+                break
+        heapq.heapify(heads)
+        pending = []
+        seen = {}
+        order = collections.deque()
+        push = heapq.heappush
+        pop = heapq.heappop
+        seq = 0
+        newest = float("-inf")
+        last = float("-inf")
+        read = emitted = dups = peak_buf = peak_ids = 0
+        try:
+            while True:
+                if heads:
+                    epoch, i, ev, it = heads[0]
+                    nxt = next(it, None)
+                    if nxt is None:
+                        pop(heads)
+                    else:
+                        heapq.heapreplace(heads, (nxt.epoch, i, nxt, it))
+                    read += 1
+                    if epoch > newest:
+                        newest = epoch
+                    push(pending, (epoch, seq, i, ev))
+                    seq += 1
+                    if len(pending) > peak_buf:
+                        peak_buf = len(pending)
+                    limit = newest - slack
+                elif pending:
+                    limit = float("inf")
+                else:
+                    break
+                while pending and pending[0][0] <= limit:
+                    epoch, _s, i, ev = pop(pending)
+                    if epoch < last:
+                        raise OutOfOrder(f"merge_out_of_order site={self.sources[i][0]} id={ev.id} ts={ev.ts} behind_sec={last - epoch:.3f} slack_sec={slack} knob=ATT_MERGE_SLACK_SEC")
+                    last = epoch
+                    eid = ev.id
+                    if eid:
+                        cut = epoch - window
+                        while order and order[0][0] < cut:
+                            t, old = order.popleft()
+                            if seen.get(old) == t:
+                                del seen[old]
+                        if eid in seen:
+                            dups += 1
+                            continue
+                        seen[eid] = epoch
+                        order.append((epoch, eid))
+                        if len(seen) > peak_ids:
+                            peak_ids = len(seen)
+                    emitted += 1
+                    yield ev
+        finally:
+            st["read"] += read
+            st["emitted"] += emitted
+            st["duplicates"] += dups
+            st["peak_buffered"] = max(st["peak_buffered"], peak_buf)
+            st["peak_ids"] = max(st["peak_ids"], peak_ids)
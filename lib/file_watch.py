@@ -0,0 +1,155 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")
+
+
+class InotifyUnavailable(RuntimeError):
+    pass
+
+
+class Inotify:
+    def __init__(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+            init1 = libc.inotify_init1
+            add = libc.inotify_add_watch
+        except (OSError, AttributeError) as e:
+            raise InotifyUnavailable(f"inotify_unavailable err={e}")
+        init1.argtypes = [ctypes.c_int]
+        init1.restype = ctypes.c_int
+        add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        add.restype = ctypes.c_int
+        self._add = add
+        fd = init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            e = ctypes.get_errno()
+            raise InotifyUnavailable(f"inotify_init1_failed errno={e} {os.strerror(e)}")
+        self.fd = fd
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        wd = self._add(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, f"inotify_add_watch_failed path={path} {os.strerror(e)}")
+        return wd
+
+    def read(self) -> list[tuple[int, int, str]]:
+        out = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return out
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            if not buf:
+                return out
+            i = 0
+            n = len(buf)
+            while i + _EVENT.size <= n:
+                wd, mask, _cookie, ln = _EVENT.unpack_from(buf, i)
+                i += _EVENT.size
+                name = buf[i : i + ln].split(b"\x00", 1)[0].decode("utf-8", "replace")
+                i += ln
+                out.append((wd, mask, name))
+
+    def close(self) -> None:
+        fd = self.fd
+        self.fd = -1
+        if fd >= 0:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class InotifyWatcher:
+    kind = "inotify"
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.wakeups = 0
+        self._ino = Inotify()
+        self._poll = select.poll()
+        self._poll.register(self._ino.fileno(), select.POLLIN)
+        self._watch()
+
+    def wait(self, timeout_sec: float, name: str) -> bool:
+        deadline = time.monotonic() + max(0.0, timeout_sec)
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            ready = self._poll.poll(int(left * 1000) + 1)
+            self.wakeups += 1
+            if not ready:
+                return False
+            hit = False
+            for _wd, mask, ev_name in self._ino.read():
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                        self._watch()
+                    hit = True
+                elif ev_name == name or (mask & (IN_CREATE | IN_MOVED_TO) and ev_name.endswith(".jsonl")):
+                    hit = True
+            if hit:
+                return True
+
+    def close(self) -> None:
+        self._ino.close()
+
+    def _watch(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._ino.add_watch(self.directory, IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF)
+
+
+class PollWatcher:
+    kind = "poll"
+
+    def __init__(self, directory: Path, interval_sec: float = 0.2):
+        self.directory = Path(directory)
+        self.interval_sec = float(interval_sec)
+        self.wakeups = 0
+
+    def wait(self, timeout_sec: float, name: str) -> bool:
+        time.sleep(max(0.0, min(self.interval_sec, timeout_sec)))
+        self.wakeups += 1
+        return True
+
+    def close(self) -> None:
+        return
+
+
+def open_watcher(directory: Path, mode: str = "auto", interval_sec: float = 0.2):
+    if mode != "poll":
+        try:
+            return InotifyWatcher(directory)
+        except (InotifyUnavailable, OSError):
+            if mode == "inotify":
+                raise
+    return PollWatcher(directory, interval_sec)
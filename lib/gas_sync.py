@@ -1,94 +1,265 @@
+import base64
+import gzip
+import hashlib
 import json
+import os
+import random
 import time
-import urllib.request
-import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
+from lib.http_pool import HttpPool, default_pool
+from lib.metrics import default_metrics
 
-class _NoRedirect(urllib.request.HTTPRedirectHandler):
-    def redirect_request(self, req, fp, code, msg, headers, newurl):
-        return None
 
+def _request_json(url: str, method: str, body_bytes: bytes | None, headers: dict, timeout_sec: int, pool: HttpPool | None = None) -> tuple[dict, str]:
+    p = pool if pool is not None else default_pool()
+    try:
+        resp = p.fetch(method, url, body=body_bytes, headers=headers, timeout_sec=timeout_sec)
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"http_failed url={url} err={e}")
+    text = resp.text()
+    if resp.status in (301, 302, 303, 307, 308):
+        raise RuntimeError(f"too_many_redirects url={url} last_body={text[:400]}")
+    if resp.status >= 400:
+        raise RuntimeError(f"http_error code={resp.status} url={resp.url} body={text[:400]}")
+    try:
+        obj = json.loads(text) if text else {}
+    except Exception:
+        obj = {}
+    return obj, resp.url
 
-def _request_json(url: str, method: str, body_bytes: bytes | None, headers: dict, timeout_sec: int) -> tuple[dict, str]:
-    opener = urllib.request.build_opener(_NoRedirect())
-    cur_url = url
-    cur_method = method
-    cur_body = body_bytes
-    last_text = ""
 
-    for _ in range(10):
-        req = urllib.request.Request(cur_url, data=(cur_body if cur_method != "GET" else None), method=cur_method)
-        for k, v in headers.items():
-            req.add_header(k, v)
-
-        try:
-            with opener.open(req, timeout=timeout_sec) as resp:
-                text = (resp.read() or b"").decode("utf-8", "replace").strip()
-                last_text = text
-                try:
-                    obj = json.loads(text) if text else {}
-                except Exception:
-                    obj = {}
-                return obj, resp.geturl()
-        except urllib.error.HTTPError as e:
-            code = int(getattr(e, "code", 0) or 0)
-            loc = ""
-            try:
-                loc = str(e.headers.get("Location", "") or "")
-            except Exception:
-                loc = ""
-            text = ""
-            try:
-                text = (e.read() or b"").decode("utf-8", "replace").strip()
-            except Exception:
-                text = ""
-            last_text = text
-
-            if code in (301, 302, 303, 307, 308) and loc:
-                cur_url = loc
-                if code in (301, 302, 303):
-                    cur_method = "GET"
-                    cur_body = None
-                continue
-
-            raise RuntimeError(f"http_error code={code} url={cur_url} body={text[:400]}")
-
-    raise RuntimeError(f"too_many_redirects url={url} last_body={last_text[:400]}")
-
-
-def post_records(url: str, records: list[dict], token: str | None, timeout_sec: int) -> dict:
+def post_records(url: str, records: list[dict], token: str | None, timeout_sec: int, deletes: list[str] | None = None, gzip_body: bool = False, refresh: bool = True) -> dict:
     payload = {"records": records}
+    if deletes:
+        payload["deletes"] = list(deletes)
+    if not refresh:
+        payload["refresh"] = False
     body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if gzip_body:
+        z = base64.b64encode(gzip.compress(body, compresslevel=6)).decode("ascii")
+        body = json.dumps({"gzip": z}, separators=(",", ":")).encode("utf-8")
 
     headers = {"Content-Type": "application/json"}
     if token:
         headers["X-Auth-Token"] = token
 
-    obj, _final_url = _request_json(url, "POST", body, headers, timeout_sec)
+    m = default_metrics()
+    m.counter("att_gas_sent_bytes_total", "Request body bytes posted to GAS").inc(len(body))
+    m.counter("att_gas_sent_records_total", "Records posted to GAS").inc(len(records))
+    m.counter("att_gas_sent_deletes_total", "Record ids deleted on GAS").inc(len(deletes or []))
+    t0 = time.perf_counter()
+    try:
+        obj, _final_url = _request_json(url, "POST", body, headers, timeout_sec)
+    finally:
+        m.histogram("att_gas_post_seconds", "GAS POST round trip per chunk").observe(time.perf_counter() - t0)
     if isinstance(obj, dict) and obj.get("ok") is True:
         return obj
     raise RuntimeError(f"bad_response body={json.dumps(obj, ensure_ascii=False, separators=(',', ':'))}")
 
 
-def sync_payroll_month(repo_root, ym: str, gas_url: str, token: str | None, timeout_sec: int, retries: int, sleep_sec: float) -> dict:
-    from lib.attendance_store import iter_payroll_month
+class PartialUpload(RuntimeError):
+    def __init__(self, msg: str, ack: dict, done_records: list[str], done_deletes: list[str]):
+        super().__init__(msg)
+        self.ack = ack
+        self.done_records = done_records
+        self.done_deletes = done_deletes
+
+
+def post_records_chunked(
+    url: str,
+    records: list[dict],
+    token: str | None,
+    timeout_sec: int,
+    deletes: list[str] | None = None,
+    chunk_size: int = 500,
+    gzip_body: bool = False,
+    workers: int = 2,
+    retries: int = 3,
+    backoff_sec: float = 1.0,
+    backoff_max_sec: float = 60.0,
+) -> dict:
+    n = chunk_size if chunk_size > 0 else max(1, len(records))
+    chunks = [(records[i : i + n], []) for i in range(0, len(records), n)]
+    dels = list(deletes or [])
+    chunks.extend(([], dels[i : i + n]) for i in range(0, len(dels), n))
+    if not chunks:
+        chunks = [([], [])]
+
+    def send(chunk, refresh=False):
+        recs, ids = chunk
+        return _post_chunk_retry(url, recs, token, timeout_sec, ids, gzip_body, retries, backoff_sec, backoff_max_sec, refresh)
+
+    head, last = chunks[:-1], chunks[-1]
+    w = max(1, min(int(workers), len(head)))
+    results = []
+    if w == 1:
+        for c in head:
+            try:
+                results.append((c, send(c), None))
+            except Exception as e:
+                results.append((c, None, e))
+    else:
+        with ThreadPoolExecutor(max_workers=w, thread_name_prefix="gas-upload") as ex:
+            futs = [(c, ex.submit(send, c)) for c in head]
+            for c, fut in futs:
+                try:
+                    results.append((c, fut.result(), None))
+                except Exception as e:
+                    results.append((c, None, e))
+    try:
+        results.append((last, send(last, True), None))
+    except Exception as e:
+        results.append((last, None, e))
+
+    ack = {"ok": True, "inserted": 0, "updated": 0, "skipped": 0, "deleted": 0, "chunks": len(chunks), "attempts": 0}
+    done_records = []
+    done_deletes = []
+    errors = []
+    for (recs, ids), a, err in results:
+        if err is not None:
+            errors.append(str(err))
+            continue
+        for k in ("inserted", "updated", "skipped", "deleted"):
+            try:
+                ack[k] += int(a.get(k, 0) or 0)
+            except Exception:
+                pass
+        ack["attempts"] += int(a.get("_attempts", 1))
+        done_records.extend(str(r.get("id", "")).strip() for r in recs)
+        done_deletes.extend(ids)
+    if errors:
+        ack["ok"] = False
+        ack["failed_chunks"] = len(errors)
+        raise PartialUpload(f"chunks_failed n={len(errors)}/{len(chunks)} first={errors[0][:400]}", ack, done_records, done_deletes)
+    return ack
 
-    records = []
-    for rec in iter_payroll_month(repo_root, ym):
-        if isinstance(rec, dict):
-            records.append(rec)
 
-    last_err = None
+def _post_chunk_retry(url, records, token, timeout_sec, deletes, gzip_body, retries, backoff_sec, backoff_max_sec, refresh=True) -> dict:
     n = retries if retries > 0 else 1
+    delay = max(0.0, float(backoff_sec))
     for i in range(n):
         try:
-            ack = post_records(gas_url, records, token, timeout_sec)
-            ack_out = dict(ack)
-            ack_out["sent_records"] = len(records)
-            return ack_out
-        except Exception as e:
-            last_err = e
-            if i + 1 < n:
-                time.sleep(sleep_sec)
-
-    raise last_err if last_err else RuntimeError("sync_failed")
+            a = dict(post_records(url, records, token, timeout_sec, deletes=deletes, gzip_body=gzip_body, refresh=refresh))
+            a["_attempts"] = i + 1
+            return a
+        except Exception:
+            if i + 1 >= n:
+                default_metrics().counter("att_gas_failed_chunks_total", "GAS chunks that failed every attempt").inc()
+                raise
+            default_metrics().counter("att_gas_retries_total", "GAS chunk retries").inc()
+            time.sleep(min(delay, backoff_max_sec) * random.uniform(0.5, 1.0))
+            delay *= 2
+    raise RuntimeError("sync_failed")
+
+
+def sync_records_delta(
+    repo_root,
+    ym: str,
+    records: list[dict],
+    gas_url: str,
+    token: str | None,
+    timeout_sec: int,
+    retries: int,
+    sleep_sec: float,
+    full: bool = False,
+    chunk_size: int = 500,
+    gzip_body: bool = False,
+    workers: int = 2,
+    backoff_max_sec: float = 60.0,
+) -> dict:
+    path = sync_manifest_path(repo_root, ym)
+    acked = load_sync_manifest(path, gas_url)
+
+    current = {}
+    changed = []
+    for rec in records:
+        rid = str(rec.get("id", "")).strip()
+        if not rid:
+            continue
+        h = record_digest(rec)
+        current[rid] = h
+        if full or acked.get(rid) != h:
+            changed.append(rec)
+    deletes = sorted(rid for rid in acked if rid not in current)
+
+    if not changed and not deletes:
+        return {"ok": True, "skipped": True, "sent_records": 0, "sent_deletes": 0, "unchanged_records": len(current)}
+
+    try:
+        ack = post_records_chunked(
+            gas_url,
+            changed,
+            token,
+            timeout_sec,
+            deletes=deletes,
+            chunk_size=chunk_size,
+            gzip_body=gzip_body,
+            workers=workers,
+            retries=retries,
+            backoff_sec=sleep_sec,
+            backoff_max_sec=backoff_max_sec,
+        )
+    except PartialUpload as e:
+        if e.done_records or e.done_deletes:
+            merged = dict(acked)
+            for rid in e.done_records:
+                merged[rid] = current[rid]
+            for rid in e.done_deletes:
+                merged.pop(rid, None)
+            save_sync_manifest(path, gas_url, merged)
+        raise
+
+    ack_out = dict(ack)
+    ack_out["sent_records"] = len(changed)
+    ack_out["sent_deletes"] = len(deletes)
+    ack_out["unchanged_records"] = len(current) - len(changed)
+    save_sync_manifest(path, gas_url, current)
+    return ack_out
+
+
+def record_digest(rec: dict) -> str:
+    s = json.dumps(rec, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+def sync_manifest_path(repo_root, ym: str) -> Path:
+    p = Path(repo_root) / "state" / "attendance" / "sync" / f"{ym}.json"
+    p.parent.mkdir(parents=True, exist_ok=True)
+    return p
+
+
+def load_sync_manifest(path: Path, gas_url: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            o = json.load(f)
+    except Exception:
+        return {}
+    if not isinstance(o, dict) or o.get("url") != _url_digest(gas_url):
+        return {}
+    acked = o.get("acked")
+    return {str(k): str(v) for k, v in acked.items()} if isinstance(acked, dict) else {}
+
+
+def save_sync_manifest(path: Path, gas_url: str, acked: dict) -> None:
+    body = json.dumps({"v": 1, "url": _url_digest(gas_url), "acked": acked}, ensure_ascii=False, separators=(",", ":"))
+    tmp = path.with_name(f"{path.name}.tmp.{os.getpid()}.{time.time_ns()}")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        try:
+            if tmp.exists():
+                tmp.unlink()
+        except Exception:
+            pass
+
+
+def _url_digest(url: str) -> str:
+    return hashlib.sha1(str(url).strip().encode("utf-8")).hexdigest()
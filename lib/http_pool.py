@@ -0,0 +1,244 @@
+import http.client
+import select
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+_CACHEABLE_REDIRECTS = (301, 307, 308)
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+
+class HttpResponse:
+    __slots__ = ("status", "reason", "headers", "body", "url")
+
+    def __init__(self, status: int, reason: str, headers: dict, body: bytes, url: str):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.url = url
+
+    def header(self, name: str, default: str = "") -> str:
+        return self.headers.get(name.lower(), default)
+
+    def text(self) -> str:
+        return (self.body or b"").decode("utf-8", "replace").strip()
+
+
+class HttpPool:
+    def __init__(self, idle_timeout_sec: float = 60.0, max_idle_per_host: int = 4, redirect_ttl_sec: float = 300.0, ssl_context=None, user_agent: str = "nfc-attendance/1.0"):
+        self.idle_timeout_sec = float(idle_timeout_sec)
+        self.max_idle_per_host = int(max_idle_per_host)
+        self.redirect_ttl_sec = float(redirect_ttl_sec)
+        self.user_agent = user_agent
+        self._ssl = ssl_context
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._redirects = {}
+        self._stats = {"requests": 0, "connects": 0, "reused": 0, "stale_retries": 0, "redirects": 0, "redirect_cache_hits": 0, "bytes_sent": 0, "bytes_received": 0}
+
+    def request(self, method: str, url: str, body: bytes | None = None, headers: dict | None = None, timeout_sec: float = 20.0) -> HttpResponse:
+        u = urllib.parse.urlsplit(url)
+        if u.scheme not in ("http", "https") or not u.hostname:
+            raise RuntimeError(f"http_bad_url url={url}")
+        key = (u.scheme, u.hostname, u.port)
+        path = u.path or "/"
+        if u.query:
+            path = f"{path}?{u.query}"
+        hdrs = {"Host": u.netloc, "User-Agent": self.user_agent, "Connection": "keep-alive"}
+        if body is not None:
+            hdrs["Content-Length"] = str(len(body))
+        for k, v in (headers or {}).items():
+            hdrs[k] = v
+
+        while True:
+            conn, reused = self._checkout(key, timeout_sec)
+            sent = False
+            try:
+                conn.request(method, path, body=body, headers=hdrs)
+                sent = True
+                resp = conn.getresponse()
+                data = resp.read()
+            except _STALE_ERRORS as e:
+                self._discard(conn)
+                if reused and (not sent or isinstance(e, http.client.RemoteDisconnected)):
+                    self._bump("stale_retries")
+                    continue
+                raise
+            except BaseException:
+                self._discard(conn)
+                raise
+            with self._lock:
+                self._stats["requests"] += 1
+                self._stats["bytes_sent"] += len(body or b"")
+                self._stats["bytes_received"] += len(data)
+            out = HttpResponse(resp.status, resp.reason, {k.lower(): v for k, v in resp.getheaders()}, data, url)
+            if resp.will_close:
+                self._discard(conn)
+            else:
+                self._checkin(key, conn)
+            return out
+
+    def fetch(self, method: str, url: str, body: bytes | None = None, headers: dict | None = None, timeout_sec: float = 20.0, max_redirects: int = 10) -> HttpResponse:
+        cur_url = url
+        cur_method = method
+        cur_body = body
+        use_cache = True
+        cached = False
+        for _ in range(max_redirects + 2):
+            hit = self._redirect_lookup(cur_method, cur_url) if use_cache else None
+            if hit is not None:
+                code, loc = hit
+                self._bump("redirect_cache_hits")
+                cached = True
+                cur_url = loc
+                if code in (301, 302, 303):
+                    cur_method = "GET"
+                    cur_body = None
+                continue
+            try:
+                resp = self.request(cur_method, cur_url, body=(cur_body if cur_method != "GET" else None), headers=headers, timeout_sec=timeout_sec)
+            except Exception:
+                if cached:
+                    self.forget_redirects()
+                raise
+            if cached and resp.status in (404, 410):
+                self.forget_redirects()
+                cur_url, cur_method, cur_body = url, method, body
+                use_cache = cached = False
+                continue
+            loc = resp.header("location")
+            if resp.status not in _REDIRECTS or not loc:
+                return resp
+            self._bump("redirects")
+            loc = urllib.parse.urljoin(cur_url, loc)
+            if resp.status in _CACHEABLE_REDIRECTS:
+                self._redirect_store(cur_method, cur_url, resp.status, loc)
+            cur_url = loc
+            if resp.status in (301, 302, 303):
+                cur_method = "GET"
+                cur_body = None
+        raise RuntimeError(f"too_many_redirects url={url}")
+
+    def forget_redirects(self) -> None:
+        with self._lock:
+            self._redirects.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                _close_quietly(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["idle"] = sum(len(v) for v in self._idle.values())
+            out["redirect_cache"] = len(self._redirects)
+        return out
+
+    def _checkout(self, key: tuple, timeout_sec: float):
+        now = time.monotonic()
+        with self._lock:
+            conns = self._idle.get(key)
+            while conns:
+                conn, last = conns.pop()
+                if now - last > self.idle_timeout_sec or _is_dropped(conn):
+                    _close_quietly(conn)
+                    continue
+                self._stats["reused"] += 1
+                conn.timeout = timeout_sec
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout_sec)
+                return conn, True
+            self._stats["connects"] += 1
+        scheme, host, port = key
+        if scheme == "https":
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout_sec, context=self._ssl)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout_sec)
+        conn.connect()
+        try:
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+        return conn, False
+
+    def _checkin(self, key: tuple, conn) -> None:
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.max_idle_per_host:
+                conns.append((conn, time.monotonic()))
+                return
+        _close_quietly(conn)
+
+    def _discard(self, conn) -> None:
+        _close_quietly(conn)
+
+    def _bump(self, k: str) -> None:
+        with self._lock:
+            self._stats[k] += 1
+
+    def _redirect_lookup(self, method: str, url: str):
+        with self._lock:
+            ent = self._redirects.get((method, url))
+            if ent is None:
+                return None
+            code, loc, exp = ent
+            if exp < time.monotonic():
+                del self._redirects[(method, url)]
+                return None
+            return code, loc
+
+    def _redirect_store(self, method: str, url: str, code: int, loc: str) -> None:
+        if self.redirect_ttl_sec <= 0:
+            return
+        with self._lock:
+            self._redirects[(method, url)] = (code, loc, time.monotonic() + self.redirect_ttl_sec)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> HttpPool:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpPool()
+        return _default
+
+
+def close_default_pool() -> None:
+    global _default
+    with _default_lock:
+        p = _default
+        _default = None
+    if p is not None:
+        p.close()
+
+
+def _is_dropped(conn) -> bool:
+    sock = conn.sock
+    if sock is None:
+        return True
+    try:
+        r, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(r)
+
+
+def _close_quietly(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
@@ -0,0 +1,281 @@
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self, lock):
+        self.value = 0
+        self._lock = lock
+
+    def inc(self, n=1) -> None:
+        with self._lock:
+            self.value += n
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, v) -> None:
+        self.value = v
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, lock, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = lock
+
+    def observe(self, v: float) -> None:
+        i = bisect.bisect_left(self.bounds, v)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+
+class StageRecorder:
+    def __init__(self, maxlen: int = 4096):
+        self._q = collections.deque(maxlen=maxlen)
+        self.append = self._q.append
+
+    def drain(self) -> list:
+        out = []
+        q = self._q
+        while True:
+            try:
+                out.append(q.popleft())
+            except IndexError:
+                return out
+
+
+class Metrics:
+    def __init__(self, const_labels: dict | None = None):
+        self.const_labels = dict(const_labels or {})
+        self._lock = threading.Lock()
+        self._families = {}
+        self._collectors = []
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        return self._get(name, "counter", help, labels, Counter)
+
+    def gauge(self, name: str, help: str = "", **labels) -> Gauge:
+        return self._get(name, "gauge", help, labels, lambda _lock: Gauge())
+
+    def histogram(self, name: str, help: str = "", buckets=LATENCY_BUCKETS, **labels) -> Histogram:
+        return self._get(name, "histogram", help, labels, lambda lock: Histogram(lock, buckets))
+
+    def collect(self, fn) -> None:
+        with self._lock:
+            self._collectors.append(fn)
+
+    def render(self) -> str:
+        for fn in list(self._collectors):
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"metrics_collect_failed err={e}", file=sys.stderr, flush=True)
+        with self._lock:
+            fams = sorted(self._families.items())
+            out = []
+            for name, (kind, help, series) in fams:
+                if help:
+                    out.append(f"# HELP {name} {help}")
+                out.append(f"# TYPE {name} {kind}")
+                for key, m in sorted(series.items()):
+                    labels = dict(self.const_labels)
+                    labels.update(key)
+                    if kind == "histogram":
+                        acc = 0
+                        for le, c in zip(m.bounds + (float("inf"),), m.counts):
+                            acc += c
+                            out.append(f"{name}_bucket{_labels(labels, le=_num(le))} {acc}")
+                        out.append(f"{name}_sum{_labels(labels)} {_num(m.sum)}")
+                        out.append(f"{name}_count{_labels(labels)} {m.count}")
+                    else:
+                        out.append(f"{name}{_labels(labels)} {_num(m.value)}")
+        return "\n".join(out) + "\n"
+
+    def _get(self, name: str, kind: str, help: str, labels: dict, make):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            fam = self._families.get(name)
+            if fam is None:
+                fam = (kind, help, {})
+                self._families[name] = fam
+            elif fam[0] != kind:
+                raise RuntimeError(f"metric_kind_mismatch name={name} have={fam[0]} want={kind}")
+            m = fam[2].get(key)
+            if m is None:
+                m = make(self._lock)
+                fam[2][key] = m
+            return m
+
+
+class TextfileExporter:
+    def __init__(self, metrics: Metrics, path: Path, interval_sec: float = 15.0):
+        self.metrics = metrics
+        self.path = Path(path)
+        self.interval_sec = max(0.5, float(interval_sec))
+        self._stop = threading.Event()
+        self._th = None
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._th = threading.Thread(target=self._run, name="metrics-textfile", daemon=True)
+        self._th.start()
+        return self
+
+    def write(self) -> None:
+        data = self.metrics.render().encode("utf-8")
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._th is not None:
+            self._th.join(5.0)
+        try:
+            self.write()
+        except OSError as e:
+            print(f"metrics_write_failed path={self.path} err={e}", file=sys.stderr, flush=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"metrics_write_failed path={self.path} err={e}", file=sys.stderr, flush=True)
+
+
+class MetricsServer:
+    def __init__(self, metrics: Metrics, port: int, addr: str = "127.0.0.1"):
+        m = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = m.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                return
+
+        self._srv = ThreadingHTTPServer((addr, int(port)), Handler)
+        self._srv.daemon_threads = True
+        self.port = self._srv.server_address[1]
+        threading.Thread(target=self._srv.serve_forever, name="metrics-http", daemon=True).start()
+
+    def close(self) -> None:
+        self._srv.shutdown()
+        self._srv.server_close()
+
+
+class Exporters:
+    def __init__(self, items: list):
+        self.items = items
+
+    def close(self) -> None:
+        for it in self.items:
+            try:
+                it.close()
+            except Exception as e:
+                print(f"metrics_close_failed err={e}", file=sys.stderr, flush=True)
+
+
+def start_exporters(metrics: Metrics, component: str) -> Exporters:
+    items = []
+    d = str(os.environ.get("ATT_METRICS_DIR", "")).strip()
+    if d:
+        try:
+            sec = float(str(os.environ.get("ATT_METRICS_SEC", "")).strip() or 15.0)
+        except ValueError:
+            sec = 15.0
+        items.append(TextfileExporter(metrics, Path(d) / f"attendance_{component}.prom", sec).start())
+    port = str(os.environ.get("ATT_METRICS_PORT", "")).strip()
+    if port and port != "0":
+        addr = str(os.environ.get("ATT_METRICS_ADDR", "")).strip() or "127.0.0.1"
+        try:
+            items.append(MetricsServer(metrics, int(port), addr))
+        except (OSError, ValueError) as e:
+            print(f"metrics_http_disabled port={port} err={e}", file=sys.stderr, flush=True)
+    return Exporters(items)
+
+
+def collect_stats(metrics: Metrics, prefix: str, stats_fn, gauges: tuple = (), labels: dict | None = None):
+    labels = dict(labels or {})
+
+    def fn(m: Metrics) -> None:
+        for k, v in stats_fn().items():
+            if isinstance(v, bool) or not isinstance(v, (int, float)):
+                continue
+            if k in gauges:
+                m.gauge(f"{prefix}_{k}", **labels).set(v)
+            else:
+                m.counter(f"{prefix}_{k}_total", **labels).value = v
+
+    metrics.collect(fn)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_metrics() -> Metrics:
+    global _default
+    m = _default
+    if m is None:
+        with _default_lock:
+            if _default is None:
+                _default = Metrics()
+            m = _default
+    return m
+
+
+def set_default_component(component: str) -> Metrics:
+    m = default_metrics()
+    m.const_labels["component"] = component
+    m.gauge("att_process_start_time_seconds", "Unix time the process started").set(round(time.time(), 3))
+    return m
+
+
+def _labels(labels: dict, **extra) -> str:
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in items) + "}"
+
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(v) if isinstance(v, float) else str(v)
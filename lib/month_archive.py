@@ -0,0 +1,200 @@
+import bisect
+import hashlib
+import json
+import lzma
+import os
+import struct
+import zlib
+from pathlib import Path
+
+
+MAGIC = b"ATTSEG1\n"
+CODECS = ("gzip", "lzma")
+_FOOTER = struct.Struct(">Q8s")
+
+
+def segment_path(log_path: Path) -> Path:
+    return log_path.with_suffix(".seg")
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "gzip":
+        c = zlib.compressobj(9, zlib.DEFLATED, 31)
+        return c.compress(data) + c.flush()
+    if codec == "lzma":
+        return lzma.compress(data, preset=6)
+    raise ValueError(f"bad_archive_codec codec={codec}")
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "gzip":
+        return zlib.decompress(data, 31)
+    return lzma.decompress(data)
+
+
+class Segment:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            size = f.seek(0, 2)
+            if size < len(MAGIC) + _FOOTER.size:
+                raise ValueError(f"segment_truncated path={self.path}")
+            f.seek(size - _FOOTER.size)
+            idx_off, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            if magic != MAGIC or idx_off >= size:
+                raise ValueError(f"segment_bad_footer path={self.path}")
+            f.seek(idx_off)
+            idx = json.loads(f.read(size - _FOOTER.size - idx_off))
+        if idx.get("v") != 1 or idx.get("codec") not in CODECS:
+            raise ValueError(f"segment_bad_index path={self.path}")
+        self.codec = idx["codec"]
+        self.raw_len = int(idx["raw_len"])
+        self.lines = int(idx["lines"])
+        self.sha1 = str(idx.get("sha1", ""))
+        self.meta = dict(idx.get("meta", {}))
+        self.emps = list(idx.get("emps", []))
+        self.blocks = [tuple(b) for b in idx["blocks"]]
+        self._raw_offs = [b[2] for b in self.blocks]
+        self._masks = [int(b[7], 16) for b in self.blocks]
+        self._emp_bit = {e: i for i, e in enumerate(self.emps)}
+
+    def read_block(self, i: int) -> bytes:
+        off, clen = self.blocks[i][0], self.blocks[i][1]
+        with open(self.path, "rb") as f:
+            f.seek(off)
+            return _decompress(self.codec, f.read(clen))
+
+    def iter_lines(self, start: int = 0, end: int | None = None):
+        stop = self.raw_len if end is None else min(end, self.raw_len)
+        if stop <= start:
+            return
+        i = max(0, bisect.bisect_right(self._raw_offs, start) - 1)
+        with open(self.path, "rb") as f:
+            for b in self.blocks[i:]:
+                off, clen, raw_off = b[0], b[1], b[2]
+                if raw_off >= stop:
+                    return
+                f.seek(off)
+                data = _decompress(self.codec, f.read(clen))
+                pos = raw_off
+                for raw in data.splitlines(keepends=True):
+                    pos += len(raw)
+                    if pos <= start:
+                        continue
+                    if pos > stop:
+                        return
+                    yield pos, raw
+
+    def iter_lines_reverse(self):
+        for i in range(len(self.blocks) - 1, -1, -1):
+            yield from reversed(self.read_block(i).splitlines(keepends=True))
+
+    def head(self, n: int) -> bytes:
+        out = b""
+        for i in range(len(self.blocks)):
+            if len(out) >= n:
+                break
+            out += self.read_block(i)
+        return out[:n]
+
+    def blocks_for(self, day: str | None = None, emp: str | None = None) -> list[int]:
+        bit = None
+        if emp is not None:
+            bit = self._emp_bit.get(emp)
+            if bit is None:
+                return []
+        out = []
+        for i, b in enumerate(self.blocks):
+            if day is not None and not (b[5] <= day <= b[6]):
+                continue
+            if bit is not None and not (self._masks[i] >> bit) & 1:
+                continue
+            out.append(i)
+        return out
+
+    def query(self, day: str | None = None, emp: str | None = None):
+        for i in self.blocks_for(day, emp):
+            yield from self.read_block(i).splitlines(keepends=True)
+
+
+def write_segment(path: Path, rows, codec: str = "gzip", block_bytes: int = 32768, meta: dict | None = None) -> dict:
+    if codec not in CODECS:
+        raise ValueError(f"bad_archive_codec codec={codec}")
+    block_bytes = max(1024, int(block_bytes))
+    tmp = path.with_name(f"{path.name}.tmp.{os.getpid()}")
+    emps = {}
+    blocks = []
+    h = hashlib.sha1()
+    raw_len = 0
+    lines = 0
+    buf = []
+    buf_len = 0
+    day_lo = day_hi = ""
+    mask = 0
+
+    def flush(f):
+        nonlocal buf, buf_len, mask
+        data = b"".join(buf)
+        comp = _compress(codec, data)
+        blocks.append([f.tell(), len(comp), raw_len - buf_len, buf_len, len(buf), day_lo, day_hi, f"{mask:x}"])
+        f.write(comp)
+        buf = []
+        buf_len = 0
+        mask = 0
+
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            for raw, day, emp in rows:
+                if not buf:
+                    day_lo = day_hi = day
+                else:
+                    day_lo = min(day_lo, day)
+                    day_hi = max(day_hi, day)
+                bit = emps.get(emp)
+                if bit is None:
+                    bit = emps[emp] = len(emps)
+                mask |= 1 << bit
+                buf.append(raw)
+                buf_len += len(raw)
+                raw_len += len(raw)
+                lines += 1
+                h.update(raw)
+                if buf_len >= block_bytes:
+                    flush(f)
+            if buf:
+                flush(f)
+            idx_off = f.tell()
+            idx = {"v": 1, "codec": codec, "raw_len": raw_len, "lines": lines, "sha1": h.hexdigest(), "meta": dict(meta or {}), "emps": list(emps), "blocks": blocks}
+            f.write(json.dumps(idx, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            f.write(_FOOTER.pack(idx_off, MAGIC))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        fsync_dir(path.parent)
+    finally:
+        try:
+            if tmp.exists():
+                tmp.unlink()
+        except Exception:
+            pass
+    return {"raw_bytes": raw_len, "archived_bytes": path.stat().st_size, "lines": lines, "blocks": len(blocks), "sha1": h.hexdigest()}
+
+
+def verify_segment(path: Path, sha1: str) -> bool:
+    seg = Segment(path)
+    h = hashlib.sha1()
+    for i in range(len(seg.blocks)):
+        h.update(seg.read_block(i))
+    return h.hexdigest() == sha1 == seg.sha1
+
+
+def fsync_dir(d: Path) -> None:
+    try:
+        dfd = os.open(str(d), os.O_DIRECTORY)
+        try:
+            os.fsync(dfd)
+        finally:
+            os.close(dfd)
+    except Exception:
+        pass
@@ -1,126 +1,249 @@
 import hashlib
-from collections import defaultdict
+from datetime import date, timedelta
+from itertools import islice
+from operator import attrgetter
 from pathlib import Path
 
-from lib.env_loader import load_employee_env, env_int
-from lib.time_jst import parse_iso, date_jst
-
-
-def build_daily_payroll_records(repo_root: Path, events: list[dict]) -> tuple[list[dict], dict]:
-    parsed = []
-    unknown_emp = 0
-
-    for ev in events:
-        if not isinstance(ev, dict):
-            continue
-        emp = str(ev.get("emp", "unknown"))
-        if emp == "unknown":
-            unknown_emp += 1
-            continue
-        ts_s = ev.get("ts")
-        if not isinstance(ts_s, str) or not ts_s:
-            continue
-        try:
-            ts = parse_iso(ts_s)
-        except Exception:
-            continue
-        act = str(ev.get("act", ""))
-        code = ev.get("code")
-        code = str(code) if code is not None else ""
-        parsed.append((ts, emp, act, code))
-
-    parsed.sort(key=lambda x: x[0])
-
-    open_in = {}
-    mins = defaultdict(int)
-    flags = defaultdict(set)
-
-    for ts, emp, act, code in parsed:
-        d = str(date_jst(ts))
-        key = (emp, d)
-
-        if act == "IN":
-            if emp in open_in:
-                flags[key].add("double_in")
-            open_in[emp] = ts
-            continue
-
-        if act == "OUT":
-            if emp not in open_in:
-                flags[key].add("orphan_out")
+from lib.attendance_rules import restore_since
+from lib.attendance_store import EventRecord, decode_event, iter_decoded_month_from, iter_decoded_since, month_key
+from lib.env_loader import employee_registry
+from lib.time_jst import day_iso, iso_epoch, jst_day, midnight_jst, next_month_start_jst, parse_ts
+
+
+class OutOfOrder(RuntimeError):
+    pass
+
+
+class PayrollState:
+    def __init__(self, open_in: dict | None = None):
+        self.open_in = dict(open_in or {})
+        self.mins = {}
+        self.flags = {}
+        self.events = 0
+        self.unknown_emp = 0
+        self.last_ts = None
+
+    def add_events(self, events: list) -> set:
+        parsed = []
+        unknown_emp = 0
+
+        for ev in events:
+            if type(ev) is not EventRecord:
+                ev = decode_event(ev)
+                if ev is None:
+                    continue
+            if ev.emp == "unknown":
+                unknown_emp += 1
                 continue
-            t0 = open_in.pop(emp)
-            d0 = str(date_jst(t0))
-            key0 = (emp, d0)
-            dur = int((ts - t0).total_seconds() // 60)
-            if dur < 0:
-                flags[key0].add("negative_duration")
+            parsed.append(ev)
+
+        parsed.sort(key=attrgetter("epoch"))
+        if parsed and self.last_ts is not None and parsed[0].epoch < self.last_ts:
+            raise OutOfOrder(f"payroll_events_out_of_order ts={parsed[0].ts}")
+
+        self.events += len(events)
+        self.unknown_emp += unknown_emp
+        if parsed:
+            self.last_ts = parsed[-1].epoch
+
+        open_in = self.open_in
+        mins = self.mins
+        flags = self.flags
+        dirty = set()
+
+        for ev in parsed:
+            ts = ev.epoch
+            emp = ev.emp
+            act = ev.act
+            d = day_iso(ev.day)
+            key = (emp, d)
+
+            if act == "IN":
+                if emp in open_in:
+                    flags.setdefault(key, set()).add("double_in")
+                    dirty.add(key)
+                open_in[emp] = ts
                 continue
-            mins[key0] += dur
-            if d0 != d:
-                flags[key0].add("cross_day")
-            continue
-
-        if act == "ERROR":
-            c = code if code else "error"
-            flags[key].add(f"error:{c}")
-            if emp in open_in:
-                d0 = str(date_jst(open_in[emp]))
-                flags[(emp, d0)].add("missing_out")
-                open_in.pop(emp, None)
-            continue
-
-    for emp, t0 in list(open_in.items()):
-        d0 = str(date_jst(t0))
-        flags[(emp, d0)].add("missing_out")
-
-    keys = set(mins.keys()) | set(flags.keys())
-    keys = sorted(keys, key=lambda x: (x[1], x[0]))
 
-    recs = []
-    flags_days = 0
+            if act == "OUT":
+                if emp not in open_in:
+                    flags.setdefault(key, set()).add("orphan_out")
+                    dirty.add(key)
+                    continue
+                t0 = open_in.pop(emp)
+                d0 = day_iso(jst_day(t0))
+                key0 = (emp, d0)
+                dirty.add(key0)
+                dur = int((ts - t0) // 60)
+                if dur < 0:
+                    flags.setdefault(key0, set()).add("negative_duration")
+                    continue
+                mins[key0] = mins.get(key0, 0) + dur
+                if d0 != d:
+                    flags.setdefault(key0, set()).add("cross_day")
+                continue
 
+            if act == "ERROR":
+                c = ev.code if ev.code else "error"
+                flags.setdefault(key, set()).add(f"error:{c}")
+                dirty.add(key)
+                if emp in open_in:
+                    d0 = day_iso(jst_day(open_in[emp]))
+                    flags.setdefault((emp, d0), set()).add("missing_out")
+                    dirty.add((emp, d0))
+                    open_in.pop(emp, None)
+                continue
+
+        return dirty
+
+    def copy(self):
+        ps = PayrollState(self.open_in)
+        ps.mins = dict(self.mins)
+        ps.flags = {k: set(v) for k, v in self.flags.items()}
+        ps.events = self.events
+        ps.unknown_emp = self.unknown_emp
+        ps.last_ts = self.last_ts
+        return ps
+
+    def open_keys(self) -> set:
+        return {(emp, day_iso(jst_day(t0))) for emp, t0 in self.open_in.items()}
+
+    def final_flags(self) -> dict:
+        flags = dict(self.flags)
+        for key in self.open_keys():
+            flags[key] = set(flags.get(key, set())) | {"missing_out"}
+        return flags
+
+    def keys(self, month: str | None = None) -> list:
+        keys = set(self.mins.keys()) | set(self.flags.keys()) | self.open_keys()
+        if month is not None:
+            keys = {k for k in keys if k[1].startswith(month)}
+        return sorted(keys, key=lambda x: (x[1], x[0]))
+
+    def summary(self, recs: list[dict], month: str | None = None) -> dict:
+        return {
+            "events": self.events,
+            "events_unknown_emp": self.unknown_emp,
+            "days_emps": len(self.keys(month)),
+            "flags_days": sum(1 for r in recs if r.get("flags")),
+        }
+
+    def to_json(self) -> dict:
+        return {
+            "open_in": {emp: iso_epoch(ts) for emp, ts in self.open_in.items()},
+            "mins": [[emp, d, m] for (emp, d), m in self.mins.items()],
+            "flags": [[emp, d, sorted(fs)] for (emp, d), fs in self.flags.items()],
+            "events": self.events,
+            "events_unknown_emp": self.unknown_emp,
+            "last_ts": iso_epoch(self.last_ts) if self.last_ts is not None else None,
+        }
+
+    @staticmethod
+    def from_json(o: dict):
+        ps = PayrollState()
+        ps.open_in = {str(emp): parse_ts(ts)[0] for emp, ts in dict(o.get("open_in", {})).items()}
+        ps.mins = {(str(emp), str(d)): int(m) for emp, d, m in o.get("mins", [])}
+        ps.flags = {(str(emp), str(d)): set(fs) for emp, d, fs in o.get("flags", [])}
+        ps.events = int(o.get("events", 0))
+        ps.unknown_emp = int(o.get("events_unknown_emp", 0))
+        last_ts = o.get("last_ts")
+        ps.last_ts = parse_ts(last_ts)[0] if last_ts else None
+        return ps
+
+
+def month_bounds(ym: str):
+    start = midnight_jst(date(int(ym[0:4]), int(ym[5:7]), 1))
+    return start, next_month_start_jst(start)
+
+
+def carry_in(repo_root: Path, ym: str) -> dict:
+    start, _ = month_bounds(ym)
+    ps = PayrollState()
+    ps.add_events(list(iter_decoded_since(repo_root, restore_since(start), start - timedelta(seconds=1))))
+    return ps.open_in
+
+
+def month_view(repo_root: Path, ym: str, ps: PayrollState) -> PayrollState:
+    if not ps.open_in:
+        return ps
+    _, end = month_bounds(ym)
+    since = restore_since(end)
+    until = (end + (end - since)).timestamp()
+    since = since.timestamp()
+    ahead = []
+    for _off, ev in iter_decoded_month_from(repo_root, month_key(end), 0):
+        if ev.epoch > until:
+            break
+        ahead.append(ev)
+    if not ahead:
+        return ps
+    view = ps.copy()
+    stale = {emp: t0 for emp, t0 in view.open_in.items() if t0 < since}
+    for emp in stale:
+        del view.open_in[emp]
+    try:
+        view.add_events(ahead)
+    except OutOfOrder:
+        return ps
+    view.open_in.update(stale)
+    return view
+
+
+def build_daily_payroll_records(repo_root: Path, events, batch: int = 4096) -> tuple[list[dict], dict]:
+    ps = PayrollState()
+    if isinstance(events, list):
+        ps.add_events(events)
+    else:
+        it = iter(events)
+        while True:
+            chunk = list(islice(it, batch))
+            if not chunk:
+                break
+            ps.add_events(chunk)
+    recs = build_records(repo_root, ps, ps.keys(), {})
+    return recs, ps.summary(recs)
+
+
+def build_records(repo_root: Path, ps: PayrollState, keys: list, env_cache: dict) -> list[dict]:
+    flags = ps.final_flags()
+    recs = []
     for emp, d in keys:
-        raw_min = int(mins.get((emp, d), 0))
-        fset = set(flags.get((emp, d), set()))
-        if not raw_min and not fset:
-            continue
-
-        e = load_employee_env(repo_root, emp)
-        hourly = env_int(e, "HOURLY_YEN", 0)
-        unit = env_int(e, "ROUND_UNIT_MINUTES", 5)
-        if unit <= 0:
-            unit = 5
-        if hourly <= 0:
-            fset.add("missing_hourly_yen")
-
-        rounded = (raw_min // unit) * unit
-        yen = (rounded * hourly) // 60
-
-        rid = _rid(d, emp)
-        if fset:
-            flags_days += 1
-
-        recs.append(
-            {
-                "id": rid,
-                "date": d,
-                "emp": emp,
-                "min_raw": raw_min,
-                "min": rounded,
-                "yen_h": hourly,
-                "yen": int(yen),
-                "flags": sorted(list(fset)),
-            }
-        )
-
-    summary = {
-        "events": len(events),
-        "events_unknown_emp": unknown_emp,
-        "days_emps": len(keys),
-        "flags_days": flags_days,
+        rec = payroll_record(emp, d, int(ps.mins.get((emp, d), 0)), flags.get((emp, d), set()), employee_rates(repo_root, emp, env_cache))
+        if rec is not None:
+            recs.append(rec)
+    return recs
+
+
+def employee_rates(repo_root: Path, emp: str, cache: dict) -> tuple[int, int]:
+    if emp in cache:
+        return cache[emp]
+    rates = employee_registry(repo_root).rates(emp)
+    cache[emp] = rates
+    return rates
+
+
+def payroll_record(emp: str, d: str, raw_min: int, flags: set, rates: tuple[int, int]) -> dict | None:
+    fset = set(flags)
+    if not raw_min and not fset:
+        return None
+
+    hourly, unit = rates
+    if hourly <= 0:
+        fset.add("missing_hourly_yen")
+
+    rounded = (raw_min // unit) * unit
+    yen = (rounded * hourly) // 60
+
+    return {
+        "id": _rid(d, emp),
+        "date": d,
+        "emp": emp,
+        "min_raw": raw_min,
+        "min": rounded,
+        "yen_h": hourly,
+        "yen": int(yen),
+        "flags": sorted(list(fset)),
     }
-    return recs, summary
 
 
 def _rid(date_s: str, emp: str) -> str:
@@ -0,0 +1,275 @@
+import ctypes
+import ctypes.util
+import time
+
+
+SCARD_S_SUCCESS = 0x00000000
+SCARD_E_CANCELLED = 0x80100002
+SCARD_E_TIMEOUT = 0x8010000A
+SCARD_E_NO_SMARTCARD = 0x8010000C
+SCARD_E_UNKNOWN_READER = 0x80100009
+SCARD_E_READER_UNAVAILABLE = 0x80100017
+SCARD_E_NO_READERS_AVAILABLE = 0x8010002E
+SCARD_W_REMOVED_CARD = 0x80100069
+
+SCARD_SCOPE_SYSTEM = 2
+SCARD_SHARE_SHARED = 2
+SCARD_PROTOCOL_T0 = 0x0001
+SCARD_PROTOCOL_T1 = 0x0002
+SCARD_LEAVE_CARD = 0
+
+SCARD_STATE_UNAWARE = 0x0000
+SCARD_STATE_IGNORE = 0x0001
+SCARD_STATE_CHANGED = 0x0002
+SCARD_STATE_UNKNOWN = 0x0004
+SCARD_STATE_UNAVAILABLE = 0x0008
+SCARD_STATE_EMPTY = 0x0010
+SCARD_STATE_PRESENT = 0x0020
+
+PNP_NOTIFICATION = "\\\\?PnP?\\Notification"
+
+GET_UID_APDU = bytes([0xFF, 0xCA, 0x00, 0x00, 0x00])
+
+_INFINITE = 0xFFFFFFFF
+_MAX_ATR_SIZE = 33
+_MAX_BUFFER_SIZE = 264
+
+_DWORD = ctypes.c_ulong
+_LONG = ctypes.c_long
+
+
+class PcscError(RuntimeError):
+    def __init__(self, func: str, rc: int):
+        self.func = func
+        self.rc = int(rc) & 0xFFFFFFFF
+        super().__init__(f"pcsc_error func={func} rc=0x{self.rc:08X}")
+
+
+class PcscUnavailable(RuntimeError):
+    pass
+
+
+class ReadersChanged(RuntimeError):
+    pass
+
+
+class _ReaderState(ctypes.Structure):
+    _fields_ = [
+        ("szReader", ctypes.c_char_p),
+        ("pvUserData", ctypes.c_void_p),
+        ("dwCurrentState", _DWORD),
+        ("dwEventState", _DWORD),
+        ("cbAtr", _DWORD),
+        ("rgbAtr", ctypes.c_ubyte * _MAX_ATR_SIZE),
+    ]
+
+
+class _IoRequest(ctypes.Structure):
+    _fields_ = [
+        ("dwProtocol", _DWORD),
+        ("cbPciLength", _DWORD),
+    ]
+
+
+class Libpcsclite:
+    def __init__(self, path: str | None = None, lib=None):
+        if lib is None:
+            name = path or ctypes.util.find_library("pcsclite") or "libpcsclite.so.1"
+            try:
+                lib = ctypes.CDLL(name)
+            except OSError as e:
+                raise PcscUnavailable(f"libpcsclite_not_found name={name} err={e}")
+
+        self._lib = lib
+        lib.SCardEstablishContext.argtypes = [_DWORD, ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(_LONG)]
+        lib.SCardEstablishContext.restype = _LONG
+        lib.SCardReleaseContext.argtypes = [_LONG]
+        lib.SCardReleaseContext.restype = _LONG
+        lib.SCardListReaders.argtypes = [_LONG, ctypes.c_char_p, ctypes.c_char_p, ctypes.POINTER(_DWORD)]
+        lib.SCardListReaders.restype = _LONG
+        lib.SCardGetStatusChange.argtypes = [_LONG, _DWORD, ctypes.POINTER(_ReaderState), _DWORD]
+        lib.SCardGetStatusChange.restype = _LONG
+        lib.SCardConnect.argtypes = [_LONG, ctypes.c_char_p, _DWORD, _DWORD, ctypes.POINTER(_LONG), ctypes.POINTER(_DWORD)]
+        lib.SCardConnect.restype = _LONG
+        lib.SCardTransmit.argtypes = [
+            _LONG,
+            ctypes.POINTER(_IoRequest),
+            ctypes.c_char_p,
+            _DWORD,
+            ctypes.c_void_p,
+            ctypes.c_char_p,
+            ctypes.POINTER(_DWORD),
+        ]
+        lib.SCardTransmit.restype = _LONG
+        lib.SCardDisconnect.argtypes = [_LONG, _DWORD]
+        lib.SCardDisconnect.restype = _LONG
+        lib.SCardCancel.argtypes = [_LONG]
+        lib.SCardCancel.restype = _LONG
+
+    def establish_context(self) -> int:
+        ctx = _LONG(0)
+        rc = self._lib.SCardEstablishContext(SCARD_SCOPE_SYSTEM, None, None, ctypes.byref(ctx))
+        _check("SCardEstablishContext", rc)
+        return int(ctx.value)
+
+    def release_context(self, ctx: int) -> None:
+        self._lib.SCardReleaseContext(ctx)
+
+    def cancel(self, ctx: int) -> None:
+        self._lib.SCardCancel(ctx)
+
+    def list_readers(self, ctx: int) -> list[str]:
+        size = _DWORD(0)
+        rc = self._lib.SCardListReaders(ctx, None, None, ctypes.byref(size))
+        if _code(rc) == SCARD_E_NO_READERS_AVAILABLE:
+            return []
+        _check("SCardListReaders", rc)
+        buf = ctypes.create_string_buffer(int(size.value))
+        rc = self._lib.SCardListReaders(ctx, None, buf, ctypes.byref(size))
+        if _code(rc) == SCARD_E_NO_READERS_AVAILABLE:
+            return []
+        _check("SCardListReaders", rc)
+        raw = buf.raw[: int(size.value)]
+        return [s.decode("utf-8", "replace") for s in raw.split(b"\x00") if s]
+
+    def get_status_change(self, ctx: int, timeout_ms: int, states: list[list]) -> int:
+        n = len(states)
+        arr = (_ReaderState * n)()
+        names = []
+        for i, (name, cur) in enumerate(states):
+            b = name.encode("utf-8")
+            names.append(b)
+            arr[i].szReader = b
+            arr[i].dwCurrentState = int(cur)
+        t = _INFINITE if timeout_ms is None or timeout_ms < 0 else int(timeout_ms)
+        rc = self._lib.SCardGetStatusChange(ctx, t, arr, n)
+        for i in range(n):
+            states[i][1] = int(arr[i].dwEventState)
+        return _code(rc)
+
+    def connect(self, ctx: int, reader: str) -> tuple[int, int]:
+        card = _LONG(0)
+        proto = _DWORD(0)
+        rc = self._lib.SCardConnect(
+            ctx,
+            reader.encode("utf-8"),
+            SCARD_SHARE_SHARED,
+            SCARD_PROTOCOL_T0 | SCARD_PROTOCOL_T1,
+            ctypes.byref(card),
+            ctypes.byref(proto),
+        )
+        _check("SCardConnect", rc)
+        return int(card.value), int(proto.value)
+
+    def transmit(self, card: int, proto: int, apdu: bytes) -> bytes:
+        pci = _IoRequest(proto, ctypes.sizeof(_IoRequest))
+        buf = ctypes.create_string_buffer(_MAX_BUFFER_SIZE)
+        size = _DWORD(_MAX_BUFFER_SIZE)
+        rc = self._lib.SCardTransmit(card, ctypes.byref(pci), apdu, len(apdu), None, buf, ctypes.byref(size))
+        _check("SCardTransmit", rc)
+        return buf.raw[: int(size.value)]
+
+    def disconnect(self, card: int) -> None:
+        self._lib.SCardDisconnect(card, SCARD_LEAVE_CARD)
+
+
+class PcscSession:
+    def __init__(self, lib=None, wait_slice_ms: int = 5000):
+        self._lib = lib if lib is not None else Libpcsclite()
+        self._ctx = self._lib.establish_context()
+        self._wait_slice_ms = int(wait_slice_ms)
+        self._known = {}
+        self._pnp = None
+        self.reader_gen = 0
+        self.last_timing = None
+
+    def close(self) -> None:
+        ctx = self._ctx
+        self._ctx = None
+        if ctx is not None:
+            try:
+                self._lib.release_context(ctx)
+            except Exception:
+                pass
+
+    def cancel(self) -> None:
+        if self._ctx is not None:
+            try:
+                self._lib.cancel(self._ctx)
+            except Exception:
+                pass
+
+    def list_readers(self) -> list[tuple[int, str]]:
+        names = self._lib.list_readers(self._ctx)
+        self._pnp = len(names) << 16
+        return list(enumerate(names))
+
+    def read_uid_blocking(self, reader: str) -> str:
+        self._wait_state(reader, SCARD_STATE_PRESENT)
+        t0 = time.perf_counter_ns()
+        resp = self.transmit_once(reader, GET_UID_APDU)
+        uid = parse_uid_response(resp)
+        if not uid:
+            raise RuntimeError(f"uid parse failed resp={resp.hex().upper()}")
+        t1 = time.perf_counter_ns()
+        self._wait_state(reader, SCARD_STATE_EMPTY)
+        self.last_timing = (t1 - t0, time.perf_counter_ns() - t1)
+        return uid
+
+    def transmit_once(self, reader: str, apdu: bytes) -> bytes:
+        card, proto = self._lib.connect(self._ctx, reader)
+        try:
+            return self._lib.transmit(card, proto, apdu)
+        finally:
+            try:
+                self._lib.disconnect(card)
+            except Exception:
+                pass
+
+    def _wait_state(self, reader: str, want: int) -> None:
+        cur = self._known.get(reader, SCARD_STATE_UNAWARE)
+        while True:
+            states = [[reader, cur]]
+            if self._pnp is not None:
+                states.append([PNP_NOTIFICATION, self._pnp])
+            rc = self._lib.get_status_change(self._ctx, self._wait_slice_ms, states)
+            if rc == SCARD_E_TIMEOUT:
+                continue
+            if rc != SCARD_S_SUCCESS:
+                self._known.pop(reader, None)
+                raise PcscError("SCardGetStatusChange", rc)
+            if len(states) > 1:
+                pev = int(states[1][1])
+                if pev & SCARD_STATE_UNKNOWN:
+                    self._pnp = None
+                elif pev & SCARD_STATE_CHANGED:
+                    self._pnp = pev & ~SCARD_STATE_CHANGED
+                    self.reader_gen += 1
+                    if want == SCARD_STATE_PRESENT:
+                        raise ReadersChanged(f"pcsc_readers_changed gen={self.reader_gen}")
+            ev = int(states[0][1])
+            cur = ev & ~SCARD_STATE_CHANGED
+            self._known[reader] = cur
+            if ev & (SCARD_STATE_UNKNOWN | SCARD_STATE_UNAVAILABLE):
+                self._known.pop(reader, None)
+                raise PcscError("SCardGetStatusChange", SCARD_E_READER_UNAVAILABLE)
+            if ev & want:
+                return
+
+
+def parse_uid_response(resp: bytes) -> str:
+    if len(resp) < 3:
+        return ""
+    if resp[-2] != 0x90 or resp[-1] != 0x00:
+        return ""
+    return resp[:-2].hex().upper()
+
+
+def _code(rc) -> int:
+    return int(rc) & 0xFFFFFFFF
+
+
+def _check(func: str, rc) -> None:
+    c = _code(rc)
+    if c != SCARD_S_SUCCESS:
+        raise PcscError(func, c)
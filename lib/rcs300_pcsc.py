@@ -1,17 +1,197 @@
+import os
 import subprocess
 import re
+import threading
 import time
 
+from lib.pcsc_native import PcscSession, PcscUnavailable, ReadersChanged
+
 
 _HEX2 = re.compile(r"^[0-9A-Fa-f]{2}$")
 _READER_LINE = re.compile(r"^\s*(\d+)\s*:\s*(.+?)\s*$")
+_READER_ROW = re.compile(r"^\s*(\d+)\s+(?:Yes|No)\s+(?:(?:PIN pad|Display)\s*,?\s*)*(.+?)\s*$")
+
+_READER_KEYS = [
+    "rc-s300",
+    "rcs300",
+    "pasori",
+    "felica",
+    "sony",
+    "acr122",
+    "acs",
+    "nfc",
+    "contactless",
+]
+
+_native_local = threading.local()
+_native_lib = None
+_native_disabled = False
+
+
+class ReaderRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}
+        self.hits = 0
+        self.rediscoveries = 0
+        self.invalidations = 0
+
+    def resolve(self, hint: int, list_fn, gen: int = 0, exact: bool = False) -> tuple[int, str]:
+        key = (hint, exact)
+        with self._lock:
+            c = self._cache.get(key)
+            if c is not None and c[2] == gen:
+                self.hits += 1
+                return c[0], c[1]
+        readers = list_fn()
+        idx = hint if exact else _choose_reader(readers, hint)
+        name = dict(readers).get(idx, "")
+        with self._lock:
+            self.rediscoveries += 1
+            if name:
+                self._cache[key] = (idx, name, gen)
+            else:
+                self._cache.pop(key, None)
+        return idx, name
+
+    def invalidate(self) -> None:
+        with self._lock:
+            if self._cache:
+                self.invalidations += 1
+            self._cache = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "rediscoveries": self.rediscoveries,
+                "invalidations": self.invalidations,
+            }
+
+
+_opensc_registry = ReaderRegistry()
+_native_registries = []
+_native_registries_lock = threading.Lock()
+
+
+def read_uid_blocking(reader_index: int = 0, exact: bool = False) -> str:
+    backend = pcsc_backend()
+    if backend != "opensc":
+        s = _native_session(required=(backend == "native"))
+        if s is not None:
+            return _read_uid_native(s, reader_index, exact)
+    return _read_uid_opensc(reader_index, exact)
+
+
+def list_readers() -> list[tuple[int, str]]:
+    backend = pcsc_backend()
+    if backend != "opensc":
+        s = _native_session(required=(backend == "native"))
+        if s is not None:
+            return s.list_readers()
+    return _list_readers()
+
+
+def take_read_timing() -> tuple[int, int] | None:
+    s = getattr(_native_local, "session", None)
+    if s is None:
+        return None
+    t = s.last_timing
+    s.last_timing = None
+    return t
+
 
+def reader_registry_stats() -> dict:
+    native = {"hits": 0, "rediscoveries": 0, "invalidations": 0}
+    with _native_registries_lock:
+        regs = list(_native_registries)
+    for r in regs:
+        for k, v in r.stats().items():
+            native[k] += v
+    return {"opensc": _opensc_registry.stats(), "native": native}
 
-def read_uid_blocking(reader_index: int = 0) -> str:
-    ri = _pick_reader_index(reader_index)
-    out = _run_wait_apdu(ri)
+
+def pcsc_backend() -> str:
+    v = str(os.environ.get("ATT_PCSC_BACKEND", "")).strip().lower()
+    if v in ("native", "opensc"):
+        return v
+    return "auto"
+
+
+def set_native_lib(lib) -> None:
+    global _native_lib, _native_disabled
+    close_native_session()
+    _native_lib = lib
+    _native_disabled = False
+
+
+def close_native_session() -> None:
+    s = getattr(_native_local, "session", None)
+    _native_local.session = None
+    if s is not None:
+        s.close()
+    reg = getattr(_native_local, "registry", None)
+    if reg is not None:
+        reg.invalidate()
+
+
+def _native_registry() -> ReaderRegistry:
+    reg = getattr(_native_local, "registry", None)
+    if reg is None:
+        reg = ReaderRegistry()
+        _native_local.registry = reg
+        with _native_registries_lock:
+            _native_registries.append(reg)
+    return reg
+
+
+def _native_session(required: bool):
+    global _native_disabled
+    s = getattr(_native_local, "session", None)
+    if s is not None:
+        return s
+    if _native_disabled and not required:
+        return None
+    try:
+        s = PcscSession(lib=_native_lib)
+    except PcscUnavailable:
+        if required:
+            raise
+        _native_disabled = True
+        return None
+    except Exception:
+        if required:
+            raise
+        return None
+    _native_local.session = s
+    return s
+
+
+def _read_uid_native(s: PcscSession, hint: int, exact: bool) -> str:
+    reg = _native_registry()
+    while True:
+        _, name = reg.resolve(hint, s.list_readers, s.reader_gen, exact)
+        if not name:
+            raise RuntimeError("no pcsc readers")
+        try:
+            return s.read_uid_blocking(name)
+        except ReadersChanged:
+            continue
+        except Exception:
+            close_native_session()
+            raise
+
+
+def _read_uid_opensc(reader_index: int, exact: bool) -> str:
+    ri, _ = _opensc_registry.resolve(reader_index, _list_readers, 0, exact)
+    try:
+        out = _run_wait_apdu(ri)
+    except Exception:
+        _opensc_registry.invalidate()
+        raise
     uid = _parse_uid(out)
     if not uid:
+        _opensc_registry.invalidate()
         raise RuntimeError(out.strip() or "uid parse failed")
     _wait_removed(ri)
     return uid
@@ -25,7 +205,7 @@ def _list_readers() -> list[tuple[int, str]]:
         return []
     readers = []
     for line in out.splitlines():
-        m = _READER_LINE.match(line)
+        m = _READER_LINE.match(line) or _READER_ROW.match(line)
         if not m:
             continue
         try:
@@ -39,27 +219,15 @@ def _list_readers() -> list[tuple[int, str]]:
     return readers
 
 
-def _pick_reader_index(hint: int) -> int:
-    readers = _list_readers()
+def _choose_reader(readers: list[tuple[int, str]], hint: int) -> int:
     if not readers:
         return hint
     if len(readers) == 1:
         return readers[0][0]
 
-    keys = [
-        "rc-s300",
-        "rcs300",
-        "pasori",
-        "felica",
-        "sony",
-        "acr122",
-        "acs",
-        "nfc",
-        "contactless",
-    ]
     for idx, name in readers:
         low = name.lower()
-        for k in keys:
+        for k in _READER_KEYS:
             if k in low:
                 return idx
 
@@ -0,0 +1,251 @@
+import gzip
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+from lib.attendance_store import decode_line, events_head_digest, iter_event_lines, month_key, months_between
+from lib.http_pool import HttpPool, default_pool
+from lib.metrics import Metrics
+from lib.time_jst import next_month_start_jst
+
+
+_RETRYABLE_4XX = (408, 425, 429)
+
+
+class ReplicaRejected(RuntimeError):
+    def __init__(self, msg: str, status: int):
+        super().__init__(msg)
+        self.status = status
+
+
+class ReplicaCursor:
+    def __init__(self, path: Path, url: str, site: str):
+        self.path = Path(path)
+        self.key = hashlib.sha1(f"{str(url).strip()}|{site}".encode("utf-8")).hexdigest()
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                o = json.load(f)
+        except Exception:
+            return {}
+        if not isinstance(o, dict) or o.get("v") != 1 or o.get("key") != self.key:
+            return {}
+        out = {}
+        for ym, m in dict(o.get("months", {})).items():
+            try:
+                out[str(ym)] = {"offset": int(m["offset"]), "head": str(m.get("head", ""))}
+            except Exception:
+                continue
+        return out
+
+    def save(self, months: dict) -> None:
+        body = json.dumps({"v": 1, "key": self.key, "months": months}, separators=(",", ":"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.tmp.{os.getpid()}")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        finally:
+            try:
+                if tmp.exists():
+                    tmp.unlink()
+            except Exception:
+                pass
+
+
+class Replicator:
+    def __init__(
+        self,
+        repo_root: Path,
+        url: str,
+        site: str,
+        token: str | None = None,
+        batch_lines: int = 2000,
+        batch_bytes: int = 262144,
+        gzip_body: bool = True,
+        timeout_sec: float = 20.0,
+        backoff_sec: float = 1.0,
+        backoff_max_sec: float = 300.0,
+        month_grace_sec: float = 2 * 86400.0,
+        from_month: str | None = None,
+        pool: HttpPool | None = None,
+        metrics: Metrics | None = None,
+    ):
+        self.repo_root = Path(repo_root)
+        self.url = str(url).strip()
+        self.site = site
+        self.token = token
+        self.batch_lines = max(1, int(batch_lines))
+        self.batch_bytes = max(1024, int(batch_bytes))
+        self.gzip_body = bool(gzip_body)
+        self.timeout_sec = float(timeout_sec)
+        self.backoff_sec = max(0.01, float(backoff_sec))
+        self.backoff_max_sec = max(self.backoff_sec, float(backoff_max_sec))
+        self.month_grace_sec = max(0.0, float(month_grace_sec))
+        self.from_month = from_month
+        self.cursor = ReplicaCursor(self.repo_root / "state" / "attendance" / "replica" / "cursor.json", self.url, site)
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "lines": 0, "raw_bytes": 0, "sent_bytes": 0, "accepted": 0, "duplicates": 0, "rejected": 0, "failures": 0, "resets": 0, "halted": 0, "lag_seconds": 0.0}
+        self._months = None
+        self.halted = ""
+        self._m = None
+        if metrics is not None:
+            self._m = metrics.histogram("att_replica_post_seconds", "Replication batch POST round trip")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def months(self, now) -> dict:
+        if self._months is None:
+            saved = self.cursor.load()
+            cur = month_key(now)
+            first = min(saved) if saved else (self.from_month or cur)
+            months = {}
+            for ym in months_between(min(first, cur), cur):
+                pos = saved.get(ym, {"offset": 0, "head": ""})
+                if pos["offset"] and events_head_digest(self.repo_root, ym, pos["offset"]) != pos["head"]:
+                    print(f"replica_cursor_reset month={ym} offset={pos['offset']}", file=sys.stderr, flush=True)
+                    self._bump("resets")
+                    pos = {"offset": 0, "head": ""}
+                months[ym] = pos
+            self._months = months
+        cur = month_key(now)
+        if cur not in self._months:
+            self._months[cur] = {"offset": 0, "head": ""}
+        return self._months
+
+    def drain(self, now, stop: threading.Event | None = None) -> int:
+        if self.halted:
+            return 0
+        months = self.months(now)
+        shipped = 0
+        for ym in sorted(months):
+            pos = months[ym]
+            while stop is None or not stop.is_set():
+                lines, end = self._read_batch(ym, pos["offset"])
+                if not lines:
+                    break
+                if not self._send(ym, pos["offset"], end, lines, stop):
+                    return shipped
+                pos["offset"] = end
+                pos["head"] = events_head_digest(self.repo_root, ym, end)
+                self.cursor.save(months)
+                shipped += len(lines)
+        self._expire(months, now)
+        return shipped
+
+    def follow(self, watcher, stop: threading.Event, now_fn, idle_sec: float = 60.0) -> None:
+        while not stop.is_set() and not self.halted:
+            now = now_fn()
+            if self.drain(now, stop):
+                continue
+            left = next_month_start_jst(now).timestamp() - time.time()
+            watcher.wait(max(0.05, min(idle_sec, left)), f"{month_key(now)}.jsonl")
+
+    def _read_batch(self, ym: str, offset: int) -> tuple[list[bytes], int]:
+        lines = []
+        size = 0
+        end = offset
+        for end, raw in iter_event_lines(self.repo_root, ym, offset):
+            lines.append(raw)
+            size += len(raw)
+            if len(lines) >= self.batch_lines or size >= self.batch_bytes:
+                break
+        return lines, end
+
+    def _send(self, ym: str, offset: int, end: int, lines: list[bytes], stop) -> bool:
+        raw = b"".join(lines)
+        body = gzip.compress(raw, compresslevel=6) if self.gzip_body else raw
+        q = urllib.parse.urlencode({"site": self.site, "month": ym, "offset": offset, "end": end})
+        url = f"{self.url}{'&' if '?' in self.url else '?'}{q}"
+        headers = {"Content-Type": "application/x-ndjson"}
+        if self.gzip_body:
+            headers["Content-Encoding"] = "gzip"
+        if self.token:
+            headers["X-Auth-Token"] = self.token
+        delay = self.backoff_sec
+        while True:
+            t0 = time.perf_counter()
+            try:
+                ack = self._post(url, body, headers)
+            except ReplicaRejected as e:
+                self._observe(t0)
+                self.halted = f"replica_rejected month={ym} offset={offset} code={e.status}"
+                self._bump("halted")
+                print(f"{self.halted} err={e}", file=sys.stderr, flush=True)
+                return False
+            except Exception as e:
+                self._observe(t0)
+                self._bump("failures")
+                wait = min(delay, self.backoff_max_sec) * random.uniform(0.5, 1.0)
+                print(f"replica_post_failed month={ym} offset={offset} lines={len(lines)} retry_in={wait:.1f} err={e}", file=sys.stderr, flush=True)
+                delay *= 2
+                if stop is None:
+                    time.sleep(wait)
+                elif stop.wait(wait):
+                    return False
+                continue
+            self._observe(t0)
+            break
+        ev = decode_line(lines[-1])
+        lag = max(0.0, time.time() - ev.epoch) if ev is not None else 0.0
+        with self._lock:
+            st = self._stats
+            st["batches"] += 1
+            st["lines"] += len(lines)
+            st["raw_bytes"] += len(raw)
+            st["sent_bytes"] += len(body)
+            for k in ("accepted", "duplicates", "rejected"):
+                st[k] += int(ack.get(k, 0) or 0)
+            st["lag_seconds"] = round(lag, 3)
+        return True
+
+    def _post(self, url: str, body: bytes, headers: dict) -> dict:
+        p = self._pool if self._pool is not None else default_pool()
+        resp = p.request("POST", url, body=body, headers=headers, timeout_sec=self.timeout_sec)
+        if 400 <= resp.status < 500 and resp.status not in _RETRYABLE_4XX:
+            raise ReplicaRejected(f"replica_http_error code={resp.status} body={resp.text()[:400]}", resp.status)
+        if resp.status >= 400:
+            raise RuntimeError(f"replica_http_error code={resp.status} body={resp.text()[:400]}")
+        try:
+            ack = json.loads(resp.text() or "{}")
+        except Exception:
+            ack = {}
+        if not isinstance(ack, dict) or ack.get("ok") is not True:
+            raise RuntimeError(f"replica_bad_response body={resp.text()[:400]}")
+        return ack
+
+    def _expire(self, months: dict, now) -> None:
+        cur = month_key(now)
+        cutoff = now.timestamp() - self.month_grace_sec
+        drop = []
+        for ym in months:
+            if ym == cur:
+                continue
+            nxt = next_month_start_jst(now.replace(year=int(ym[0:4]), month=int(ym[5:7]), day=1))
+            if nxt.timestamp() <= cutoff:
+                drop.append(ym)
+        if drop:
+            for ym in drop:
+                del months[ym]
+            self.cursor.save(months)
+
+    def _observe(self, t0: float) -> None:
+        if self._m is not None:
+            self._m.observe(time.perf_counter() - t0)
+
+    def _bump(self, k: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[k] += n
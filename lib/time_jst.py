@@ -1,8 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 
 
 _JST = ZoneInfo("Asia/Tokyo")
+JST_OFFSET_SEC = 9 * 3600
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
 
 
 def now_jst() -> datetime:
@@ -23,3 +26,58 @@ def date_jst(dt: datetime):
 
 def parse_iso(s: str) -> datetime:
     return datetime.fromisoformat(s)
+
+
+def start_of_day_jst(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_JST)
+    return dt.astimezone(_JST).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def midnight_jst(d: date) -> datetime:
+    return datetime(d.year, d.month, d.day, tzinfo=_JST)
+
+
+def next_month_start_jst(dt: datetime) -> datetime:
+    d = date_jst(dt)
+    if d.month == 12:
+        return midnight_jst(date(d.year + 1, 1, 1))
+    return midnight_jst(date(d.year, d.month + 1, 1))
+
+
+@lru_cache(maxsize=4096)
+def parse_ts(s: str) -> tuple[int | float, int]:
+    dt = datetime.fromisoformat(s)
+    if s.endswith("+09:00"):
+        day = dt.toordinal() - _EPOCH_ORDINAL
+        epoch = day * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second - JST_OFFSET_SEC
+        if dt.microsecond:
+            epoch += dt.microsecond / 1e6
+        return epoch, day
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_JST)
+    epoch = dt.timestamp()
+    if epoch == int(epoch):
+        epoch = int(epoch)
+    return epoch, jst_day(epoch)
+
+
+def jst_day(epoch) -> int:
+    return int((epoch + JST_OFFSET_SEC) // 86400)
+
+
+@lru_cache(maxsize=4096)
+def day_iso(day: int) -> str:
+    return date.fromordinal(day + _EPOCH_ORDINAL).isoformat()
+
+
+def day_date(day: int) -> date:
+    return date.fromordinal(day + _EPOCH_ORDINAL)
+
+
+def epoch_jst(epoch) -> datetime:
+    return datetime.fromtimestamp(epoch, _JST)
+
+
+def iso_epoch(epoch) -> str:
+    return iso_jst(epoch_jst(epoch))
@@ -0,0 +1,101 @@
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from lib.file_watch import open_watcher
+
+
+UNKNOWN = "unknown"
+
+_UID_STRIP = str.maketrans("", "", " :-\t")
+
+
+def normalize_uid(uid: str) -> str:
+    uid = str(uid)
+    if not uid.isalnum():
+        uid = uid.translate(_UID_STRIP)
+    return uid.upper()
+
+
+def parse_uid_map(data: bytes) -> dict[str, str]:
+    o = json.loads(data)
+    if not isinstance(o, dict):
+        raise ValueError("uid_map_not_object")
+    out = {}
+    for k, v in o.items():
+        uid = normalize_uid(k)
+        if uid:
+            out[uid] = v if type(v) is str else str(v)
+    return out
+
+
+class UidMap:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.reloads = 0
+        self.rejects = 0
+        self.last_reload_ms = 0.0
+        self._table = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def lookup(self, uid: str) -> str:
+        table = self._table
+        emp = table.get(uid)
+        if emp is None:
+            emp = table.get(normalize_uid(uid), UNKNOWN)
+        return emp
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def reload(self) -> bool:
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                if self._stamp is not None:
+                    print(f"uid_map_missing path={self.path} keep={len(self._table)}", file=sys.stderr, flush=True)
+                    self._stamp = None
+                return False
+            stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if stamp == self._stamp:
+                return False
+            self._stamp = stamp
+            t0 = time.perf_counter()
+            try:
+                with open(self.path, "rb") as f:
+                    table = parse_uid_map(f.read())
+            except Exception as e:
+                self.rejects += 1
+                print(f"uid_map_reload_failed path={self.path} keep={len(self._table)} err={e}", file=sys.stderr, flush=True)
+                return False
+            self._table = table
+            self.reloads += 1
+            self.last_reload_ms = (time.perf_counter() - t0) * 1000.0
+            return True
+
+    def watch(self, stop: threading.Event, mode: str = "auto", interval_sec: float = 1.0, recheck_sec: float = 60.0) -> threading.Thread:
+        watcher = open_watcher(self.path.parent, mode=mode, interval_sec=interval_sec)
+
+        def run():
+            try:
+                while not stop.is_set():
+                    watcher.wait(recheck_sec, self.path.name)
+                    if stop.is_set():
+                        return
+                    try:
+                        if self.reload():
+                            print(f"uid_map_reloaded entries={len(self._table)} ms={self.last_reload_ms:.1f}", file=sys.stderr, flush=True)
+                    except OSError as e:
+                        print(f"uid_map_reload_failed path={self.path} err={e}", file=sys.stderr, flush=True)
+                        stop.wait(1.0)
+            finally:
+                watcher.close()
+
+        th = threading.Thread(target=run, name="uid-map-watch", daemon=True)
+        th.start()
+        return th
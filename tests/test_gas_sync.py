@@ -0,0 +1,93 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.stub_gas import StubGas
+from lib.gas_sync import PartialUpload, load_sync_manifest, post_records_chunked, record_digest, sync_manifest_path, sync_records_delta
+
+
+def _recs(n: int, tag: str = "a") -> list[dict]:
+    return [{"id": f"r{i:04d}", "date": "2026-03-01", "emp": f"e{i % 7}", "min": i, "tag": tag} for i in range(n)]
+
+
+class GasSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubGas().start()
+        self.td = tempfile.TemporaryDirectory()
+        self.root = Path(self.td.name)
+
+    def tearDown(self):
+        self.stub.stop()
+        self.td.cleanup()
+
+    def _sync(self, recs: list[dict], **kw) -> dict:
+        kw.setdefault("chunk_size", 100)
+        return sync_records_delta(self.root, "2026-03", recs, self.stub.url, None, 10, 1, 0.0, **kw)
+
+    def _manifest(self) -> dict:
+        return load_sync_manifest(sync_manifest_path(self.root, "2026-03"), self.stub.url)
+
+    def test_chunks_refresh_once_on_last(self):
+        recs = _recs(450)
+        ack = post_records_chunked(self.stub.url, recs, None, 10, deletes=["x1", "x2"], chunk_size=100, workers=3)
+        self.assertEqual(ack["chunks"], 6)
+        self.assertEqual(ack["inserted"], 450)
+        self.assertEqual(self.stub.posts, 6)
+        self.assertEqual(self.stub.refreshes, 1)
+        self.assertEqual(sorted(self.stub.rows), [r["id"] for r in recs])
+
+    def test_gzip_body(self):
+        recs = _recs(250)
+        post_records_chunked(self.stub.url, recs, None, 10, chunk_size=100, gzip_body=True)
+        self.assertEqual(self.stub.gzip_posts, 3)
+        self.assertEqual(self.stub.rows["r0123"], recs[123])
+
+    def test_delta_sends_changes_and_deletes(self):
+        recs = _recs(300)
+        first = self._sync(recs)
+        self.assertEqual(first["sent_records"], 300)
+        self.assertEqual(self._manifest(), {r["id"]: record_digest(r) for r in recs})
+
+        self.assertTrue(self._sync(recs)["skipped"])
+
+        nxt = [dict(r, tag="b") if i % 50 == 0 else r for i, r in enumerate(recs[:250])]
+        ack = self._sync(nxt)
+        self.assertEqual(ack["sent_records"], 5)
+        self.assertEqual(ack["sent_deletes"], 50)
+        self.assertEqual(sorted(self.stub.rows), [r["id"] for r in nxt])
+        self.assertEqual(self.stub.rows["r0050"]["tag"], "b")
+        self.assertEqual(self._manifest(), {r["id"]: record_digest(r) for r in nxt})
+
+    def test_full_resends_and_still_deletes(self):
+        recs = _recs(120)
+        self._sync(recs)
+        posts = self.stub.posts
+        ack = self._sync(recs[:100], full=True)
+        self.assertEqual(ack["sent_records"], 100)
+        self.assertEqual(ack["sent_deletes"], 20)
+        self.assertGreater(self.stub.posts, posts)
+        self.assertEqual(sorted(self.stub.rows), [r["id"] for r in recs[:100]])
+        self.assertEqual(self._manifest(), {r["id"]: record_digest(r) for r in recs[:100]})
+
+    def test_partial_upload_keeps_acked_chunks(self):
+        self.stub.fail_every = 2
+        recs = _recs(400)
+        with self.assertRaises(PartialUpload) as cm:
+            self._sync(recs, workers=1)
+        done = set(cm.exception.done_records)
+        self.assertEqual(len(done), 200)
+        self.assertEqual(set(self._manifest()), done)
+        self.assertEqual(set(self.stub.rows), done)
+
+        self.stub.fail_every = 0
+        ack = self._sync(recs)
+        self.assertEqual(ack["sent_records"], 200)
+        self.assertEqual(sorted(self.stub.rows), [r["id"] for r in recs])
+        self.assertEqual(self._manifest(), {r["id"]: record_digest(r) for r in recs})
+
+
+if __name__ == "__main__":
+    unittest.main()
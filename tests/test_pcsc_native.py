@@ -0,0 +1,120 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench.fake_pcsc import FakeLibpcsclite, FakeScardLib, write_fake_opensc
+from lib import rcs300_pcsc
+from lib.pcsc_native import (
+    SCARD_E_READER_UNAVAILABLE,
+    Libpcsclite,
+    PcscError,
+    PcscSession,
+    PcscUnavailable,
+    ReadersChanged,
+)
+
+_SONY = "Sony FeliCa Port/PaSoRi 4.0 00 00"
+_NO_SERVICE = 0x8010001D
+
+
+class _Unloadable:
+    def __init__(self, path: Path):
+        self.path = str(path)
+        self.loads = 0
+
+    def establish_context(self) -> int:
+        self.loads += 1
+        return Libpcsclite(self.path).establish_context()
+
+
+class PcscNativeTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeLibpcsclite(uids=["04A1B2C3D4E5F6", "0123456789ABCD"], hold_polls=2)
+        self.session = PcscSession(lib=Libpcsclite(lib=FakeScardLib(self.fake)), wait_slice_ms=0)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_read_uid_through_ctypes(self):
+        self.assertEqual(self.session.list_readers(), [(0, _SONY)])
+        self.assertEqual(self.session.read_uid_blocking(_SONY), "04A1B2C3D4E5F6")
+        self.assertEqual(self.session.read_uid_blocking(_SONY), "0123456789ABCD")
+        self.assertEqual(self.fake.calls["connect"], 2)
+        self.assertEqual(self.fake.calls["disconnect"], 2)
+        self.assertGreaterEqual(self.fake.calls["get_status_change"], 6)
+        self.assertIsNotNone(self.session.last_timing)
+
+    def test_pnp_change_interrupts_wait(self):
+        self.session.list_readers()
+        self.fake.set_readers([_SONY, "Generic USB Reader"])
+        with self.assertRaises(ReadersChanged):
+            self.session.read_uid_blocking(_SONY)
+        self.assertEqual(self.session.reader_gen, 1)
+        self.assertEqual(self.session.list_readers(), [(0, _SONY), (1, "Generic USB Reader")])
+        self.assertTrue(self.session.read_uid_blocking(_SONY))
+        self.assertEqual(self.session.reader_gen, 1)
+
+    def test_removed_reader_raises_without_pnp(self):
+        self.fake.set_readers([])
+        with self.assertRaises(PcscError) as cm:
+            self.session.read_uid_blocking(_SONY)
+        self.assertEqual(cm.exception.rc, SCARD_E_READER_UNAVAILABLE)
+        self.assertEqual(self.session.list_readers(), [])
+
+
+class BackendFallbackTest(unittest.TestCase):
+    def setUp(self):
+        self.td = tempfile.TemporaryDirectory()
+        write_fake_opensc(Path(self.td.name))
+        self.env = {k: os.environ.get(k) for k in ("PATH", "ATT_PCSC_BACKEND")}
+        os.environ["PATH"] = f"{self.td.name}{os.pathsep}{os.environ.get('PATH', '')}"
+        os.environ["ATT_PCSC_BACKEND"] = "auto"
+
+    def tearDown(self):
+        rcs300_pcsc.set_native_lib(None)
+        for k, v in self.env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        self.td.cleanup()
+
+    def test_native_reads_and_rediscovers_after_pnp(self):
+        fake = FakeLibpcsclite(uids=["04A1B2C3D4E5F6"])
+        rcs300_pcsc.set_native_lib(Libpcsclite(lib=FakeScardLib(fake)))
+        self.assertEqual(rcs300_pcsc.read_uid_blocking(), "04A1B2C3D4E5F6")
+        fake.set_readers(["Generic USB Reader", _SONY])
+        self.assertEqual(rcs300_pcsc.read_uid_blocking(), "04A1B2C3D4E5F6")
+        self.assertEqual(fake.calls["list_readers"], 4)
+        self.assertIsNotNone(rcs300_pcsc.take_read_timing())
+
+    def test_missing_library_falls_back_to_opensc(self):
+        lib = _Unloadable(Path(self.td.name) / "libpcsclite.so.1")
+        with self.assertRaises(PcscUnavailable):
+            lib.establish_context()
+        rcs300_pcsc.set_native_lib(lib)
+        self.assertEqual(rcs300_pcsc.read_uid_blocking(), "0123456789ABCD")
+        self.assertEqual(rcs300_pcsc.read_uid_blocking(), "0123456789ABCD")
+        self.assertEqual(lib.loads, 2)
+        self.assertIsNone(rcs300_pcsc.take_read_timing())
+
+    def test_no_service_falls_back_to_opensc(self):
+        fake = FakeLibpcsclite()
+        rcs300_pcsc.set_native_lib(Libpcsclite(lib=FakeScardLib(fake, establish_rc=_NO_SERVICE)))
+        self.assertEqual(rcs300_pcsc.read_uid_blocking(), "0123456789ABCD")
+        self.assertEqual(rcs300_pcsc.list_readers(), [(0, _SONY)])
+        self.assertNotIn("establish_context", fake.calls)
+
+    def test_native_backend_does_not_fall_back(self):
+        os.environ["ATT_PCSC_BACKEND"] = "native"
+        rcs300_pcsc.set_native_lib(Libpcsclite(lib=FakeScardLib(establish_rc=_NO_SERVICE)))
+        with self.assertRaises(PcscError):
+            rcs300_pcsc.read_uid_blocking()
+
+
+if __name__ == "__main__":
+    unittest.main()